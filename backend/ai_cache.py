@@ -0,0 +1,153 @@
+"""Content-addressed cache for AI-generated invisible loss points.
+
+The Gemini prompt only depends on description, people, approvals and tools,
+so re-analyzing a process with a different salary or volume should not pay
+for another model call. Entries live in a bounded in-memory LRU with a TTL
+and are written through to the ``ai_point_cache`` table so they survive
+restarts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, AIPointCacheDB
+
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "2048"))
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def cache_key(data, namespace=""):
+    """Normalized hash of the prompt inputs.
+
+    Whitespace and case in the description and tool names don't change the
+    key, and neither does tool order. ``namespace`` should identify the model
+    and prompt version so a prompt change never serves stale answers.
+    """
+    payload = {
+        "ns": namespace,
+        "description": " ".join(data.description.split()).lower(),
+        "people": int(data.people_involved),
+        "approvals": int(data.approvals_per_task),
+        "tools": sorted(t.strip().lower() for t in data.tools_used),
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class AIPointCache:
+    def __init__(self, session_factory=SessionLocal, max_entries=AI_CACHE_MAX_ENTRIES, ttl_seconds=AI_CACHE_TTL_SECONDS):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (points, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remember(self, key, points, created_at):
+        self._entries[key] = (points, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        points = self.get_memory(key)
+        if points is None:
+            points = self.get_persisted(key)
+        return points
+
+    def get_memory(self, key):
+        """In-memory lookup only; never blocks on the database."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                points, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return points
+                del self._entries[key]
+                self.expirations += 1
+        return None
+
+    def get_persisted(self, key):
+        """Database lookup after a memory miss (blocking: run it off the event loop)."""
+        now = time.time()
+        db = self.session_factory()
+        try:
+            row = db.get(AIPointCacheDB, key)
+            if row is not None and now - row.created_at < self.ttl_seconds:
+                points, created_at = row.points, row.created_at
+            else:
+                points = None
+        finally:
+            db.close()
+
+        with self._lock:
+            if points is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, points, created_at)
+        return points
+
+    def put(self, key, points):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, points, created_at)
+
+        db = self.session_factory()
+        try:
+            db.merge(AIPointCacheDB(key=key, points=points, created_at=created_at))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another writer inserted the key between merge's SELECT and
+                # our INSERT; the row exists now, so merging again updates it
+                db.rollback()
+                db.merge(AIPointCacheDB(key=key, points=points, created_at=created_at))
+                db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self):
+        """Drop persisted entries older than the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        db = self.session_factory()
+        try:
+            removed = db.query(AIPointCacheDB).filter(AIPointCacheDB.created_at < cutoff).delete()
+            db.commit()
+        finally:
+            db.close()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.db_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+ai_point_cache = AIPointCache()
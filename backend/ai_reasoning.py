@@ -0,0 +1,173 @@
+"""Connected AI reasoning (Gemini) for invisible loss points.
+
+The model call is awaited off the event loop under a global concurrency cap
+and a hard deadline. Anything that goes wrong - no key, timeout, bad JSON,
+API error - falls back to the heuristic loss points.
+
+Parsed answers are cached by a normalized hash of the prompt inputs (see
+``ai_cache``), so only genuinely new prompts reach the model.
+
+Set ``AI_BACKEND=stub`` (optionally with ``AI_STUB_LATENCY`` seconds) to run
+against a local stub model instead of Gemini.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from ai_cache import ai_point_cache, cache_key
+from metrics import AI_REQUESTS, STAGE_SECONDS
+from single_flight import ai_flights
+
+logger = logging.getLogger(__name__)
+
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "8"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", "gemini-pro")
+
+PROMPT_TEMPLATE = """
+            Act as a senior business operations consultant. Analyze this workflow description:
+            "{description}"
+
+            Context: {people} people, {approvals} approvals, Tools: {tools}.
+
+            Identify 3 specific "Invisible Loss Points". Return ONLY JSON in this format:
+            [
+                {{ "title": "...", "reason": "...", "root_cause": "...", "blindness_reason": "...", "impact": "..." }}
+            ]
+            Keep it professional, insightful, and harsh.
+            """
+
+
+# WorkflowInput fields the prompt is built from; changing any other field can
+# reuse the stored loss points (see PATCH /workflows/{id})
+PROMPT_FIELDS = frozenset({"description", "tools_used", "people_involved", "approvals_per_task"})
+
+PROMPT_VERSION = hashlib.sha256(PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+
+
+def build_prompt(data):
+    return PROMPT_TEMPLATE.format(
+        description=data.description,
+        people=data.people_involved,
+        approvals=data.approvals_per_task,
+        tools=', '.join(data.tools_used),
+    )
+
+
+def parse_points(text):
+    cleaned_response = text.replace('```json', '').replace('```', '')
+    return json.loads(cleaned_response)
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Local stand-in for ``genai.GenerativeModel`` with configurable latency."""
+
+    def __init__(self, latency=0.0, points=None):
+        self.latency = latency
+        self.points = points or [{
+            "title": "Stubbed Loss Point",
+            "reason": "Generated by the local stub model.",
+            "root_cause": "AI_BACKEND=stub",
+            "blindness_reason": "Not a real model response.",
+            "impact": "None."
+        }]
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return _StubResponse(json.dumps(self.points))
+
+
+_model = None
+_semaphore = None
+
+
+def set_model(model):
+    """Swap the model used for enrichment (``None`` re-resolves from env)."""
+    global _model
+    _model = model
+
+
+def get_model():
+    global _model
+    if _model is not None:
+        return _model
+
+    if os.getenv("AI_BACKEND") == "stub":
+        _model = StubModel(latency=float(os.getenv("AI_STUB_LATENCY", "0")))
+        return _model
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        return None
+
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    _model = genai.GenerativeModel(AI_MODEL_NAME)
+    return _model
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def _generate(model, prompt):
+    async with _get_semaphore():
+        with STAGE_SECONDS.time(handler="ai", stage="model_call"):
+            if hasattr(model, "generate_content_async"):
+                response = await model.generate_content_async(prompt)
+            else:
+                response = await asyncio.to_thread(model.generate_content, prompt)
+    with STAGE_SECONDS.time(handler="ai", stage="parse"):
+        return parse_points(response.text)
+
+
+async def _generate_and_store(model, data, key, timeout):
+    # One call per prompt key at a time (see single_flight.py). Callers that
+    # join in flight share this deadline, which is never later than their own.
+    ai_points = await asyncio.wait_for(_generate(model, build_prompt(data)), timeout)
+    if ai_points:
+        await asyncio.to_thread(ai_point_cache.put, key, ai_points)
+    return ai_points
+
+
+async def generate_loss_points(data, fallback, timeout=None):
+    """AI loss points for ``data``, or ``fallback`` if the model can't deliver in time.
+
+    The deadline covers waiting for a concurrency slot as well as the call.
+    """
+    try:
+        # First use imports and configures the Gemini SDK: keep that off the loop
+        model = _model if _model is not None else await asyncio.to_thread(get_model)
+        if model is None:
+            AI_REQUESTS.inc(outcome="no_model")
+            return fallback
+        key = cache_key(data, namespace=f"{type(model).__name__}:{AI_MODEL_NAME}:{PROMPT_VERSION}")
+        cached = ai_point_cache.get_memory(key)
+        if cached is None:
+            cached = await asyncio.to_thread(ai_point_cache.get_persisted, key)
+        if cached:
+            AI_REQUESTS.inc(outcome="cache_hit")
+            return cached
+        ai_points = await ai_flights.do(key, lambda: _generate_and_store(model, data, key, timeout or AI_TIMEOUT_SECONDS))
+    except asyncio.TimeoutError:
+        AI_REQUESTS.inc(outcome="timeout")
+        logger.warning("AI Generation timed out after %ss, using heuristics", timeout or AI_TIMEOUT_SECONDS)
+        return fallback
+    except Exception as e:
+        AI_REQUESTS.inc(outcome="error")
+        logger.warning("AI Generation failed: %s", e)
+        return fallback
+
+    AI_REQUESTS.inc(outcome="model" if ai_points else "empty")
+
+    return ai_points or fallback
@@ -0,0 +1,87 @@
+"""Size-bounded in-memory cache of rendered export artifacts.
+
+Entries are keyed on (kind, workflow id, content hash), so editing a
+workflow's results naturally misses the old artifact. The content hash also
+backs the ETag, letting clients revalidate without a render. Reports print
+the render date (PDF filename and cover, PPTX title), so the date is part of
+the hash. Yesterday's artifact and ETag stop matching at midnight.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def content_hash(workflow):
+    """Stable hash of everything a report is rendered from, including today's date."""
+    blob = json.dumps(
+        {
+            "name": workflow.name,
+            "input": workflow.input_data,
+            "result": workflow.result_data,
+            "date": date.today().isoformat(),
+        },
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def make_etag(kind, workflow_id, digest):
+    return f'"{kind}-{workflow_id}-{digest[:20]}"'
+
+
+class ArtifactCache:
+    def __init__(self, max_bytes=ARTIFACT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (filename, content)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, filename, content):
+        if len(content) > self.max_bytes:
+            return  # would evict everything else; just don't cache it
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (filename, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+artifact_cache = ArtifactCache()
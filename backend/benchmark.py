@@ -0,0 +1,223 @@
+"""Offline load/latency benchmark for the API.
+
+Drives the FastAPI app in-process (httpx ASGI transport, real lifespan, real
+export pool). It runs against a scratch SQLite DB seeded with ``--workflows``
+analyses, and the stub AI model replaces Gemini with ``--ai-latency`` seconds
+per call. Nothing touches the network or the local ``ibld.db``.
+
+Each scenario runs at every ``--concurrency`` level:
+
+* ``analyze`` - POST /analyze with varied inputs (AI cache misses)
+* ``list``    - GET /workflows pages, mixed sort and severity filters
+* ``pdf``     - GET /export/pdf/{id}, artifact cache cleared per level
+* ``pptx``    - GET /export/pptx/{id}, artifact cache cleared per level
+
+For each run it reports throughput (ok requests/s), p50/p95/p99 latency and
+the error count. Results are written as JSON. Against ``--baseline``, a level
+whose p95 grew, or whose throughput fell, by more than ``--tolerance``
+is flagged and the exit status is 1. A missing baseline exits with 2, so
+the check can't pass silently. ``benchmark_baseline.json`` next to this file
+is the committed reference run (its ``meta`` records the machine):
+
+    python benchmark.py --output bench.json --update-baseline
+    python benchmark.py --baseline benchmark_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmark_baseline.json")
+SCENARIOS = ("analyze", "list", "pdf", "pptx")
+TOOLS = ["ERP", "Email", "Excel", "Slack", "Jira", "SAP", "Sheets", "CRM"]
+SEED_CHUNK = 1000
+
+
+def _configure_env(args, workdir):
+    """Must run before ``main`` is imported: modules read settings at import."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "AI_BACKEND": "stub",
+        "AI_STUB_LATENCY": str(args.ai_latency),
+    })
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def workflow_input(rng, i):
+    return {
+        "name": f"Bench workflow {i}",
+        "description": f"Benchmark process {i} with manual hand-offs",
+        "people_involved": rng.randint(2, 40),
+        "approvals_per_task": rng.randint(0, 8),
+        "tools_used": rng.sample(TOOLS, rng.randint(1, 6)),
+        "avg_delays_hours": round(rng.uniform(0, 48), 1),
+        "rejection_rate": round(rng.uniform(0, 40), 1),
+        "monthly_volume": rng.randint(1, 2000),
+    }
+
+
+async def _seed(client, headers, rng, count):
+    ids = []
+    for start in range(0, count, SEED_CHUNK):
+        batch = [workflow_input(rng, i) for i in range(start, min(count, start + SEED_CHUNK))]
+        response = await client.post("/analyze/batch", json={"workflows": batch}, headers=headers)
+        response.raise_for_status()
+        ids.extend(result["id"] for result in response.json()["results"])
+    return ids
+
+
+def _request_factory(scenario, rng, headers, ids):
+    if scenario == "analyze":
+        counter = iter(range(10**9))
+        return lambda client: client.post("/analyze", json=workflow_input(rng, next(counter)), headers=headers)
+    if scenario == "list":
+        def listing(client):
+            params = {"limit": 50, "sort": rng.choice(["recent", "loss"])}
+            if rng.random() < 0.5:
+                params["severity"] = rng.choice(["High", "Medium", "Low"])
+            return client.get("/workflows", params=params)
+        return listing
+    # Exports walk the seeded ids so a level renders distinct reports
+    order = iter(ids * 1000)
+    return lambda client: client.get(f"/export/{scenario}/{next(order)}")
+
+
+async def _run_level(client, make_request, requests, concurrency):
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await make_request(client)
+            elapsed = time.perf_counter() - started
+            if response.status_code < 400:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    result = {"requests": requests, "errors": errors, "wall_s": round(wall, 3),
+              "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0}
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        result.update(p50_ms=round(p50, 2), p95_ms=round(p95, 2), p99_ms=round(p99, 2))
+    return result
+
+
+async def run_benchmark(args):
+    import httpx
+    import main
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post("/users/", json={"username": "bench", "password": "bench"})
+            token = (await client.post("/token", data={"username": "bench", "password": "bench"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            ids = await _seed(client, headers, rng, args.workflows)
+
+            for scenario in args.scenarios:
+                results[scenario] = {}
+                for concurrency in args.concurrency:
+                    main.artifact_cache.clear()
+                    make_request = _request_factory(scenario, rng, headers, ids)
+                    for _ in range(args.warmup):
+                        await make_request(client)
+                    level = await _run_level(client, make_request, args.requests, concurrency)
+                    results[scenario][str(concurrency)] = level
+                    print(f"{scenario:<8} c={concurrency:<4} {level['throughput_rps']:>9.1f} rps  "
+                          f"p50 {level.get('p50_ms', 0):>8.1f}  p95 {level.get('p95_ms', 0):>8.1f}  "
+                          f"p99 {level.get('p99_ms', 0):>8.1f} ms  errors {level['errors']}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of ``results`` against ``baseline`` beyond ``tolerance`` (a fraction)."""
+    regressions = []
+    for scenario, levels in baseline.get("results", {}).items():
+        for concurrency, base in levels.items():
+            current = results.get(scenario, {}).get(concurrency)
+            if current is None:
+                continue
+            if base.get("p95_ms") and current.get("p95_ms", float("inf")) > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{scenario} c={concurrency}: p95 {base['p95_ms']} -> {current.get('p95_ms')} ms")
+            if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{scenario} c={concurrency}: throughput {base['throughput_rps']} -> {current['throughput_rps']} rps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflows", type=int, default=500, help="seeded workflows")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests before each level")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--ai-latency", type=float, default=0.05, help="stub model latency in seconds")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95/throughput drift")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _configure_env(args, workdir)
+        results = asyncio.run(run_benchmark(args))
+
+    report = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "workflows": args.workflows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "ai_latency_s": args.ai_latency,
+            "seed": args.seed,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Without a baseline nothing was checked; don't report that as a pass
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 2
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
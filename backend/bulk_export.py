@@ -0,0 +1,129 @@
+"""Audit-pack export: many reports rendered in parallel, streamed as one ZIP.
+
+Reports are rendered on the export process pool with a bounded window of
+renders in flight. Each one is written to the archive as soon as it
+finishes, and the bytes go to the client right away. Workflows are loaded
+from the DB in small chunks, so peak memory depends on the window size and
+not on the size of the pack.
+
+A pack must not crowd out interactive exports. Its renders leave
+``BULK_EXPORT_RESERVED_SLOTS`` of the pool's queue free, so ``/export/*``
+does not get a 503 because of a bulk job. They also bypass the artifact
+cache, so a thousand one-off reports don't evict the ones users re-download.
+"""
+import asyncio
+import os
+import time
+import zipfile
+
+from database import SessionLocal, WorkflowDB
+from export_jobs import ExportQueueFull, export_pool
+from reports import workflow_snapshot
+
+BULK_EXPORT_MAX_WORKFLOWS = int(os.getenv("BULK_EXPORT_MAX_WORKFLOWS", "5000"))
+# Queue slots bulk renders never take, kept for interactive exports
+BULK_EXPORT_RESERVED_SLOTS = int(os.getenv("BULK_EXPORT_RESERVED_SLOTS", str(max(1, export_pool.max_pending // 4))))
+BULK_EXPORT_WINDOW = max(1, min(
+    int(os.getenv("BULK_EXPORT_WINDOW", str(max(2, export_pool.workers * 2)))),
+    export_pool.max_pending - BULK_EXPORT_RESERVED_SLOTS,
+))
+LOAD_CHUNK = 50
+QUEUE_FULL_BACKOFF_SECONDS = 0.25
+
+
+class _ZipSink:
+    """Write-only, unseekable file object that collects bytes until drained.
+
+    ``zipfile`` falls back to data descriptors when it can't seek, so each
+    entry can be flushed to the client as soon as it is written.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _load_chunk(ids):
+    db = SessionLocal()
+    try:
+        rows = db.query(WorkflowDB).filter(WorkflowDB.id.in_(ids)).all()
+        return [workflow_snapshot(wf) for wf in rows]
+    finally:
+        db.close()
+
+
+async def _render(kind, snapshot):
+    while True:
+        try:
+            return await export_pool.render(kind, snapshot, reserve=BULK_EXPORT_RESERVED_SLOTS)
+        except ExportQueueFull:
+            # Interactive exports keep priority; wait for a free slot
+            await asyncio.sleep(QUEUE_FULL_BACKOFF_SECONDS)
+
+
+async def stream_zip(workflow_ids, kinds, window=BULK_EXPORT_WINDOW):
+    """Async generator of ZIP bytes for ``workflow_ids`` x ``kinds``."""
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    pending = {}  # task -> (workflow_id, kind)
+    failures = []
+
+    def write_finished(done):
+        for task in done:
+            workflow_id, kind = pending.pop(task)
+            try:
+                filename, content = task.result()
+            except Exception as e:
+                failures.append(f"{workflow_id}\t{kind}\t{e}")
+                continue
+            info = zipfile.ZipInfo(f"{workflow_id}/{filename}", date_time=time.localtime()[:6])
+            archive.writestr(info, content)
+
+    try:
+        for start in range(0, len(workflow_ids), LOAD_CHUNK):
+            chunk = workflow_ids[start:start + LOAD_CHUNK]
+            loaded = await asyncio.to_thread(_load_chunk, chunk)
+            found = {snapshot["id"] for snapshot in loaded}
+            failures.extend(f"{wf_id}\t-\tWorkflow not found" for wf_id in chunk if wf_id not in found)
+
+            for snapshot in loaded:
+                for kind in kinds:
+                    while len(pending) >= window:
+                        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        write_finished(done)
+                        yield sink.drain()
+                    task = asyncio.ensure_future(_render(kind, snapshot))
+                    pending[task] = (snapshot["id"], kind)
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write_finished(done)
+            yield sink.drain()
+    finally:
+        # Client went away: stop waiting on renders nobody will receive
+        for task in pending:
+            task.cancel()
+
+    if failures:
+        archive.writestr("errors.tsv", "workflow_id\tformat\terror\n" + "\n".join(failures) + "\n")
+    archive.close()
+    yield sink.drain()
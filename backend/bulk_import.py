@@ -0,0 +1,197 @@
+"""Bulk analysis: the shared batch scorer and the streaming CSV/NDJSON import.
+
+``analyze_rows`` scores a list of validated inputs in one vectorized pass and
+persists them in one transaction. ``POST /analyze/batch`` calls it with the
+request body; ``stream_import`` calls it once per chunk of an uploaded file.
+
+``stream_import`` reads the upload line by line, validates each row against
+the input model and yields Server-Sent Events as it goes. Only one chunk of
+rows is held in memory at a time, so memory use does not grow with the file.
+Every committed chunk is final: if the client disconnects, the rows imported
+so far stay and the rest of the file is not read.
+"""
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import get_origin
+
+from pydantic import ValidationError
+
+import loss_engine
+from database import SessionLocal, WorkflowDB
+from dedup import input_hash
+from migrations import workflow_metric_values
+from peer_index import peer_index
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_ROW_ERRORS = int(os.getenv("IMPORT_MAX_ROW_ERRORS", "1000"))
+LIST_SEPARATOR = ";"
+
+
+def analyze_rows(db, workflows, owner_id):
+    """Score, benchmark and persist ``workflows`` in one transaction -> results with ids.
+
+    AI reasoning is skipped; every row gets the heuristic loss points.
+    """
+    scored = list(loss_engine.rows(loss_engine.compute(loss_engine.to_arrays(workflows))))
+    # Ranked against stored peers plus the rest of this batch
+    benchmarks = peer_index.benchmark_many([
+        (data.people_involved, len(data.tools_used), int(m["clarity_score"]), round(m["waste_ratio"], 1))
+        for data, m in zip(workflows, scored)
+    ])
+    created_at = datetime.now().isoformat()
+
+    results = []
+    inputs = []
+    rows = []
+    for data, m, benchmark in zip(workflows, scored, benchmarks):
+        analysis_result = loss_engine.build_result(
+            data,
+            m,
+            loss_engine.heuristic_loss_points(data),
+            benchmark["score"],
+        )
+        analysis_result["peer_benchmark"] = benchmark
+        results.append(analysis_result)
+        inputs.append(data.model_dump())
+        rows.append(WorkflowDB(
+            name=data.name,
+            description=data.description,
+            created_at=created_at,
+            input_data=inputs[-1],
+            input_hash=input_hash(inputs[-1]),
+            result_data=analysis_result,
+            owner_id=owner_id,
+            **workflow_metric_values(analysis_result)
+        ))
+
+    db.add_all(rows)
+    db.flush()  # ids come back from the bulk INSERT, no per-row refresh
+    for analysis_result, wf in zip(results, rows):
+        analysis_result["id"] = wf.id
+    db.commit()
+    # Plain values only from here: touching the expired ORM rows would reload each one
+    for analysis_result, input_data in zip(results, inputs):
+        peer_index.add(analysis_result["id"], input_data, analysis_result)
+    return results
+
+
+# --- Streaming import ---
+
+def _csv_value(field, value, list_fields):
+    if field in list_fields:
+        value = value.strip()
+        if value.startswith("["):
+            return json.loads(value)
+        return [v.strip() for v in value.split(LIST_SEPARATOR) if v.strip()]
+    return value
+
+
+def _iter_records(binary_file, fmt, list_fields):
+    """Yield ``(line_number, record dict | error message)`` without reading the whole file."""
+    text = codecs.getreader("utf-8-sig")(binary_file)
+    if fmt == "ndjson":
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"Invalid JSON: {e.msg}"
+                continue
+            yield line_number, record if isinstance(record, dict) else "Expected a JSON object"
+        return
+
+    reader = csv.DictReader(text)
+    for record in reader:
+        line_number = reader.line_num
+        try:
+            # Blank list cells mean an empty list (tools_used has no default);
+            # other blank cells fall back to the model defaults
+            yield line_number, {
+                k.strip(): _csv_value(k.strip(), v, list_fields) if v.strip() else []
+                for k, v in record.items()
+                if k is not None and v is not None and (v.strip() != "" or k.strip() in list_fields)
+            }
+        except json.JSONDecodeError as e:
+            yield line_number, f"Invalid list value: {e.msg}"
+
+
+def _event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _validation_errors(e):
+    return [{"field": ".".join(str(p) for p in err["loc"]), "message": err["msg"]} for err in e.errors()]
+
+
+def stream_import(binary_file, fmt, owner_id, model, chunk_size=IMPORT_CHUNK_SIZE):
+    """Generator of SSE frames: ``progress`` per committed chunk, ``row_error`` per bad row, then ``done``."""
+    list_fields = {name for name, f in model.model_fields.items() if get_origin(f.annotation) is list}
+    started = time.perf_counter()
+    processed = imported = failed = chunks = 0
+    pending = []  # validated models waiting for the next chunk
+
+    def flush():
+        nonlocal imported, chunks
+        db = SessionLocal()
+        try:
+            results = analyze_rows(db, pending, owner_id)
+        finally:
+            db.close()
+        imported += len(results)
+        chunks += 1
+        ids = [r["id"] for r in results]
+        pending.clear()
+        return _event("progress", {
+            "chunk": chunks,
+            "processed": processed,
+            "imported": imported,
+            "failed": failed,
+            "first_id": ids[0],
+            "last_id": ids[-1],
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        })
+
+    try:
+        for line_number, record in _iter_records(binary_file, fmt, list_fields):
+            processed += 1
+            if isinstance(record, str):
+                errors = [{"field": None, "message": record}]
+            else:
+                try:
+                    pending.append(model(**record))
+                    errors = None
+                except ValidationError as e:
+                    errors = _validation_errors(e)
+            if errors is not None:
+                failed += 1
+                if failed <= IMPORT_MAX_ROW_ERRORS:
+                    yield _event("row_error", {"line": line_number, "errors": errors})
+            if len(pending) >= chunk_size:
+                yield flush()
+        if pending:
+            yield flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        yield _event("error", {"message": f"Could not parse the upload: {e}", "processed": processed, "imported": imported})
+        return
+    except Exception:
+        # Chunks committed before this point are kept
+        logger.exception("Import failed after %d rows", imported)
+        yield _event("error", {"message": "Import failed while saving a chunk", "processed": processed, "imported": imported})
+        return
+
+    yield _event("done", {
+        "processed": processed,
+        "imported": imported,
+        "failed": failed,
+        "errors_reported": min(failed, IMPORT_MAX_ROW_ERRORS),
+        "chunks": chunks,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    })
@@ -0,0 +1,89 @@
+"""N-way workflow comparison, computed in one vectorized pass.
+
+``compare`` takes an ``(n, k)`` matrix of metric values, with one row per
+workflow and one column per entry of ``COMPARE_METRICS``. From it,
+``compare`` derives:
+
+* per-metric rankings (1 = best, ties share the better rank)
+* an overall rank from the mean per-metric rank
+* the winner per metric
+* deltas against the best value
+* portfolio summary statistics
+* optional pairwise deltas
+
+Missing values are NaN; they rank last and are ignored by the summaries.
+"""
+import warnings
+
+import numpy as np
+
+# metric -> True if a higher value is better
+COMPARE_METRICS = {
+    "estimated_financial_loss": False,
+    "weekly_time_loss_hours": False,
+    "waste_ratio": False,
+    "decision_delay_index": False,
+    "clarity_score": True,
+}
+
+
+def _round(values, digits=2):
+    """NaN-safe rounding to plain Python values (NaN -> None) for JSON."""
+    rounded = np.round(values, digits)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
+
+
+def rank(matrix, higher_is_better):
+    """Competition ranks per column (1 = best); NaN ranks after every real value."""
+    oriented = np.where(higher_is_better, -matrix, matrix)
+    oriented = np.where(np.isnan(oriented), np.inf, oriented)
+    ordered = np.sort(oriented, axis=0)
+    ranks = np.empty(matrix.shape, dtype=np.int64)
+    for j in range(matrix.shape[1]):
+        ranks[:, j] = np.searchsorted(ordered[:, j], oriented[:, j], side="left") + 1
+    return ranks
+
+
+def compare(ids, matrix, metrics=tuple(COMPARE_METRICS), pairwise=False):
+    matrix = np.asarray(matrix, dtype=np.float64).reshape(len(ids), len(metrics))
+    ids = np.asarray(ids)
+    higher = np.array([COMPARE_METRICS[m] for m in metrics])
+
+    ranks = rank(matrix, higher)
+    overall = rank(ranks.mean(axis=1, keepdims=True), np.array([False]))[:, 0]
+
+    empty = np.all(np.isnan(matrix), axis=0)
+    filled = np.where(np.isnan(matrix), np.where(higher, -np.inf, np.inf), matrix)
+    best_rows = np.where(higher, np.argmax(filled, axis=0), np.argmin(filled, axis=0))
+    best = matrix[best_rows, np.arange(len(metrics))]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns -> NaN
+        summary = {
+            "min": np.nanmin(matrix, axis=0),
+            "max": np.nanmax(matrix, axis=0),
+            "mean": np.nanmean(matrix, axis=0),
+            "median": np.nanmedian(matrix, axis=0),
+            "std": np.nanstd(matrix, axis=0),
+        }
+
+    result = {
+        "ids": ids.tolist(),
+        "metrics": list(metrics),
+        "higher_is_better": {m: bool(h) for m, h in zip(metrics, higher)},
+        "vectors": {m: _round(matrix[:, j]) for j, m in enumerate(metrics)},
+        "rankings": {m: ranks[:, j].tolist() for j, m in enumerate(metrics)},
+        "overall_rank": overall.tolist(),
+        "winners": {
+            m: None if empty[j] else {"id": ids[best_rows[j]].item(), "value": round(best[j].item(), 2)}
+            for j, m in enumerate(metrics)
+        },
+        "delta_vs_best": {m: _round(matrix[:, j] - best[j]) for j, m in enumerate(metrics)},
+        "summary": {m: {stat: _round(values[j:j + 1])[0] for stat, values in summary.items()} for j, m in enumerate(metrics)},
+        "pairwise_deltas": None,
+    }
+    if pairwise:
+        # deltas[m][i][j] = value of row i minus value of row j
+        deltas = matrix[:, None, :] - matrix[None, :, :]
+        result["pairwise_deltas"] = {m: _round(deltas[:, :, j]) for j, m in enumerate(metrics)}
+    return result
@@ -0,0 +1,185 @@
+import os
+import time
+
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, JSON, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session, sessionmaker
+
+from metrics import DB_COMMIT_SECONDS, DB_SESSION_SECONDS
+
+# Database Setup
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ibld.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# SQLite tuning: WAL lets readers (GET /workflows) proceed while /analyze
+# writes. synchronous=NORMAL only fsyncs at checkpoints: in WAL that is safe
+# from corruption, but a power loss can drop the most recent commits. The
+# write-behind writer uses its own synchronous=FULL connection (below).
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url):
+    """Async-driver flavour of ``url`` (``ASYNC_DATABASE_URL`` wins if set)."""
+    explicit = os.getenv("ASYNC_DATABASE_URL")
+    if explicit:
+        return explicit
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
+def _is_sqlite(url):
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url):
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def _engine_options(url):
+    if _is_memory_sqlite(url):
+        return {}  # single shared connection, no pool to size
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
+
+def _tune_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _tune_sqlite_durable(dbapi_connection, connection_record):
+    _tune_sqlite(dbapi_connection, connection_record)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=FULL")  # fsync on every commit
+    cursor.close()
+
+
+_connect_args = {"check_same_thread": False} if _is_sqlite(SQLALCHEMY_DATABASE_URL) else {}
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=_connect_args, **_engine_options(SQLALCHEMY_DATABASE_URL))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async path for the async handlers, so commits don't block the event loop
+async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), **_engine_options(SQLALCHEMY_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Group-commit writer (write_behind.py): one connection whose commits are
+# fsynced before the batch's ids are handed out
+if _is_sqlite(SQLALCHEMY_DATABASE_URL) and not _is_memory_sqlite(SQLALCHEMY_DATABASE_URL):
+    durable_async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), pool_size=1, max_overflow=0)
+else:
+    durable_async_engine = async_engine  # in-memory: must share the one database
+DurableAsyncSessionLocal = async_sessionmaker(durable_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+if _is_sqlite(SQLALCHEMY_DATABASE_URL):
+    event.listen(engine, "connect", _tune_sqlite)
+    event.listen(async_engine.sync_engine, "connect", _tune_sqlite)
+    if durable_async_engine is not async_engine:
+        event.listen(durable_async_engine.sync_engine, "connect", _tune_sqlite_durable)
+
+Base = declarative_base()
+
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+def get_db():
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        yield db
+    finally:
+        db.close()
+        DB_SESSION_SECONDS.observe(time.perf_counter() - started, kind="sync")
+
+async def get_async_db():
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        yield db
+    DB_SESSION_SECONDS.observe(time.perf_counter() - started, kind="async")
+
+class UserDB(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True)
+    hashed_password = Column(String)
+    role = Column(String, default="consultant")
+
+class WorkflowDB(Base):
+    __tablename__ = "workflows"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    description = Column(String)
+    created_at = Column(String)
+    input_data = Column(JSON)
+    result_data = Column(JSON)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    # Typed copies of result_data metrics so listings can filter/sort in SQL
+    severity = Column(String)
+    estimated_financial_loss = Column(Float)
+    clarity_score = Column(Integer, index=True)
+    waste_ratio = Column(Float, index=True)
+    # Normalized input hash (dedup.py): repeat /analyze calls reuse the stored row
+    input_hash = Column(String)
+
+    __table_args__ = (
+        # Keyset pagination: every listing order ends in id as the tie-breaker
+        Index("ix_workflows_owner_id_id", "owner_id", "id"),
+        Index("ix_workflows_loss_id", "estimated_financial_loss", "id"),
+        Index("ix_workflows_severity_id", "severity", "id"),
+        Index("ix_workflows_severity_loss_id", "severity", "estimated_financial_loss", "id"),
+        Index("ix_workflows_owner_loss_id", "owner_id", "estimated_financial_loss", "id"),
+        # Covering index for portfolio rollups (GET /workflows/stats)
+        Index("ix_workflows_portfolio", "severity", "estimated_financial_loss", "clarity_score", "waste_ratio"),
+        # Dedup probe: newest row for (owner, input hash)
+        Index("ix_workflows_owner_hash_id", "owner_id", "input_hash", "id"),
+    )
+
+class WorkflowVersionDB(Base):
+    """One saved state of a workflow; PATCH /workflows/{id} appends a row per change."""
+    __tablename__ = "workflow_versions"
+    id = Column(Integer, primary_key=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    created_at = Column(String)
+    changed_fields = Column(JSON)
+    input_data = Column(JSON)
+    result_data = Column(JSON)
+
+    __table_args__ = (
+        UniqueConstraint("workflow_id", "version", name="uq_workflow_versions_workflow_version"),
+    )
+
+class WorkflowGraphDB(Base):
+    """Optional step-level model of a workflow (see workflow_graph.py), one per workflow."""
+    __tablename__ = "workflow_graphs"
+    workflow_id = Column(Integer, ForeignKey("workflows.id"), primary_key=True)
+    updated_at = Column(String)
+    graph_data = Column(JSON)     # {"nodes": [...], "edges": [...]}
+    analysis_data = Column(JSON)  # critical path, slack, loss attribution
+
+class AIPointCacheDB(Base):
+    __tablename__ = "ai_point_cache"
+    key = Column(String, primary_key=True)
+    points = Column(JSON)
+    created_at = Column(Float, index=True)  # epoch seconds, drives TTL
@@ -0,0 +1,110 @@
+"""Input-hash deduplication for ``POST /analyze``.
+
+Double-clicks and client retries send the same ``WorkflowInput`` again. Every
+stored workflow carries ``input_hash``, a hash of its normalized input. If
+the same owner submits the same hash within ``ANALYZE_DEDUP_WINDOW_SECONDS``,
+``/analyze`` returns the stored row. It does not re-score, call the AI or
+insert. A duplicate that arrives while the first call is still running (not
+committed yet) joins it through ``single_flight.analyze_flights`` and gets
+the same id. ``?force=true`` always runs a fresh analysis.
+
+Normalization only removes differences that cannot change the analysis:
+
+* surrounding and repeated whitespace in text fields
+* tool order
+* numeric representation (``5`` vs ``5.0``)
+
+Case is kept, because the name and description are shown back to the user
+as entered.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from database import WorkflowDB
+
+ANALYZE_DEDUP_WINDOW_SECONDS = int(os.getenv("ANALYZE_DEDUP_WINDOW_SECONDS", "600"))
+# Bump when the normalization changes so old hashes stop matching
+INPUT_HASH_VERSION = "1"
+
+
+def _text(value):
+    return " ".join(str(value).split())
+
+
+def input_hash(data):
+    """Canonical SHA-256 of a WorkflowInput (or its dict)."""
+    fields = data if isinstance(data, dict) else data.model_dump()
+    payload = {"v": INPUT_HASH_VERSION}
+    for key, value in fields.items():
+        if key == "tools_used":
+            payload[key] = sorted(_text(t) for t in value or [])
+        elif isinstance(value, str):
+            payload[key] = _text(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            payload[key] = float(value)
+        else:
+            payload[key] = value
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class AnalyzeDeduplicator:
+    def __init__(self, window_seconds=ANALYZE_DEDUP_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.forced = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self):
+        return self.window_seconds > 0
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    async def find_recent(self, db, owner_id, digest):
+        """``(id, result_data)`` of the owner's newest row with this hash inside the window, else None."""
+        if not self.enabled:
+            return None
+        # created_at is an ISO string, so the window check compares strings
+        cutoff = (datetime.now() - timedelta(seconds=self.window_seconds)).isoformat()
+        row = (await db.execute(
+            select(WorkflowDB.id, WorkflowDB.result_data)
+            .where(
+                WorkflowDB.owner_id == owner_id,
+                WorkflowDB.input_hash == digest,
+                WorkflowDB.created_at >= cutoff,
+            )
+            .order_by(WorkflowDB.id.desc())
+            .limit(1)
+        )).first()
+        self._count("misses" if row is None else "hits")
+        return row
+
+    def record_forced(self):
+        self._count("forced")
+
+    def record_coalesced(self):
+        """A duplicate served by joining an in-flight analysis."""
+        self._count("coalesced")
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.window_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "forced": self.forced,
+            "coalesced": self.coalesced,
+        }
+
+
+analyze_dedup = AnalyzeDeduplicator()
@@ -0,0 +1,243 @@
+"""Off-loop export rendering on a bounded process pool.
+
+ReportLab and python-pptx rendering is CPU-bound, so it runs in worker
+processes instead of the API's event loop or thread pool. Admission is
+bounded: once ``EXPORT_QUEUE_LIMIT`` renders are queued or running, new ones
+are refused with ``ExportQueueFull`` and the API answers 503. Nothing queues
+up without limit.
+
+``ExportJobs`` layers the ``POST /exports`` job API on top: a job id is
+returned at once and the rendered artifact is collected later.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pptx_deck
+import reports
+
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(os.cpu_count() or 1)))
+EXPORT_QUEUE_LIMIT = int(os.getenv("EXPORT_QUEUE_LIMIT", "32"))
+EXPORT_JOB_RETENTION = int(os.getenv("EXPORT_JOB_RETENTION", "256"))
+EXPORT_JOB_RETENTION_BYTES = int(os.getenv("EXPORT_JOB_RETENTION_BYTES", str(64 * 1024 * 1024)))
+
+RENDERERS = {
+    "pdf": (reports.render_pdf_report, reports.PDF_MEDIA_TYPE),
+    "pptx": (pptx_deck.render_pptx, reports.PPTX_MEDIA_TYPE),
+    "pptx-short": (pptx_deck.render_pptx_short, reports.PPTX_MEDIA_TYPE),
+}
+EXPORT_FORMATS = tuple(RENDERERS)
+
+
+def warm_worker():
+    """Pool initializer: load ReportLab and parse the PPTX template once per worker process."""
+    reports.load_pdf_backend()
+    pptx_deck.load_template()
+
+
+def ping():
+    return os.getpid()
+
+
+def render(kind, snapshot):
+    """Worker-process entry point (module level so it pickles)."""
+    renderer, _ = RENDERERS[kind]
+    return renderer(snapshot)
+
+
+class ExportQueueFull(Exception):
+    pass
+
+
+class ExportPool:
+    def __init__(self, workers=EXPORT_WORKERS, max_pending=EXPORT_QUEUE_LIMIT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.deferred = 0
+        self._executor = None
+        self._lock = threading.Lock()  # done-callbacks fire on the pool's thread
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # spawn: workers import only the renderers, never the API module
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_worker,
+            )
+        return self._executor
+
+    def submit(self, kind, snapshot, reserve=0):
+        """Admit a render or raise ``ExportQueueFull``. Returns a concurrent future.
+
+        ``reserve`` slots are kept free for other callers: background work
+        (bulk exports) passes one so interactive exports are never refused
+        because of it.
+        """
+        with self._lock:
+            if self.in_flight >= self.max_pending - reserve:
+                if reserve:
+                    self.deferred += 1
+                else:
+                    self.rejected += 1
+                raise ExportQueueFull()
+            self.in_flight += 1
+        future = self.executor.submit(render, kind, snapshot)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def render(self, kind, snapshot, reserve=0):
+        return await asyncio.wrap_future(self.submit(kind, snapshot, reserve))
+
+    def warm(self):
+        """Start every worker now, so the first export doesn't pay for spawn + warm_worker."""
+        futures = [self.executor.submit(ping) for _ in range(self.workers)]
+        return {future.result() for future in futures}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "deferred": self.deferred,
+        }
+
+
+class ExportJob:
+    def __init__(self, kind, workflow_id):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.workflow_id = workflow_id
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.filename = None
+        self.content = None
+        self.error = None
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return "failed"
+        if self.content is not None:
+            return "done"
+        if self.future is not None and self.future.running():
+            return "running"
+        return "queued"
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "workflow_id": self.workflow_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "filename": self.filename,
+            "size": len(self.content) if self.content is not None else None,
+            "error": self.error,
+        }
+
+
+class ExportJobs:
+    """Job registry; finished jobs beyond ``retention`` (count) or ``max_bytes``
+    (artifact bytes held) are forgotten oldest-first. Queued and running jobs
+    are never dropped."""
+
+    def __init__(self, pool, retention=EXPORT_JOB_RETENTION, max_bytes=EXPORT_JOB_RETENTION_BYTES):
+        self.pool = pool
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()  # jobs finish on the pool's thread
+
+    def _evict(self, keep=None):
+        """Drop finished jobs oldest-first until both limits hold. Caller holds the lock."""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.retention and self.bytes <= self.max_bytes:
+                break
+            job = self._jobs[job_id]
+            if job.finished_at is None or job is keep:
+                continue
+            del self._jobs[job_id]
+            if job.content is not None:
+                self.bytes -= len(job.content)
+
+    def _finished(self, job, filename=None, content=None, error=None):
+        with self._lock:
+            job.filename, job.content, job.error = filename, content, error
+            job.finished_at = time.time()
+            if content is not None and job.id in self._jobs:
+                self.bytes += len(content)
+            # The job just finished stays even if it alone exceeds max_bytes
+            self._evict(keep=job)
+
+    def completed(self, kind, workflow_id, filename, content):
+        """Register a job that is already done (e.g. served from the artifact cache)."""
+        job = ExportJob(kind, workflow_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._finished(job, filename, content)
+        return job
+
+    def submit(self, kind, snapshot, on_success=None):
+        job = ExportJob(kind, snapshot["id"])
+        job.future = self.pool.submit(kind, snapshot)  # may raise ExportQueueFull
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+
+        def finish(future):
+            if future.cancelled():
+                self._finished(job, error="cancelled")
+            elif future.exception() is not None:
+                self._finished(job, error=str(future.exception()))
+            else:
+                self._finished(job, *future.result())
+                if on_success is not None:
+                    on_success(job.filename, job.content)
+
+        job.future.add_done_callback(finish)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            held = self.bytes
+        counts = {status: statuses.count(status) for status in ("queued", "running", "done", "failed")}
+        return {**counts, "bytes": held, "max_bytes": self.max_bytes}
+
+
+export_pool = ExportPool()
+export_jobs = ExportJobs(export_pool)
@@ -0,0 +1,452 @@
+"""Vectorized loss engine.
+
+The friction / rework / investment math that used to live inline in
+``analyze_workflow``, rewritten to operate on NumPy arrays so that one call
+can score a single workflow or an entire department at once.
+
+Every function takes a dict of equally-shaped arrays keyed by the
+``WorkflowInput`` field names (``tools_used`` is replaced by ``tool_count``)
+and returns a dict of arrays. Row ``i`` of every output belongs to row ``i``
+of the inputs.
+"""
+import time
+
+import numpy as np
+
+# Field order used when turning WorkflowInput-like objects into arrays
+INPUT_FIELDS = (
+    "people_involved",
+    "approvals_per_task",
+    "tool_count",
+    "avg_delays_hours",
+    "rejection_rate",
+    "monthly_volume",
+    "avg_annual_salary",
+    "total_project_budget",
+)
+
+# Severity thresholds on weekly financial loss (INR)
+SEVERITY_HIGH = 500000
+SEVERITY_MEDIUM = 100000
+SEVERITY_LABELS = np.array(["Low", "Medium", "High"])
+
+# Tools a process can use before each extra one adds hand-off friction
+FREE_TOOLS = 2
+
+HOURS_PER_YEAR = 2000  # 50 weeks * 40 hours
+WEEKS_PER_YEAR = 50
+
+
+def scalars(data):
+    """One WorkflowInput (or dict) as the scalar inputs ``compute`` expects."""
+    return {f: v[0].item() for f, v in to_arrays([data]).items()}
+
+
+def to_arrays(rows):
+    """Column-ize a sequence of WorkflowInput models (or plain dicts)."""
+    rows = [r if isinstance(r, dict) else r.model_dump() for r in rows]
+    cols = {}
+    for field in INPUT_FIELDS:
+        if field == "tool_count":
+            values = [len(r.get("tools_used") or []) for r in rows]
+        else:
+            values = [r[field] for r in rows]
+        cols[field] = np.asarray(values, dtype=np.float64)
+    return cols
+
+
+def friction(people, approvals, tools, delays, rejection):
+    """PER-RUN friction hours: (tool, approval, delay, rework). Broadcasts."""
+    tool_friction = np.maximum(0, tools - FREE_TOOLS) * 0.5 * people
+    approval_friction = approvals * people * 1.5
+    base_delay_impact = delays * people
+    rework_impact = (base_delay_impact + approval_friction) * (rejection / 100) * 1.5
+    return tool_friction, approval_friction, base_delay_impact, rework_impact
+
+
+def annual_loss(time_loss_per_run, hourly_rate, volume):
+    return time_loss_per_run * hourly_rate * volume * 12
+
+
+def compute(cols):
+    """Score every row of ``cols``. Pure NumPy, no Python loop over rows."""
+    people = cols["people_involved"]
+    approvals = cols["approvals_per_task"]
+    tools = cols["tool_count"]
+    delays = cols["avg_delays_hours"]
+    rejection = cols["rejection_rate"]
+    volume = cols["monthly_volume"]
+    salary = cols["avg_annual_salary"]
+    budget = cols["total_project_budget"]
+
+    tool_friction, approval_friction, base_delay_impact, rework_impact = friction(people, approvals, tools, delays, rejection)
+    time_loss_per_run = tool_friction + approval_friction + base_delay_impact + rework_impact
+
+    # Financials, scaled by volume
+    hourly_rate = salary / HOURS_PER_YEAR
+    annual_financial_loss = annual_loss(time_loss_per_run, hourly_rate, volume)
+    financial_loss_weekly = annual_financial_loss / WEEKS_PER_YEAR
+    weekly_time_loss = (time_loss_per_run * volume * 12) / WEEKS_PER_YEAR
+
+    # Investment base: trust the entered budget, fall back to personnel cost
+    total_investment = np.where(budget > 0, budget, salary * people)
+    safe_investment = np.where(total_investment > 0, total_investment, 1.0)
+    waste_ratio = np.where(total_investment > 0, annual_financial_loss / safe_investment * 100, 0.0)
+
+    severity_code = (financial_loss_weekly > SEVERITY_MEDIUM).astype(np.int8) + (financial_loss_weekly > SEVERITY_HIGH)
+
+    clarity = np.clip(100 - people * 2 - tools * 5 - approvals * 10, 10, 100)
+
+    # Decision Delay Index: share of wait time in the cycle, scaled to 0-10
+    active_work_time = people * 2
+    total_wait_time = delays * people + approvals * 24
+    total_cycle_time = active_work_time + total_wait_time
+    safe_cycle = np.where(total_cycle_time > 0, total_cycle_time, 1.0)
+    ddi = np.where(total_cycle_time > 0, total_wait_time / safe_cycle * 10, 0.0)
+
+    # Simulator: savings from dropping a single approval
+    new_loss = tool_friction + (approvals - 1) * people * 1.5 + base_delay_impact
+    savings_approval = np.where(approvals > 1, (weekly_time_loss - new_loss) * hourly_rate, 0.0)
+
+    return {
+        "tool_friction": tool_friction,
+        "approval_friction": approval_friction,
+        "base_delay_impact": base_delay_impact,
+        "rework_impact": rework_impact,
+        "time_loss_per_run": time_loss_per_run,
+        "hourly_rate": hourly_rate,
+        "annual_financial_loss": annual_financial_loss,
+        "financial_loss_weekly": financial_loss_weekly,
+        "weekly_time_loss": weekly_time_loss,
+        "total_investment": total_investment,
+        "waste_ratio": waste_ratio,
+        "severity_code": severity_code,
+        "clarity_score": clarity,
+        "decision_delay_index": ddi,
+        "savings_approval": savings_approval,
+    }
+
+
+# --- Sensitivity (tornado) analysis ---
+
+SENSITIVITY_INPUTS = (
+    "people_involved",
+    "approvals_per_task",
+    "tool_count",
+    "avg_delays_hours",
+    "rejection_rate",
+    "monthly_volume",
+    "avg_annual_salary",
+)
+INTEGER_INPUTS = {"people_involved", "approvals_per_task", "tool_count", "monthly_volume"}
+
+# Smallest half-width of a perturbation, so inputs sitting at zero still move
+MIN_HALF_SPAN = {
+    "people_involved": 1,
+    "approvals_per_task": 1,
+    "tool_count": 1,
+    "avg_delays_hours": 1.0,
+    "rejection_rate": 5.0,
+    "monthly_volume": 1,
+    "avg_annual_salary": 100000.0,
+}
+UPPER_BOUNDS = {"rejection_rate": 100.0}
+
+
+def sensitivity(base, range_pct=0.2, steps=5, inputs=SENSITIVITY_INPUTS):
+    """Perturb each input of one workflow across +/- ``range_pct`` in one pass.
+
+    ``base`` is a dict of scalars keyed like ``INPUT_FIELDS``. Every input gets
+    ``steps`` evenly spaced values; all ``len(inputs) * steps`` scenarios plus
+    the baseline are scored by a single ``compute`` call. Results are sorted by
+    swing (largest first), which is the order a tornado chart wants.
+    """
+    n_inputs = len(inputs)
+    n = n_inputs * steps + 1  # last row is the untouched baseline
+    cols = {f: np.full(n, float(base[f])) for f in INPUT_FIELDS}
+
+    grids = []
+    for j, field in enumerate(inputs):
+        value = float(base[field])
+        half = max(abs(value) * range_pct, MIN_HALF_SPAN[field])
+        low = max(0.0, value - half)
+        high = min(UPPER_BOUNDS.get(field, np.inf), value + half)
+        grid = np.linspace(low, high, steps)
+        if field in INTEGER_INPUTS:
+            grid = np.rint(grid)
+        cols[field][j * steps:(j + 1) * steps] = grid
+        grids.append(grid)
+
+    weekly = compute(cols)["financial_loss_weekly"]
+    baseline = weekly[-1].item()
+    curves = weekly[:-1].reshape(n_inputs, steps)
+
+    results = []
+    for field, grid, curve in zip(inputs, grids, curves):
+        dx = grid[-1] - grid[0]
+        results.append({
+            "input": field,
+            "base_value": float(base[field]),
+            "low_value": grid[0].item(),
+            "high_value": grid[-1].item(),
+            "loss_at_low": round(curve[0].item(), 2),
+            "loss_at_high": round(curve[-1].item(), 2),
+            "swing": round(abs(curve[-1] - curve[0]).item(), 2),
+            "marginal_weekly_loss_per_unit": round(((curve[-1] - curve[0]) / dx).item(), 2) if dx > 0 else 0.0,
+            "curve": [{"value": v, "weekly_loss": round(l, 2)} for v, l in zip(grid.tolist(), curve.tolist())],
+        })
+    results.sort(key=lambda r: r["swing"], reverse=True)
+
+    return {"baseline_weekly_loss": round(baseline, 2), "range_pct": range_pct, "steps": steps, "inputs": results}
+
+
+# --- Monte Carlo confidence bands ---
+
+DELAY_SHAPE = 4.0          # gamma shape for delays: coefficient of variation 0.5
+REJECTION_CONCENTRATION = 20.0  # beta(a, b) with a + b = 20 around the entered rate
+
+
+def simulate_confidence(base, samples=100000, seed=None, budget_ms=25.0, chunk_size=25000):
+    """P10/P50/P90 of weekly loss with delays, rejection rate and volume as distributions.
+
+    Delays are gamma-distributed around the entered average, the rejection
+    rate is beta-distributed around the entered percentage and monthly volume
+    is Poisson. Samples are drawn in vectorized chunks from a seeded
+    ``default_rng``. With a ``budget_ms`` the first chunk is timed and the
+    sample count is capped up front to whole chunks that fit the budget;
+    after that the draw never looks at the clock. The band is therefore a pure
+    function of ``seed`` and the drawn count, which ``samples`` in the result
+    reports: re-running with that count and ``budget_ms=None`` reproduces it
+    exactly on any machine.
+    """
+    rng = np.random.default_rng(seed)
+    delay_mean = float(base["avg_delays_hours"])
+    rejection_mean = min(max(float(base["rejection_rate"]), 0.0), 100.0) / 100
+    volume_mean = max(float(base["monthly_volume"]), 0.0)
+
+    people = float(base["people_involved"])
+    approvals = float(base["approvals_per_task"])
+    tools = float(base["tool_count"])
+    hourly_rate = float(base["avg_annual_salary"]) / HOURS_PER_YEAR
+
+    def draw(n):
+        delays = rng.gamma(DELAY_SHAPE, delay_mean / DELAY_SHAPE, n) if delay_mean > 0 else 0.0
+        if 0 < rejection_mean < 1:
+            a = rejection_mean * REJECTION_CONCENTRATION
+            rejection = rng.beta(a, REJECTION_CONCENTRATION - a, n) * 100
+        else:
+            rejection = rejection_mean * 100
+        volume = rng.poisson(volume_mean, n)
+
+        # Scalars broadcast against the sampled columns
+        time_loss_per_run = sum(friction(people, approvals, tools, delays, rejection))
+        return annual_loss(time_loss_per_run, hourly_rate, volume) / WEEKS_PER_YEAR
+
+    started = time.perf_counter()
+    done = min(chunk_size, samples)
+    drawn = [draw(done)]
+    target = samples
+    if budget_ms is not None and done < samples:
+        chunk_ms = max((time.perf_counter() - started) * 1000, 1e-6)
+        target = min(samples, max(1, int(budget_ms // chunk_ms)) * chunk_size)
+    while done < target:
+        n = min(chunk_size, target - done)
+        drawn.append(draw(n))
+        done += n
+
+    p10, p50, p90 = np.percentile(np.concatenate(drawn), [10, 50, 90]).tolist()
+    return {
+        "lower": round(p10, 2),
+        "upper": round(p90, 2),
+        "p10": round(p10, 2),
+        "p50": round(p50, 2),
+        "p90": round(p90, 2),
+        "method": "monte_carlo",
+        "samples": done,
+        "samples_requested": samples,
+        "seed": seed,
+    }
+
+
+def row(metrics, i):
+    """Pull row ``i`` out of a ``compute`` result as plain Python floats."""
+    return {k: v[i].item() for k, v in metrics.items()}
+
+
+def rows(metrics):
+    """Iterate over a ``compute`` result row by row as plain Python floats."""
+    columns = {k: v.tolist() for k, v in metrics.items()}
+    for values in zip(*columns.values()):
+        yield dict(zip(columns.keys(), values))
+
+
+# --- Heuristic narrative (per-row, text only) ---
+
+def heuristic_loss_points(data):
+    """Invisible loss points with root causes and blindness reasons."""
+    loss_points = []
+    tool_count = len(data.tools_used)
+
+    if tool_count > 3:
+        loss_points.append({
+            "title": "Cognitive Context Switching",
+            "reason": f"Workflow spans {tool_count} distinct platforms, forcing mental re-calibration.",
+            "root_cause": "Fragmented IT procurement allowed departments to adopt isolated tools without integration strategy.",
+            "blindness_reason": "License costs are visible in budgets, but 'attention residue' time loss does not appear on P&L.",
+            "impact": "Reduces deep-work capacity by ~20%."
+        })
+    elif tool_count == 0:
+        loss_points.append({
+            "title": "Digital Opacity",
+            "reason": "Process relies entirely on verbal/manual transmission.",
+            "root_cause": "Historical preference for 'speed' over 'structure' during early company growth.",
+            "blindness_reason": "Errors are blamed on 'human mistake' rather than 'system design'.",
+            "impact": "High risk of tribal knowledge loss."
+        })
+
+    if data.approvals_per_task > 2:
+        loss_points.append({
+            "title": "Decision Latency Accumulation",
+            "reason": f"Requires {data.approvals_per_task} distinct sign-offs, creating exponential delays.",
+            "root_cause": "Lack of delegated authority; fear of making autonomous wrong decisions.",
+            "blindness_reason": "Managers feel 'productive' when approving, ignoring the cost of the queue they create.",
+            "impact": "Cycle time extends 4x beyond actual working hours."
+        })
+
+    if data.people_involved > 6:
+        loss_points.append({
+            "title": "Communication Overhead Entropy",
+            "reason": f"{data.people_involved} active participants creates ~{data.people_involved * (data.people_involved - 1) // 2} communication pathways.",
+            "root_cause": "In clear definition of 'consulted' vs 'responsible' (RACI) roles.",
+            "blindness_reason": "Large meetings feel like 'collaboration', hiding the reality of 'consensus paralysis'.",
+            "impact": "15% of total time lost clarifying requirements."
+        })
+
+    return loss_points
+
+
+def recommendations(data, m):
+    """Recommendations & scenario simulator hints for one scored row."""
+    recs = []
+
+    if data.approvals_per_task > 1:
+        recs.append({
+            "type": "Simplify",
+            "action": "Implement 'Negative Consent' protocol.",
+            "impact": f"Projected Savings: ₹{int(m['savings_approval']):,}/week",
+            "simulator_action": "Reduce Approvals by 1"
+        })
+
+    if len(data.tools_used) > 3:
+        recs.append({
+            "type": "Automate",
+            "action": "Unify Data Ingestion Layer.",
+            "impact": "Recovers 10+ hours/week per person.",
+            "simulator_action": "Consolidate Tools"
+        })
+
+    if data.people_involved > 5:
+        recs.append({
+            "type": "Restructure",
+            "action": "Split into Two-Pizza Teams.",
+            "impact": "Reduces coordination overhead by 40%.",
+            "simulator_action": "Reduce Team Size"
+        })
+
+    return recs or [{
+        "type": "Review",
+        "action": "Conduct a detailed process audit.",
+        "impact": "Uncover further hidden constraints."
+    }]
+
+
+def flat_band(financial_loss_weekly):
+    # Standard deviation heuristic +/- 15% for ambiguity
+    return {
+        "lower": round(financial_loss_weekly * 0.85, 2),
+        "upper": round(financial_loss_weekly * 1.15, 2)
+    }
+
+
+def build_result(data, m, loss_points, benchmark_score):
+    """Assemble the ``LossAnalysis`` payload for one row of ``compute``."""
+    financial_loss_weekly = m["financial_loss_weekly"]
+
+    return {
+        "weekly_time_loss_hours": round(m["weekly_time_loss"], 1),
+        "estimated_financial_loss": round(financial_loss_weekly, 2),
+        "confidence_interval": flat_band(financial_loss_weekly),
+        "decision_delay_index": min(10, round(m["decision_delay_index"], 1)),
+        "industry_benchmark_score": benchmark_score,
+        "rework_loss_hours": round(m["rework_impact"], 1),
+        "waste_ratio": round(m["waste_ratio"], 1),
+        "total_investment": round(m["total_investment"], 2),
+        "severity": str(SEVERITY_LABELS[int(m["severity_code"])]),
+        "clarity_score": int(m["clarity_score"]),
+        "invisible_loss_points": loss_points,
+        "recommendations": recommendations(data, m),
+    }
+
+
+# --- Incremental re-analysis (PATCH /workflows/{id}) ---
+
+_TIME_INPUTS = frozenset({
+    "people_involved", "approvals_per_task", "tools_used",
+    "avg_delays_hours", "rejection_rate", "monthly_volume",
+})
+_MONEY_INPUTS = _TIME_INPUTS | {"avg_annual_salary"}
+
+# LossAnalysis key -> WorkflowInput fields it is derived from. Keys not listed
+# here (industry_benchmark_score, invisible_loss_points) are handled by the caller.
+RESULT_DEPENDENCIES = {
+    "weekly_time_loss_hours": _TIME_INPUTS,
+    "estimated_financial_loss": _MONEY_INPUTS,
+    "confidence_interval": _MONEY_INPUTS,
+    "severity": _MONEY_INPUTS,
+    "waste_ratio": _MONEY_INPUTS | {"total_project_budget"},
+    "total_investment": frozenset({"total_project_budget", "avg_annual_salary", "people_involved"}),
+    "decision_delay_index": frozenset({"people_involved", "avg_delays_hours", "approvals_per_task"}),
+    "rework_loss_hours": frozenset({"people_involved", "approvals_per_task", "avg_delays_hours", "rejection_rate"}),
+    "clarity_score": frozenset({"people_involved", "approvals_per_task", "tools_used"}),
+    # The approval-savings figure in the text moves with the whole loss model
+    "recommendations": _MONEY_INPUTS,
+}
+
+
+def changed_fields(old, new):
+    """Input fields whose value differs between two ``WorkflowInput`` dicts."""
+    return {f for f in new if old.get(f) != new[f]}
+
+
+def affected_results(changed):
+    return {key for key, deps in RESULT_DEPENDENCIES.items() if deps & changed}
+
+
+def update_result(data, previous, changed, loss_points, seed=None):
+    """``previous`` with only the results that depend on ``changed`` recomputed.
+
+    The loss model is scored once for the row when any numeric input moved.
+    That is a single vectorized pass and costs microseconds. Keys the change
+    can't affect are carried over untouched. A Monte Carlo confidence band is
+    re-sampled for the new inputs. It keeps the sample count the stored band
+    actually drew (uncapped) and uses ``seed``, or the stored seed when
+    ``seed`` is None. The band itself changes with the inputs; only the
+    sampling settings carry over.
+    """
+    result = dict(previous)
+    result["invisible_loss_points"] = loss_points
+    affected = affected_results(changed)
+    if not affected:
+        return result
+
+    fresh = build_result(data, row(compute(to_arrays([data])), 0), loss_points, previous.get("industry_benchmark_score"))
+    for key in affected:
+        result[key] = fresh[key]
+
+    band = previous.get("confidence_interval") or {}
+    if "confidence_interval" in affected and band.get("method") == "monte_carlo":
+        result["confidence_interval"] = {
+            **simulate_confidence(scalars(data), samples=band["samples"], seed=band.get("seed") if seed is None else seed, budget_ms=None),
+            "samples_requested": band.get("samples_requested", band["samples"]),
+        }
+    return result
@@ -1,41 +1,95 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, File, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import List, Optional
-import random
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
 import os
 import json
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, JSON, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+import zlib
+import base64
+import numpy as np
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.dml.color import RGBColor
 
-# Load Environment Variables
+# Load Environment Variables (before local modules read their settings)
 load_dotenv()
 
-app = FastAPI(title="LUMINA Operational Intelligence")
+import ai_reasoning
+import bulk_export
+import bulk_import
+import comparison
+import loss_engine
+import metrics
+import optimizer
+import workflow_graph
+from ai_cache import ai_point_cache
+from artifact_cache import artifact_cache, content_hash, make_etag
+from export_jobs import EXPORT_FORMATS, RENDERERS, ExportQueueFull, export_jobs, export_pool
+from reports import workflow_snapshot
+from single_flight import ai_flights, analyze_flights, export_flights
+from auth_cache import Principal, principal_cache
+from dedup import analyze_dedup, input_hash
+from database import AsyncSessionLocal, Base, async_engine, durable_async_engine, engine, get_async_db, get_db, SessionLocal, UserDB, WorkflowDB, WorkflowGraphDB, WorkflowVersionDB
+from migrations import run_migrations, workflow_metric_values
+from peer_index import peer_index
+from write_behind import WRITE_BEHIND_ENABLED, analysis_writer
 
-# Database Setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./ibld.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# --- STARTUP WARM-UP ---
+# Export renderers and the AI client load lazily; STARTUP_WARMUP=all (or a
+# comma list of hook names) pays those costs at boot instead of on first use.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+logger = logging.getLogger(__name__)
+
+def _warm_ai():
+    ai_reasoning.get_model()
+
+def _warm_exports():
+    export_pool.warm()
+
+WARMUP_HOOKS = {"ai": _warm_ai, "exports": _warm_exports}
+
+def run_warmup(names=STARTUP_WARMUP):
+    selected = list(WARMUP_HOOKS) if names.strip() == "all" else [n.strip() for n in names.split(",") if n.strip()]
+    timings = {}
+    for name in selected:
+        if name not in WARMUP_HOOKS:
+            logger.warning("Unknown warm-up hook: %s", name)
+            continue
+        started = datetime.now()
+        try:
+            WARMUP_HOOKS[name]()
+        except Exception as e:
+            logger.warning("Warm-up hook %s failed: %s", name, e)
+        timings[name] = round((datetime.now() - started).total_seconds() * 1000, 1)
+    return timings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WRITE_BEHIND_ENABLED:
+        analysis_writer.start()
+    if STARTUP_WARMUP:
+        logger.info("Warm-up (ms): %s", await asyncio.to_thread(run_warmup))
+    yield
+    # Drain queued analyses before anything else goes away
+    await analysis_writer.stop()
+    export_pool.shutdown()
+    password_executor.shutdown(wait=False)
+    await async_engine.dispose()
+    await durable_async_engine.dispose()
+
+app = FastAPI(title="LUMINA Operational Intelligence", lifespan=lifespan)
 
 # --- AUTH CONFIG ---
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_insecure_dev_key")
@@ -45,47 +99,56 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-class UserDB(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
-    role = Column(String, default="consultant")
-
-class WorkflowDB(Base):
-    __tablename__ = "workflows"
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String)
-    created_at = Column(String)
-    input_data = Column(JSON)
-    result_data = Column(JSON)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+ai_point_cache.purge_expired()
+peer_index.load(SessionLocal)
 
 # --- AUTH HELPERS ---
+# pbkdf2 is deliberately slow; keep it on its own small pool so a login storm
+# queues here instead of occupying the threads every sync handler needs.
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+password_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="pwd-hash")
+
 def verify_password(plain, hashed): return pwd_context.verify(plain, hashed)
 def get_password_hash(password): return pwd_context.hash(password)
+
+async def run_password_task(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None: raise HTTPException(status_code=401)
     except JWTError: raise HTTPException(status_code=401)
-    user = db.query(UserDB).filter(UserDB.username == username).first()
-    if user is None: raise HTTPException(status_code=401)
-    return user
+
+    db = SessionLocal()
+    try:
+        user = db.query(UserDB).filter(UserDB.username == username).first()
+        if user is None: raise HTTPException(status_code=401)
+        principal = Principal(id=user.id, username=user.username, role=user.role)
+    finally:
+        db.close()
+
+    principal_cache.put(token, principal, payload["exp"])
+    return principal
 
 # CORS Setup
 origins = ["*"]
 
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -113,6 +176,8 @@ class LossAnalysis(BaseModel):
     severity: str
     clarity_score: int
     industry_benchmark_score: int
+    peer_benchmark: Optional[dict] = None
+    deduplicated: bool = False
     decision_delay_index: float
     rework_loss_hours: float
     waste_ratio: float
@@ -121,548 +186,790 @@ class LossAnalysis(BaseModel):
     invisible_loss_points: List[dict]
     recommendations: List[dict]
 
+# --- WORKFLOW LISTING ---
+WORKFLOW_PAGE_MAX = 200
+WORKFLOW_SUMMARY_COLUMNS = (
+    WorkflowDB.id,
+    WorkflowDB.name,
+    WorkflowDB.description,
+    WorkflowDB.created_at,
+    WorkflowDB.owner_id,
+    WorkflowDB.severity,
+    WorkflowDB.estimated_financial_loss,
+)
+
+def encode_cursor(values: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, dict) or "id" not in values or "loss" not in values:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
 @app.get("/workflows")
-def get_workflows(db: Session = Depends(get_db)):
-    return db.query(WorkflowDB).all()
+def get_workflows(
+    limit: int = Query(50, ge=1, le=WORKFLOW_PAGE_MAX),
+    cursor: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    severity: Optional[str] = None,
+    sort: str = Query("recent", pattern="^(recent|loss)$"),
+    view: str = Query("summary", pattern="^(summary|full)$"),
+    db: Session = Depends(get_db)
+):
+    # Keyset pagination: the cursor carries the last row's sort key, so every
+    # page is an index range scan no matter how deep the client pages.
+    if view == "full":
+        query = db.query(WorkflowDB)
+    else:
+        query = db.query(*WORKFLOW_SUMMARY_COLUMNS)
 
-@app.post("/analyze", response_model=LossAnalysis)
-async def analyze_workflow(data: WorkflowInput, db: Session = Depends(get_db), current_user: UserDB = Depends(get_current_user)):
-    # Core Logic for Estimation & Benchmarking
-    
-    # 1. Benchmarking (Mock Data per Industry Standard)
-    industry_benchmark_score = random.randint(65, 85)
-    
-    # ... existing calculations ...
-    # THESE ARE PER-RUN CALCULATIONS
-    tool_friction = max(0, len(data.tools_used) - 2) * 0.5 * data.people_involved
-    approval_friction = data.approvals_per_task * data.people_involved * 1.5 
-    base_delay_impact = data.avg_delays_hours * data.people_involved
-
-    # NEW: Rework Logic
-    rework_impact = (base_delay_impact + approval_friction) * (data.rejection_rate / 100) * 1.5
-    
-    # Total Time Loss PER RUN
-    time_loss_per_run = tool_friction + approval_friction + base_delay_impact + rework_impact
-    
-    # 2. Financial Loss & Investment Analysis
-    # Hourly Rate = Annual Salary / (50 weeks * 40 hours) -> ~2000 hours
-    hourly_rate = data.avg_annual_salary / 2000
-    
-    # Financial Loss PER RUN
-    financial_loss_per_run = time_loss_per_run * hourly_rate
-    
-    # SCALING BY VOLUME
-    # We assume 'monthly_volume' is how often this process runs per month.
-    # Weekly loss = (Per Run * Monthly Volume) / 4 (approx)
-    # Annual loss = (Per Run * Monthly Volume) * 12
-    
-    annual_financial_loss = financial_loss_per_run * data.monthly_volume * 12
-    financial_loss_weekly = annual_financial_loss / 50 # Standardized weekly view for dashboard consistency
-    
-    # Update returned metric name for clarity (variable re-use)
-    # weekly_time_loss is actually display variable
-    weekly_time_loss = (time_loss_per_run * data.monthly_volume * 12) / 50
-
-    # Total Investment Logic (Fixed per user request)
-    # The user enters the specific "Total Project Budget". We trust this number as the Investment Base.
-    # If they enter 0, we fallback to estimating it via personnel cost.
-    estimated_personnel_cost = data.avg_annual_salary * data.people_involved
-    
-    total_annual_investment = data.total_project_budget
-    if total_annual_investment <= 0:
-        total_annual_investment = estimated_personnel_cost # Fallback
+    if owner_id is not None:
+        query = query.filter(WorkflowDB.owner_id == owner_id)
+    if severity is not None:
+        query = query.filter(WorkflowDB.severity == severity)
 
-    # Annualized Loss (Already calculated above)
-    # annual_financial_loss = financial_loss_weekly * 50  <-- We now derive this FROM volume
-    
-    # Waste Ratio
-    waste_ratio = 0
-    if total_annual_investment > 0:
-        waste_ratio = round((annual_financial_loss / total_annual_investment) * 100, 1)
-
-    # 3. Severity (Dynamic based on % of Investment Wasted)
-    if financial_loss_weekly > 500000:
-        severity = "High"
-    elif financial_loss_weekly > 100000:
-        severity = "Medium"
+    after = decode_cursor(cursor) if cursor else None
+    if sort == "loss":
+        if after:
+            query = query.filter(or_(
+                WorkflowDB.estimated_financial_loss < after["loss"],
+                and_(WorkflowDB.estimated_financial_loss == after["loss"], WorkflowDB.id < after["id"]),
+            ))
+        query = query.order_by(WorkflowDB.estimated_financial_loss.desc(), WorkflowDB.id.desc())
     else:
-        severity = "Low"
-        
-    # 4. Clarity Score (0-100)
-    # Deduct points for high people, high tools, high approvals
-    clarity = 100
-    clarity -= (data.people_involved * 2)
-    clarity -= (len(data.tools_used) * 5)
-    clarity -= (data.approvals_per_task * 10)
-    clarity = max(10, min(100, clarity))
-    
-    # 5. Invisible Loss Points & AI Reasoning (Heuristic Simulation of Consultant Logic)
-    loss_points = []
-    
-    # Analyze Tool Fragmentation
-    if len(data.tools_used) > 3:
-        loss_points.append({
-            "title": "Cognitive Context Switching",
-            "reason": f"Workflow spans {len(data.tools_used)} distinct platforms ({', '.join(data.tools_used[:3])}...), forcing frequent mental re-calibration.",
-            "impact": "Reduces deep-work capacity by ~20% per additional tool; increases error rate."
-        })
-    elif len(data.tools_used) == 0:
-        loss_points.append({
-            "title": "Digital Opacity",
-            "reason": "Lack of defined digital toolset implies reliance on unstructured verbal/manual transmission.",
-            "impact": "High risk of tribal knowledge loss and zero auditability."
-        })
-
-    # Analyze Approval Friction
-    if data.approvals_per_task > 2:
-        loss_points.append({
-            "title": "Decision Latency Accumulation",
-            "reason": f"Requires {data.approvals_per_task} distinct sign-offs. If sequential, this creates exponential delay chains.",
-            "impact": "cycle time extends 4x beyond actual working hours due to asynchronous availability."
-        })
-    
-    # Analyze Team Scale vs Complexity
-    if data.people_involved > 6:
-        loss_points.append({
-            "title": "Communication Overhead Entropy",
-            "reason": f"{data.people_involved} active participants creates potentially {data.people_involved * (data.people_involved - 1) // 2} communication pathways.",
-            "impact": "Information asymmetry increases; projected 15% of time lost clarifyng requirements."
-        })
-    
-    # Analyze Delays
-    if data.avg_delays_hours > 4:
-         loss_points.append({
-            "title": "Idle Capital Detection",
-            "reason": "Significant 'wait states' detected between process steps.",
-            "impact": "Resources are allocated but blocked; effectively paying for downtime."
-        })
-
-    # Feature: Decision Delay Index (DDI)
-    # Ratio of "Wait Time" to "Total Cycle Time". Higher is worse.
-    # Estimate active work time per person per task ~ 2 hours (heuristic)
-    active_work_time = data.people_involved * 2 
-    total_wait_time = (data.avg_delays_hours * data.people_involved) + (data.approvals_per_task * 24)
-    total_cycle_time = active_work_time + total_wait_time
-    
-    decision_delay_index = round((total_wait_time / total_cycle_time) * 10, 1) if total_cycle_time > 0 else 0
-    decision_delay_index = min(10, decision_delay_index)
+        if after:
+            query = query.filter(WorkflowDB.id < after["id"])
+        query = query.order_by(WorkflowDB.id.desc())
 
-    # Feature: Confidence Bands
-    # Standard deviation heuristic +/- 15% for ambiguity
-    loss_lower_bound = financial_loss_weekly * 0.85
-    loss_upper_bound = financial_loss_weekly * 1.15
+    # One extra row tells us whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
-    # 5. Invisible Loss Points (Enhanced with Root Causes & Blindness)
-    loss_points = []
-    
-    if len(data.tools_used) > 3:
-        loss_points.append({
-            "title": "Cognitive Context Switching",
-            "reason": f"Workflow spans {len(data.tools_used)} distinct platforms, forcing mental re-calibration.",
-            "root_cause": "Fragmented IT procurement allowed departments to adopt isolated tools without integration strategy.",
-            "blindness_reason": "License costs are visible in budgets, but 'attention residue' time loss does not appear on P&L.",
-            "impact": "Reduces deep-work capacity by ~20%."
-        })
-    elif len(data.tools_used) == 0:
-         loss_points.append({
-            "title": "Digital Opacity",
-            "reason": "Process relies entirely on verbal/manual transmission.",
-            "root_cause": "Historical preference for 'speed' over 'structure' during early company growth.",
-            "blindness_reason": "Errors are blamed on 'human mistake' rather than 'system design'.",
-            "impact": "High risk of tribal knowledge loss."
-        })
-
-    if data.approvals_per_task > 2:
-        loss_points.append({
-            "title": "Decision Latency Accumulation",
-            "reason": f"Requires {data.approvals_per_task} distinct sign-offs, creating exponential delays.",
-            "root_cause": "Lack of delegated authority; fear of making autonomous wrong decisions.",
-            "blindness_reason": "Managers feel 'productive' when approving, ignoring the cost of the queue they create.",
-            "impact": "Cycle time extends 4x beyond actual working hours."
-        })
-    
-    if data.people_involved > 6:
-        loss_points.append({
-            "title": "Communication Overhead Entropy",
-            "reason": f"{data.people_involved} active participants creates ~{data.people_involved * (data.people_involved - 1) // 2} communication pathways.",
-            "root_cause": "In clear definition of 'consulted' vs 'responsible' (RACI) roles.",
-            "blindness_reason": "Large meetings feel like 'collaboration', hiding the reality of 'consensus paralysis'.",
-            "impact": "15% of total time lost clarifying requirements."
-        })
-
-    # Feature: Benchmarking (Mock Data per Industry Standard)
-    industry_benchmark_score = random.randint(65, 85)
+    if view == "full":
+        items = [
+            {c.name: getattr(wf, c.name) for c in WorkflowDB.__table__.columns}
+            for wf in rows
+        ]
+    else:
+        items = [dict(r._mapping) for r in rows]
 
-    # 5. Connected AI Reasoning (Gemini or Advanced Heuristics)
-    import os
-    import google.generativeai as genai
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor({"id": last["id"], "loss": last["estimated_financial_loss"]})
 
-    # Try to use Gemini if key exists
-    api_key = os.environ.get("GEMINI_API_KEY")
-    ai_points = []
-    
-    if api_key:
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-pro')
-            
-            prompt = f"""
-            Act as a senior business operations consultant. Analyze this workflow description:
-            "{data.description}"
-            
-            Context: {data.people_involved} people, {data.approvals_per_task} approvals, Tools: {', '.join(data.tools_used)}.
-            
-            Identify 3 specific "Invisible Loss Points". Return ONLY JSON in this format:
-            [
-                {{ "title": "...", "reason": "...", "root_cause": "...", "blindness_reason": "...", "impact": "..." }}
-            ]
-            Keep it professional, insightful, and harsh.
-            """
-            response = model.generate_content(prompt)
-            # Basic parsing
-            import json
-            cleaned_response = response.text.replace('```json', '').replace('```', '')
-            ai_points = json.loads(cleaned_response)
-        except Exception as e:
-            print(f"AI Generation failed: {e}")
-    
-    if ai_points:
-        loss_points = ai_points
-    # Else keep heuristic loss_points calculated above
+    return {"items": items, "next_cursor": next_cursor}
 
-    # 6. Recommendations & Scenario Simulator Data
-    recommendations = []
-    
-    # Calculate potential savings for simulator
-    savings_approval = 0
-    if data.approvals_per_task > 1:
-        # Simulate reducing 1 approval
-        new_approvals = data.approvals_per_task - 1
-        new_approval_friction = new_approvals * data.people_involved * 1.5
-        new_loss = tool_friction + new_approval_friction + base_delay_impact
-        savings_approval = (weekly_time_loss - new_loss) * hourly_rate
-        
-        recommendations.append({
-            "type": "Simplify",
-            "action": "Implement 'Negative Consent' protocol.",
-            "impact": f"Projected Savings: ₹{int(savings_approval):,}/week",
-            "simulator_action": "Reduce Approvals by 1"
-        })
-
-    if len(data.tools_used) > 3:
-        recommendations.append({
-            "type": "Automate",
-            "action": "Unify Data Ingestion Layer.",
-            "impact": "Recovers 10+ hours/week per person.",
-             "simulator_action": "Consolidate Tools"
-        })
-
-    if data.people_involved > 5:
-         recommendations.append({
-            "type": "Restructure",
-            "action": "Split into Two-Pizza Teams.",
-            "impact": "Reduces coordination overhead by 40%.",
-             "simulator_action": "Reduce Team Size"
-        })
-    
-    analysis_result = {
-        "weekly_time_loss_hours": round(weekly_time_loss, 1),
-        "estimated_financial_loss": round(financial_loss_weekly, 2),
-        "confidence_interval": {
-            "lower": round(loss_lower_bound, 2),
-            "upper": round(loss_upper_bound, 2)
+@app.get("/workflows/stats")
+def get_workflow_stats(
+    owner_id: Optional[int] = None,
+    top_n: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    # Portfolio rollups computed in SQL over the typed metric columns;
+    # no result_data is loaded or decoded.
+    scope = []
+    if owner_id is not None:
+        scope.append(WorkflowDB.owner_id == owner_id)
+
+    totals = db.query(
+        func.count(WorkflowDB.id),
+        func.coalesce(func.sum(WorkflowDB.estimated_financial_loss), 0.0),
+        func.avg(WorkflowDB.estimated_financial_loss),
+        func.avg(WorkflowDB.clarity_score),
+        func.avg(WorkflowDB.waste_ratio),
+    ).filter(*scope).one()
+
+    by_severity = db.query(
+        WorkflowDB.severity,
+        func.count(WorkflowDB.id),
+        func.sum(WorkflowDB.estimated_financial_loss),
+    ).filter(*scope).group_by(WorkflowDB.severity).all()
+
+    # Deciles 0-9 ... 90-100 (a perfect 100 joins the top bucket)
+    # CASE, not min(x, 99): the two-argument min is SQLite-only
+    clarity_bucket = (case((WorkflowDB.clarity_score > 99, 99), else_=WorkflowDB.clarity_score) // 10) * 10
+    by_clarity = db.query(
+        clarity_bucket,
+        func.count(WorkflowDB.id),
+    ).filter(*scope).group_by(clarity_bucket).order_by(clarity_bucket).all()
+
+    worst = db.query(*WORKFLOW_SUMMARY_COLUMNS, WorkflowDB.clarity_score, WorkflowDB.waste_ratio) \
+        .filter(*scope) \
+        .order_by(WorkflowDB.estimated_financial_loss.desc(), WorkflowDB.id.desc()) \
+        .limit(top_n).all()
+
+    count, weekly_loss, avg_loss, avg_clarity, avg_waste = totals
+    return {
+        "totals": {
+            "workflows": count,
+            "weekly_financial_loss": round(weekly_loss, 2),
+            "annual_financial_loss": round(weekly_loss * 50, 2),
+            "avg_weekly_loss": round(avg_loss or 0, 2),
+            "avg_clarity_score": round(avg_clarity or 0, 1),
+            "avg_waste_ratio": round(avg_waste or 0, 1),
+        },
+        "severity_histogram": {
+            severity: {"count": n, "weekly_financial_loss": round(loss or 0, 2)}
+            for severity, n, loss in by_severity
         },
-        "decision_delay_index": decision_delay_index,
-        "industry_benchmark_score": industry_benchmark_score,
-        "rework_loss_hours": round(rework_impact, 1),
-        "waste_ratio": waste_ratio,
-        "total_investment": round(total_annual_investment, 2),
-        "severity": severity,
-        "clarity_score": clarity,
-        "invisible_loss_points": loss_points,
-        "recommendations": recommendations or [{
-            "type": "Review", 
-            "action": "Conduct a detailed process audit.", 
-            "impact": "Uncover further hidden constraints."
-        }]
+        "clarity_histogram": [
+            {"bucket": f"{bucket}-{bucket + 9 if bucket < 90 else 100}", "count": n} for bucket, n in by_clarity
+        ],
+        "top_worst": [dict(r._mapping) for r in worst],
     }
 
+# --- N-WAY COMPARISON ---
+COMPARE_MAX_WORKFLOWS = int(os.getenv("COMPARE_MAX_WORKFLOWS", "500"))
+COMPARE_PAIRWISE_MAX = int(os.getenv("COMPARE_PAIRWISE_MAX", "100"))
+
+class CompareFilter(BaseModel):
+    owner_id: Optional[int] = None
+    severity: Optional[str] = None
+    limit: int = Field(COMPARE_MAX_WORKFLOWS, ge=2, le=COMPARE_MAX_WORKFLOWS)
+
+class CompareRequest(BaseModel):
+    ids: Optional[List[int]] = Field(None, min_length=2, max_length=COMPARE_MAX_WORKFLOWS)
+    filter: Optional[CompareFilter] = None
+    pairwise: bool = False
+
+def compare_metric_column(metric: str):
+    # Typed (indexed) columns where they exist; the rest are pulled out of
+    # result_data in SQL so no full JSON documents are loaded
+    column = getattr(WorkflowDB, metric, None)
+    if column is not None:
+        return column
+    return WorkflowDB.result_data[metric].as_float()
+
+@app.post("/compare")
+def compare_workflows(req: CompareRequest, db: Session = Depends(get_db)):
+    if (req.ids is None) == (req.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either ids or filter")
+
+    metric_names = tuple(comparison.COMPARE_METRICS)
+    query = db.query(WorkflowDB.id, WorkflowDB.name, *(compare_metric_column(m) for m in metric_names))
+    if req.ids is not None:
+        rows = query.filter(WorkflowDB.id.in_(req.ids)).all()
+        by_id = {r[0]: r for r in rows}
+        ordered_ids = list(dict.fromkeys(req.ids))
+        rows = [by_id[i] for i in ordered_ids if i in by_id]
+        missing = [i for i in ordered_ids if i not in by_id]
+    else:
+        if req.filter.owner_id is not None:
+            query = query.filter(WorkflowDB.owner_id == req.filter.owner_id)
+        if req.filter.severity is not None:
+            query = query.filter(WorkflowDB.severity == req.filter.severity)
+        rows = query.order_by(WorkflowDB.estimated_financial_loss.desc(), WorkflowDB.id.desc()).limit(req.filter.limit).all()
+        missing = []
+
+    if len(rows) < 2:
+        raise HTTPException(status_code=404, detail="Need at least two existing workflows to compare")
+    if req.pairwise and len(rows) > COMPARE_PAIRWISE_MAX:
+        raise HTTPException(status_code=400, detail=f"Pairwise deltas are limited to {COMPARE_PAIRWISE_MAX} workflows")
+
+    matrix = np.array([[float("nan") if v is None else v for v in r[2:]] for r in rows], dtype=np.float64)
+    result = comparison.compare([r[0] for r in rows], matrix, metric_names, pairwise=req.pairwise)
+    result["names"] = [r[1] for r in rows]
+    result["missing_ids"] = missing
+    return result
+
+@app.get("/workflows/{workflow_id}")
+def get_workflow(workflow_id: int, db: Session = Depends(get_db)):
+    workflow = db.query(WorkflowDB).filter(WorkflowDB.id == workflow_id).first()
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return workflow
+
+class BatchAnalysisRequest(BaseModel):
+    workflows: List[WorkflowInput]
+
+class BatchAnalysisResponse(BaseModel):
+    count: int
+    results: List[LossAnalysis]
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Monte Carlo confidence bands (opt-in via /analyze?simulate=true)
+MC_DEFAULT_SAMPLES = int(os.getenv("MC_DEFAULT_SAMPLES", "100000"))
+MC_MAX_SAMPLES = int(os.getenv("MC_MAX_SAMPLES", "1000000"))
+MC_BUDGET_MS = float(os.getenv("MC_BUDGET_MS", "25"))
+
+def peer_benchmark(data: WorkflowInput, m: dict, exclude_id: Optional[int] = None) -> dict:
+    # Same rounding as the stored clarity_score / waste_ratio columns
+    return peer_index.benchmark(
+        data.people_involved, len(data.tools_used),
+        int(m["clarity_score"]), round(m["waste_ratio"], 1),
+        exclude_id=exclude_id,
+    )
+
+def default_simulation_seed(data: WorkflowInput):
+    # Same inputs -> same band, unless the caller asks for a different seed
+    return zlib.crc32(json.dumps(loss_engine.scalars(data), sort_keys=True).encode("utf-8"))
+
+def simulated_band(data: WorkflowInput, samples: int, seed: Optional[int]) -> dict:
+    return loss_engine.simulate_confidence(
+        loss_engine.scalars(data),
+        samples=samples,
+        seed=default_simulation_seed(data) if seed is None else seed,
+        budget_ms=MC_BUDGET_MS,
+    )
+
+async def run_analysis(data: WorkflowInput, digest: str, owner_id: int, simulate: bool, samples: int, seed: Optional[int], timer: metrics.StageTimer) -> dict:
+    # Core Logic for Estimation & Benchmarking (see loss_engine.py)
+    timer.stage("engine")
+    engine_metrics = loss_engine.row(loss_engine.compute(loss_engine.to_arrays([data])), 0)
+
+    # Invisible Loss Points (Enhanced with Root Causes & Blindness)
+    timer.stage("heuristics")
+    loss_points = loss_engine.heuristic_loss_points(data)
+
+    # Feature: Benchmarking (percentile rank against stored peers, see peer_index.py)
+    timer.stage("benchmark")
+    benchmark = peer_benchmark(data, engine_metrics)
+
+    # 5. Connected AI Reasoning (Gemini or Advanced Heuristics)
+    # Off-loop, concurrency-capped and deadline-bound; falls back to the heuristics above
+    timer.stage("ai")
+    loss_points = await ai_reasoning.generate_loss_points(data, fallback=loss_points)
+
+    # 6. Recommendations & Scenario Simulator Data
+    timer.stage("build_result")
+    analysis_result = loss_engine.build_result(data, engine_metrics, loss_points, benchmark["score"])
+    analysis_result["peer_benchmark"] = benchmark
+
+    # Feature: Confidence Bands from sampling instead of the fixed +/- 15%
+    if simulate:
+        timer.stage("simulate")
+        analysis_result["confidence_interval"] = simulated_band(data, samples, seed)
+
     # Save to DB
-    new_workflow = WorkflowDB(
+    timer.stage("persist")
+    values = dict(
         name=data.name,
         description=data.description,
         created_at=datetime.now().isoformat(),
-        input_data=data.dict(),
-        result_data=analysis_result
+        input_data=data.model_dump(),
+        input_hash=digest,
+        result_data=analysis_result,
+        owner_id=owner_id,
+        **workflow_metric_values(analysis_result)
     )
-    db.add(new_workflow)
-    db.commit()
-    db.refresh(new_workflow)
-    
-    analysis_result["id"] = new_workflow.id
+    if analysis_writer.running:
+        # Group commit: resolves once the batch holding this row is on disk
+        analysis_result["id"] = await analysis_writer.submit(values)
+    else:
+        # Own session: a coalesced run can outlive the request that started it
+        async with AsyncSessionLocal() as session:
+            new_workflow = WorkflowDB(**values)
+            session.add(new_workflow)
+            await session.commit()
+            analysis_result["id"] = new_workflow.id
+    peer_index.add(analysis_result["id"], values["input_data"], analysis_result)
+    return analysis_result
+
+@app.post("/analyze", response_model=LossAnalysis)
+async def analyze_workflow(
+    data: WorkflowInput,
+    simulate: bool = False,
+    samples: int = Query(MC_DEFAULT_SAMPLES, ge=1000, le=MC_MAX_SAMPLES),
+    seed: Optional[int] = None,
+    force: bool = False,
+    current_user: Principal = Depends(get_current_user)
+):
+    timer = metrics.StageTimer("analyze")
+    digest = input_hash(data)
+    if force or not analyze_dedup.enabled:
+        if force:
+            analyze_dedup.record_forced()
+        analysis_result = await run_analysis(data, digest, current_user.id, simulate, samples, seed, timer)
+        timer.done()
+        return analysis_result
 
+    # Same owner + same normalized input -> one analysis (see dedup.py).
+    # Concurrent duplicates (double-click, retry) join the in-flight run; the
+    # run itself first looks for a stored row inside the window. Probing
+    # inside the flight leaves no gap between "not stored yet" and "not in
+    # flight anymore".
+    led = []
+
+    async def lead():
+        led.append(True)
+        timer.stage("dedup")
+        async with AsyncSessionLocal() as session:
+            existing = await analyze_dedup.find_recent(session, current_user.id, digest)
+        if existing is not None:
+            return {**existing.result_data, "id": existing.id, "deduplicated": True}
+        return await run_analysis(data, digest, current_user.id, simulate, samples, seed, timer)
+
+    timer.stage("coalesce")
+    analysis_result = await analyze_flights.do((current_user.id, digest), lead)
+    if not led:
+        analyze_dedup.record_coalesced()
+        analysis_result = {**analysis_result, "deduplicated": True}
+    if analysis_result.get("deduplicated"):
+        # The stored / shared band may come from other sampling settings
+        if simulate:
+            analysis_result = {**analysis_result, "confidence_interval": simulated_band(data, samples, seed)}
+        elif analysis_result["confidence_interval"].get("method") == "monte_carlo":
+            weekly = loss_engine.compute(loss_engine.to_arrays([data]))["financial_loss_weekly"][0].item()
+            analysis_result = {**analysis_result, "confidence_interval": loss_engine.flat_band(weekly)}
+    timer.done()
     return analysis_result
 
+@app.post("/analyze/batch", response_model=BatchAnalysisResponse)
+def analyze_batch(batch: BatchAnalysisRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    # Whole-department audit: one vectorized scoring pass and one commit.
+    # AI reasoning is skipped here; every row gets the heuristic loss points.
+    if len(batch.workflows) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} workflows)")
+    if not batch.workflows:
+        return {"count": 0, "results": []}
+
+    results = bulk_import.analyze_rows(db, batch.workflows, current_user.id)
+    return {"count": len(results), "results": results}
+
+IMPORT_MEDIA_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
+@app.post("/analyze/import")
+def import_workflows(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: Principal = Depends(get_current_user)
+):
+    # Client onboarding: the upload is spooled to disk by the server, then read
+    # row by row and analyzed in chunks; progress streams back as SSE
+    fmt = format or IMPORT_MEDIA_TYPES.get(file.content_type)
+    if fmt is None and file.filename:
+        extension = os.path.splitext(file.filename)[1].lower().lstrip(".")
+        fmt = {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(extension)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Upload a .csv or .ndjson file (or pass ?format=)")
+
+    return StreamingResponse(
+        bulk_import.stream_import(file.file, fmt, current_user.id, WorkflowInput),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- EXPORTS ---
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def _iter_chunks(content: bytes):
+    view = memoryview(content)
+    for start in range(0, len(view), EXPORT_CHUNK_SIZE):
+        yield bytes(view[start:start + EXPORT_CHUNK_SIZE])
+
+def export_file_response(filename: str, content: bytes, media_type: str, headers: dict):
+    headers = dict(headers)
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    headers["Content-Length"] = str(len(content))
+    return StreamingResponse(_iter_chunks(content), media_type=media_type, headers=headers)
+
+def export_queue_full():
+    return HTTPException(status_code=503, detail="Export queue is full, retry shortly", headers={"Retry-After": "5"})
+
+async def export_response(request: Request, kind: str, workflow: WorkflowDB, timer: metrics.StageTimer):
+    # Rendered in memory on the export pool, cached by content hash, revalidated by ETag
+    timer.stage("hash")
+    digest = content_hash(workflow)
+    etag = make_etag(kind, workflow.id, digest)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        timer.done()
+        return Response(status_code=304, headers=headers)
+
+    timer.stage("cache_lookup")
+    key = (kind, workflow.id, digest)
+    cached = artifact_cache.get(key)
+    if cached is None:
+        timer.stage("render")
+        snapshot = workflow_snapshot(workflow)
+
+        async def render_and_store():
+            result = await export_pool.render(kind, snapshot)
+            artifact_cache.put(key, *result)
+            return result
+
+        try:
+            # Concurrent requests for the same report share one render
+            cached = await export_flights.do(key, render_and_store)
+        except ExportQueueFull:
+            timer.done()
+            raise export_queue_full()
+    filename, content = cached
+    timer.done()
+
+    return export_file_response(filename, content, RENDERERS[kind][1], headers)
+
 @app.get("/export/pptx/{workflow_id}")
-def export_pptx(workflow_id: int, db: Session = Depends(get_db)):
-    workflow = db.query(WorkflowDB).filter(WorkflowDB.id == workflow_id).first()
+async def export_pptx(
+    workflow_id: int,
+    request: Request,
+    variant: str = Query("long", pattern="^(long|short)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    timer = metrics.StageTimer("export_pptx")
+    timer.stage("load")
+    workflow = await db.get(WorkflowDB, workflow_id)
     if not workflow:
+        timer.done()
         raise HTTPException(status_code=404, detail="Workflow not found")
-        
-    prs = Presentation()
-    
-    # Slide 1: Title
-    slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-    title.text = "Invisible Business Loss Report"
-    subtitle.text = f"Analysis for: {workflow.name}\nGenerated by IBLD Executive AI"
-
-    # Slide 2: Executive Summary
-    slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = "Executive Summary"
-    content = slide.placeholders[1]
-    
-    res = workflow.result_data
-    inp = workflow.input_data
-    
-    summary_text = (
-        f"Process: {inp['name']}\n"
-        f"Team Size: {inp['people_involved']} | Approvals: {inp['approvals_per_task']}\n\n"
-        f"Financial Impact: ₹{res['estimated_financial_loss']:,} / week\n"
-        f"Time Wasted: {res['weekly_time_loss_hours']} hours / week\n"
-        f"Clarity Score: {res['clarity_score']}/100 (Industry Avg: {res['industry_benchmark_score']})"
+    return await export_response(request, "pptx" if variant == "long" else "pptx-short", workflow, timer)
+
+@app.get("/export/pdf/{workflow_id}")
+async def export_pdf(workflow_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    timer = metrics.StageTimer("export_pdf")
+    timer.stage("load")
+    workflow = await db.get(WorkflowDB, workflow_id)
+    if not workflow:
+        timer.done()
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await export_response(request, "pdf", workflow, timer)
+
+class ExportRequest(BaseModel):
+    workflow_id: int
+    format: str = Field("pdf", pattern="^(pdf|pptx|pptx-short)$")
+
+@app.post("/exports", status_code=202)
+def create_export(req: ExportRequest, db: Session = Depends(get_db)):
+    workflow = db.query(WorkflowDB).filter(WorkflowDB.id == req.workflow_id).first()
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    key = (req.format, workflow.id, content_hash(workflow))
+    cached = artifact_cache.get(key)
+    if cached is not None:
+        job = export_jobs.completed(req.format, workflow.id, *cached)
+    else:
+        try:
+            job = export_jobs.submit(
+                req.format,
+                workflow_snapshot(workflow),
+                on_success=lambda filename, content: artifact_cache.put(key, filename, content),
+            )
+        except ExportQueueFull:
+            raise export_queue_full()
+
+    return {**job.to_dict(), "status_url": f"/exports/{job.id}", "download_url": f"/exports/{job.id}/download"}
+
+class BulkExportRequest(BaseModel):
+    workflow_ids: Optional[List[int]] = None
+    owner_id: Optional[int] = None
+    severity: Optional[str] = None
+    formats: List[str] = Field(["pdf", "pptx"], min_length=1)
+
+@app.post("/exports/bulk")
+def create_bulk_export(req: BulkExportRequest, db: Session = Depends(get_db)):
+    unknown = [f for f in req.formats if f not in EXPORT_FORMATS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown formats: {', '.join(unknown)}")
+
+    if req.workflow_ids is not None:
+        workflow_ids = list(dict.fromkeys(req.workflow_ids))
+    else:
+        query = db.query(WorkflowDB.id)
+        if req.owner_id is not None:
+            query = query.filter(WorkflowDB.owner_id == req.owner_id)
+        if req.severity is not None:
+            query = query.filter(WorkflowDB.severity == req.severity)
+        workflow_ids = [wf_id for (wf_id,) in query.order_by(WorkflowDB.id).limit(bulk_export.BULK_EXPORT_MAX_WORKFLOWS + 1)]
+
+    if not workflow_ids:
+        raise HTTPException(status_code=404, detail="No workflows matched")
+    if len(workflow_ids) > bulk_export.BULK_EXPORT_MAX_WORKFLOWS:
+        raise HTTPException(status_code=413, detail=f"Too many workflows (max {bulk_export.BULK_EXPORT_MAX_WORKFLOWS})")
+
+    filename = f"LUMINA_Audit_Pack_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        bulk_export.stream_zip(workflow_ids, list(dict.fromkeys(req.formats))),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    content.text = summary_text
-
-    # Slide 3: Invisible Loss Points
-    slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = "Identified Friction Points"
-    content = slide.placeholders[1]
-    
-    bullets = ""
-    for point in res.get('invisible_loss_points', [])[:3]:
-        bullets += f"• {point['title']}: {point['reason']} (Impact: {point['impact']})\n"
-    content.text = bullets
-
-    # Slide 4: Recommendations
-    slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = "Strategic Action Plan"
-    content = slide.placeholders[1]
-    
-    recs = ""
-    for rec in res.get('recommendations', []):
-        recs += f"• {rec['type'].upper()}: {rec['action']} -> {rec['impact']}\n"
-    content.text = recs
-
-    # Save
-    filename = f"IBLD_Report_{workflow_id}.pptx"
-    file_path = f"./{filename}"
-    prs.save(file_path)
-    
-    return FileResponse(path=file_path, filename=filename, media_type='application/vnd.openxmlformats-officedocument.presentationml.presentation')
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from datetime import datetime
+@app.get("/exports/{job_id}")
+def get_export(job_id: str):
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return {**job.to_dict(), "download_url": f"/exports/{job.id}/download"}
 
-@app.get("/export/pdf/{workflow_id}")
-def export_pdf(workflow_id: int, db: Session = Depends(get_db)):
+@app.get("/exports/{job_id}/download")
+def download_export(job_id: str):
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Export failed: {job.error}")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}", headers={"Retry-After": "1"})
+    return export_file_response(job.filename, job.content, RENDERERS[job.kind][1], {})
+
+class SensitivityRequest(BaseModel):
+    range_pct: float = Field(0.2, gt=0, le=1)
+    steps: int = Field(5, ge=2, le=101)
+    inputs: Optional[List[str]] = None
+
+@app.post("/workflows/{workflow_id}/sensitivity")
+def workflow_sensitivity(workflow_id: int, req: SensitivityRequest = SensitivityRequest(), db: Session = Depends(get_db)):
     workflow = db.query(WorkflowDB).filter(WorkflowDB.id == workflow_id).first()
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    res = workflow.result_data
-    inp = workflow.input_data
-    
-    filename = f"LUMINA_Audit_Report_{workflow_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
-    clean_path = f"./{filename}"
-    
-    doc = SimpleDocTemplate(clean_path, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    # Custom Styles
-    style_title = ParagraphStyle('LuminaTitle', parent=styles['Heading1'], fontSize=42, textColor=colors.HexColor("#2d2626"), spaceAfter=20, alignment=1)
-    style_subtitle = ParagraphStyle('LuminaSubtitle', parent=styles['Normal'], fontSize=16, textColor=colors.HexColor("#7a6e6e"), alignment=1, spaceAfter=60)
-    style_h1 = ParagraphStyle('LuminaH1', parent=styles['Heading2'], fontSize=20, textColor=colors.HexColor("#2d2626"), spaceAfter=15, spaceBefore=20)
-    style_metric = ParagraphStyle('LuminaMetric', parent=styles['Normal'], fontSize=18, textColor=colors.HexColor("#2d2626"), alignment=1)
-    style_metric_label = ParagraphStyle('LuminaMetricLabel', parent=styles['Normal'], fontSize=10, textColor=colors.HexColor("#7a6e6e"), alignment=1)
-    
-    # --- PAGE 1: COVER ---
-    story.append(Spacer(1, 150))
-    story.append(Paragraph("LUMINA", style_title))
-    story.append(Paragraph("OPERATIONAL INTELLIGENCE AUDIT", ParagraphStyle('Sub', parent=style_subtitle, fontSize=14, spaceAfter=10, tracking=2)))
-    story.append(Spacer(1, 20))
-    story.append(Paragraph(f"Subject: {inp['name']}", style_subtitle))
-    story.append(Spacer(1, 150))
-    story.append(Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", ParagraphStyle('Date', parent=styles['Normal'], alignment=1, textColor=colors.gray)))
-    story.append(Paragraph("CONFIDENTIAL // INTERNAL USE ONLY", ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=1, textColor=colors.lightgrey)))
-    story.append(PageBreak())
-    
-    # --- PAGE 2: EXECUTIVE SUMMARY ---
-    story.append(Paragraph("Executive Summary", style_h1))
-    story.append(Paragraph("At A Glance", styles['Heading3']))
-    
-    # Metrics Table
-    financial_str = f"INR {res['estimated_financial_loss']:,.0f}"
-    clarity_str = f"{res['clarity_score']}/100"
-    efficiency_str = "OPTIMIZED" if res['clarity_score'] > 80 else ("SUB-OPTIMAL" if res['clarity_score'] > 50 else "CRITICAL")
-    eff_color = colors.HexColor("#3fb950") if res['clarity_score'] > 80 else (colors.HexColor("#d29922") if res['clarity_score'] > 50 else colors.HexColor("#d94242"))
-    
-    data = [
-        [Paragraph(financial_str, style_metric), Paragraph(clarity_str, style_metric), Paragraph(efficiency_str, ParagraphStyle('Eff', parent=style_metric, textColor=eff_color))],
-        [Paragraph("Annual Capital Bleed", style_metric_label), Paragraph("Clarity Score", style_metric_label), Paragraph("Efficiency Rating", style_metric_label)]
-    ]
-    
-    t = Table(data, colWidths=[2.3*inch, 2.3*inch, 2.3*inch])
-    t.setStyle(TableStyle([
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('BACKGROUND', (0,0), (-1,-1), colors.HexColor("#fdf6f5")),
-        ('BOX', (0,0), (-1,-1), 1, colors.white),
-        ('PADDING', (0,0), (-1,-1), 20),
-    ]))
-    story.append(t)
-    story.append(Spacer(1, 30))
-    
-    # Verdict
-    story.append(Paragraph("The Operations Verdict", styles['Heading3']))
-    verdict_text = f"This workflow is currently operating at a <b>{efficiency_str}</b> level. The analysis identified {len(res.get('invisible_loss_points', []))} major friction points contributing to a {res.get('waste_ratio',0)}% waste of total investment. Immediate remediation is recommended to recover the reported capital bleed."
-    story.append(Paragraph(verdict_text, styles['Normal']))
-    story.append(PageBreak())
-    
-    # --- PAGE 3: DEEP DIVE ---
-    story.append(Paragraph("Friction Point Analysis", style_h1))
-    
-    table_data = [['Blindspot Issue', 'Root Cause', 'Impact']]
-    for p in res.get('invisible_loss_points', []):
-        table_data.append([
-            Paragraph(p['title'], styles['Normal']),
-            Paragraph(p['root_cause'] or p['blindness_reason'] or "Process Ambiguity", styles['BodyText']),
-            Paragraph(p['impact'] or "High Latency", styles['BodyText'])
-        ])
-    
-    t2 = Table(table_data, colWidths=[2*inch, 3*inch, 2*inch])
-    t2.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2d2626")),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 10),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#e0e0e0")),
-        ('PADDING', (0,0), (-1,-1), 10),
-    ]))
-    story.append(t2)
-    story.append(PageBreak())
-
-    # --- PAGE 4: STRATEGIC ROADMAP ---
-    story.append(Paragraph("Strategic Remediation Roadmap", style_h1))
-    
-    # Split Recs
-    quick_wins = [r for r in res.get('recommendations', []) if r['type'] in ['Automate', 'Eliminate']]
-    structural = [r for r in res.get('recommendations', []) if r['type'] not in ['Automate', 'Eliminate']]
-    
-    story.append(Paragraph("Phase 1: Quick Wins (0-30 Days)", styles['Heading3']))
-    for qw in quick_wins:
-        story.append(Paragraph(f"• <b>{qw['action']}</b>", styles['Normal']))
-        story.append(Paragraph(f"  <i>Impact: {qw['impact']}</i>", ParagraphStyle('Indent', parent=styles['BodyText'], leftIndent=20)))
-        story.append(Spacer(1, 10))
-        
-    story.append(Spacer(1, 20))
-    story.append(Paragraph("Phase 2: Structural Transformation", styles['Heading3']))
-    for st in structural:
-        story.append(Paragraph(f"• <b>{st['action']}</b>", styles['Normal']))
-        story.append(Paragraph(f"  <i>Impact: {st['impact']}</i>", ParagraphStyle('Indent', parent=styles['BodyText'], leftIndent=20)))
-        story.append(Spacer(1, 10))
-        
-    story.append(Spacer(1, 40))
-    story.append(Paragraph(f"Projected Annual Value Unlocked: ₹{res['estimated_financial_loss']*50:,.0f}", ParagraphStyle('FooterBold', parent=styles['Heading3'], textColor=colors.HexColor("#3fb950"), alignment=2)))
-
-    doc.build(story)
-    
-    return FileResponse(path=clean_path, filename=filename, media_type='application/pdf')
-
-@app.get("/export/pptx/{analysis_id}")
-def export_pptx(analysis_id: int, db: Session = Depends(get_db)):
-    result = db.query(WorkflowDB).filter(WorkflowDB.id == analysis_id).first()
-    if not result:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-        
-    input_data = result.input_data
-    res = result.result_data
-    
-    # Initialize PPTX
-    prs = Presentation()
-    
-    # SLIDE 1: Title Slide
-    slide_layout = prs.slide_layouts[0] # Title Slide
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-    
-    title.text = "LUMINA Intelligence Report"
-    subtitle.text = f"Analysis: {input_data.get('name', 'Workflow')}\nGenerated: {datetime.now().strftime('%Y-%m-%d')}"
-    
-    # SLIDE 2: Executive Summary
-    slide_layout = prs.slide_layouts[1] # Title and Content
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = "Executive Summary"
-    
-    content = slide.placeholders[1]
-    tf = content.text_frame
-    tf.text = f"Clarity Score: {res.get('clarity_score', 0)}/100"
-    
-    p = tf.add_paragraph()
-    p.text = f"Weekly Time Loss: {res.get('weekly_time_loss_hours', 0)} hours"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = f"Estimated Annual Financial Loss: INR {res.get('estimated_financial_loss', 0) * 50:,.0f}"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = f"Risk Severity: {res.get('severity', 'Unknown')}"
-    p.level = 1
-
-    # SLIDE 3: Recommendations
-    slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    title.text = "Strategic Roadmap"
-    
-    content = slide.placeholders[1]
-    tf = content.text_frame
-    tf.text = "Recommended Actions:"
-    
-    for rec in res.get('recommendations', [])[:5]: # Top 5
-        p = tf.add_paragraph()
-        p.text = f"{rec.get('type')}: {rec.get('action')}"
-        p.level = 1
-        
-        p = tf.add_paragraph()
-        p.text = f"Impact: {rec.get('impact')}"
-        p.level = 2
-        
-    # Save
-    filename = f"Lumina_Report_{analysis_id}.pptx"
-    clean_path = os.path.join(os.getcwd(), filename)
-    prs.save(clean_path)
-    
-    return FileResponse(path=clean_path, filename=filename, media_type='application/vnd.openxmlformats-officedocument.presentationml.presentation')
+    inputs = req.inputs or list(loss_engine.SENSITIVITY_INPUTS)
+    unknown = [i for i in inputs if i not in loss_engine.SENSITIVITY_INPUTS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown inputs: {', '.join(unknown)}")
+
+    base = loss_engine.scalars(WorkflowInput(**workflow.input_data))
+    result = loss_engine.sensitivity(base, range_pct=req.range_pct, steps=req.steps, inputs=inputs)
+    result["workflow_id"] = workflow_id
+    return result
+
+# --- CONSTRAINED OPTIMIZER ---
+OPTIMIZE_MAX_BUDGET_MS = float(os.getenv("OPTIMIZE_MAX_BUDGET_MS", "2000"))
+
+class OptimizeRequest(BaseModel):
+    min_headcount: int = Field(1, ge=1)
+    min_approvals: int = Field(0, ge=0)  # approval gates that must stay
+    min_tools: int = Field(0, ge=0)
+    max_delay_reduction_pct: float = Field(75.0, ge=0, le=100)
+    max_rejection_reduction_pct: float = Field(75.0, ge=0, le=100)
+    max_change_cost: Optional[float] = Field(None, ge=0)
+    fixed: List[str] = []  # levers that must not change at all
+    effort_weights: Optional[Dict[str, float]] = None
+    budget_ms: float = Field(optimizer.OPTIMIZE_BUDGET_MS, gt=0, le=OPTIMIZE_MAX_BUDGET_MS)
+    max_points: int = Field(50, ge=2, le=500)
+
+@app.post("/workflows/{workflow_id}/optimize")
+def optimize_workflow(workflow_id: int, req: OptimizeRequest = OptimizeRequest(), db: Session = Depends(get_db)):
+    workflow = db.query(WorkflowDB).filter(WorkflowDB.id == workflow_id).first()
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    unknown = [f for f in list(req.fixed) + list(req.effort_weights or {}) if f not in optimizer.LEVERS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown levers: {', '.join(unknown)}")
+    if any(w < 0 for w in (req.effort_weights or {}).values()):
+        raise HTTPException(status_code=422, detail="Effort weights must be non-negative")
+
+    timer = metrics.StageTimer("optimize")
+    timer.stage("search")
+    base = loss_engine.scalars(WorkflowInput(**workflow.input_data))
+    result = optimizer.optimize(
+        base,
+        min_headcount=req.min_headcount,
+        min_approvals=req.min_approvals,
+        min_tools=req.min_tools,
+        max_delay_reduction_pct=req.max_delay_reduction_pct,
+        max_rejection_reduction_pct=req.max_rejection_reduction_pct,
+        max_change_cost=req.max_change_cost,
+        fixed=set(req.fixed),
+        effort_weights=req.effort_weights,
+        budget_ms=req.budget_ms,
+        max_points=req.max_points,
+    )
+    timer.done()
+    result["workflow_id"] = workflow_id
+    return result
+
+# --- INCREMENTAL RE-ANALYSIS ---
+class WorkflowPatch(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    people_involved: Optional[int] = None
+    approvals_per_task: Optional[int] = None
+    tools_used: Optional[List[str]] = None
+    avg_delays_hours: Optional[float] = None
+    rejection_rate: Optional[float] = None
+    monthly_volume: Optional[int] = None
+    avg_annual_salary: Optional[float] = None
+    total_project_budget: Optional[float] = None
+
+def workflow_version_row(workflow: WorkflowDB, version: int, changed: List[str]) -> WorkflowVersionDB:
+    return WorkflowVersionDB(
+        workflow_id=workflow.id,
+        version=version,
+        created_at=datetime.now().isoformat(),
+        changed_fields=changed,
+        input_data=workflow.input_data,
+        result_data=workflow.result_data,
+    )
+
+@app.patch("/workflows/{workflow_id}")
+async def patch_workflow(
+    workflow_id: int,
+    patch: WorkflowPatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    # Re-score in place: only results that depend on the changed inputs are
+    # recomputed, and the AI is only asked again if its prompt inputs moved
+    timer = metrics.StageTimer("patch_workflow")
+    timer.stage("load")
+    workflow = await db.get(WorkflowDB, workflow_id)
+    if not workflow:
+        timer.done()
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    current_version = await db.scalar(
+        select(func.max(WorkflowVersionDB.version)).where(WorkflowVersionDB.workflow_id == workflow_id)
+    ) or 1
+
+    timer.stage("diff")
+    updates = {k: v for k, v in patch.model_dump(exclude_unset=True).items() if v is not None}
+    data = WorkflowInput(**{**workflow.input_data, **updates})
+    new_input = data.model_dump()
+    changed = loss_engine.changed_fields(workflow.input_data, new_input)
+    if not changed:
+        timer.done()
+        return {**workflow.result_data, "id": workflow.id, "version": current_version, "changed_fields": []}
+
+    previous = workflow.result_data
+    loss_points = previous.get("invisible_loss_points", [])
+    if changed & ai_reasoning.PROMPT_FIELDS:
+        timer.stage("ai")
+        loss_points = await ai_reasoning.generate_loss_points(data, fallback=loss_engine.heuristic_loss_points(data))
+
+    timer.stage("recompute")
+    # A band seeded from the old inputs gets the new inputs' seed, as a fresh
+    # /analyze would; a caller-chosen seed is kept
+    band_seed = (previous.get("confidence_interval") or {}).get("seed")
+    resample_seed = None
+    if band_seed is not None and band_seed == default_simulation_seed(WorkflowInput(**workflow.input_data)):
+        resample_seed = default_simulation_seed(data)
+    result = loss_engine.update_result(data, previous, changed, loss_points, seed=resample_seed)
+    benchmark = peer_index.benchmark_for(new_input, result, exclude_id=workflow.id)
+    result["industry_benchmark_score"] = benchmark["score"]
+    result["peer_benchmark"] = benchmark
+
+    timer.stage("persist")
+    changed_list = sorted(changed)
+    if current_version == 1:
+        # First edit: keep the original analysis as version 1
+        db.add(workflow_version_row(workflow, 1, []))
+    workflow.name = data.name
+    workflow.description = data.description
+    workflow.input_data = new_input
+    workflow.input_hash = input_hash(new_input)
+    workflow.result_data = result
+    for column, value in workflow_metric_values(result).items():
+        setattr(workflow, column, value)
+    db.add(workflow_version_row(workflow, current_version + 1, changed_list))
+    try:
+        await db.commit()
+    except IntegrityError:
+        timer.done()
+        raise HTTPException(status_code=409, detail="Workflow was modified concurrently, retry")
+    peer_index.add(workflow.id, new_input, result)
+    timer.done()
+
+    return {**result, "id": workflow.id, "version": current_version + 1, "changed_fields": changed_list}
+
+@app.get("/workflows/{workflow_id}/versions")
+def get_workflow_versions(workflow_id: int, full: bool = False, db: Session = Depends(get_db)):
+    if not db.query(WorkflowDB.id).filter(WorkflowDB.id == workflow_id).first():
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    versions = (
+        db.query(WorkflowVersionDB)
+        .filter(WorkflowVersionDB.workflow_id == workflow_id)
+        .order_by(WorkflowVersionDB.version)
+        .all()
+    )
+    items = []
+    for v in versions:
+        item = {"version": v.version, "created_at": v.created_at, "changed_fields": v.changed_fields,
+                "estimated_financial_loss": v.result_data.get("estimated_financial_loss")}
+        if full:
+            item.update(input_data=v.input_data, result_data=v.result_data)
+        items.append(item)
+    return {"workflow_id": workflow_id, "versions": items}
+
+# --- STEP-LEVEL GRAPHS ---
+class GraphNode(BaseModel):
+    id: str
+    name: Optional[str] = None
+    duration_hours: float = Field(..., ge=0)
+    wait_hours: float = Field(0.0, ge=0)  # queueing before work starts
+    owner: Optional[str] = None
+    tools: List[str] = []
+
+class GraphEdge(BaseModel):
+    source: str
+    target: str
+    kind: str = Field("handoff", pattern="^(handoff|approval)$")
+    wait_hours: float = Field(0.0, ge=0)  # lag of the hand-off / approval gate
+
+class WorkflowGraph(BaseModel):
+    nodes: List[GraphNode]
+    edges: List[GraphEdge] = []
+
+def analyze_graph(graph_data: dict, workflow: WorkflowDB) -> dict:
+    loss = float(workflow.estimated_financial_loss or 0.0)
+    try:
+        analysis = workflow_graph.analyze(graph_data, estimated_financial_loss=loss)
+    except workflow_graph.GraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    analysis["estimated_financial_loss"] = loss
+    return analysis
+
+@app.put("/workflows/{workflow_id}/graph")
+def put_workflow_graph(
+    workflow_id: int,
+    graph: WorkflowGraph,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    workflow = db.get(WorkflowDB, workflow_id)
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    timer = metrics.StageTimer("workflow_graph")
+    timer.stage("analyze")
+    graph_data = graph.model_dump()
+    analysis = analyze_graph(graph_data, workflow)
+
+    timer.stage("persist")
+    row = db.get(WorkflowGraphDB, workflow_id) or WorkflowGraphDB(workflow_id=workflow_id)
+    row.updated_at = datetime.now().isoformat()
+    row.graph_data = graph_data
+    row.analysis_data = analysis
+    db.add(row)
+    db.commit()
+    timer.done()
+    # Already plain JSON types: skip jsonable_encoder's walk over thousands of steps
+    return JSONResponse({"workflow_id": workflow_id, "updated_at": row.updated_at, "analysis": analysis})
+
+@app.get("/workflows/{workflow_id}/graph")
+def get_workflow_graph(workflow_id: int, include_graph: bool = True, db: Session = Depends(get_db)):
+    row = db.get(WorkflowGraphDB, workflow_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Workflow has no step-level graph")
+    analysis = row.analysis_data
+    workflow = db.get(WorkflowDB, workflow_id)
+    if analysis.get("estimated_financial_loss") != float(workflow.estimated_financial_loss or 0.0):
+        # Re-scored since the graph was stored (PATCH): re-attribute the new loss
+        analysis = row.analysis_data = analyze_graph(row.graph_data, workflow)
+        db.commit()
+    response = {"workflow_id": workflow_id, "updated_at": row.updated_at, "analysis": analysis}
+    if include_graph:
+        response["graph"] = row.graph_data
+    return JSONResponse(response)
+
+@app.delete("/workflows/{workflow_id}/graph")
+def delete_workflow_graph(workflow_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if not db.query(WorkflowGraphDB).filter(WorkflowGraphDB.workflow_id == workflow_id).delete():
+        raise HTTPException(status_code=404, detail="Workflow has no step-level graph")
+    db.commit()
+    return {"detail": "Deleted successfully"}
 
 @app.delete("/workflows/{workflow_id}")
 def delete_workflow(workflow_id: int, db: Session = Depends(get_db)):
@@ -671,15 +978,18 @@ def delete_workflow(workflow_id: int, db: Session = Depends(get_db)):
     if not wf:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
+    db.query(WorkflowVersionDB).filter(WorkflowVersionDB.workflow_id == workflow_id).delete()
+    db.query(WorkflowGraphDB).filter(WorkflowGraphDB.workflow_id == workflow_id).delete()
     db.delete(wf)
     db.commit()
+    peer_index.remove(workflow_id)
     return {"detail": "Deleted successfully"}
 
 # --- AUTH ENDPOINTS ---
 @app.post("/token", response_model=dict)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(UserDB).where(UserDB.username == form_data.username))
+    if not user or not await run_password_task(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"})
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer", "role": user.role}
@@ -689,23 +999,42 @@ class UserCreate(BaseModel):
     password: str
 
 @app.post("/users/", response_model=dict)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if admin exists (poor man's seed)
-    if not db.query(UserDB).first():
+    if not await db.scalar(select(UserDB.id).limit(1)):
        role = "admin"
     else:
        role = "consultant"
        
-    db_user = UserDB(username=user.username, hashed_password=get_password_hash(user.password), role=role)
+    hashed_password = await run_password_task(get_password_hash, user.password)
+    db_user = UserDB(username=user.username, hashed_password=hashed_password, role=role)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return {"username": db_user.username, "role": db_user.role}
 
 @app.get("/users/me")
-def read_users_me(current_user: UserDB = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_user)):
     return {"username": current_user.username, "role": current_user.role}
 
+@app.get("/system/stats")
+def system_stats():
+    return {
+        "ai_cache": ai_point_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "peer_index": peer_index.stats(),
+        "analyze_dedup": analyze_dedup.stats(),
+        "single_flight": {"analyze": analyze_flights.stats(), "export": export_flights.stats(), "ai": ai_flights.stats()},
+        "analysis_writer": analysis_writer.stats(),
+        "artifact_cache": artifact_cache.stats(),
+        "export_pool": export_pool.stats(),
+        "export_jobs": export_jobs.stats(),
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Histograms/counters from the hot path, plus the cache/pool/queue stats as gauges
+    return Response(metrics.render(system_stats()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 def read_root():
     return {"status": "IBLD Backend Running"}
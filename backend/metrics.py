@@ -0,0 +1,180 @@
+"""In-process metrics rendered in the Prometheus text format (``GET /metrics``).
+
+Deliberately tiny: counters and fixed-bucket histograms keyed by label
+values, each guarded by a single lock. On the hot path, recording a sample
+costs one ``perf_counter`` pair and one bisect. The cache, pool and queue
+counters that already exist (``/system/stats``) are exported as gauges at
+scrape time, not tracked a second time.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+# --- Metrics shared across modules ---
+REQUEST_SECONDS = Histogram("lumina_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("lumina_stage_duration_seconds", "Time spent in each stage of a handler.", ("handler", "stage"))
+AI_REQUESTS = Counter("lumina_ai_requests_total", "AI enrichment outcomes.", ("outcome",))
+DB_SESSION_SECONDS = Histogram("lumina_db_session_duration_seconds", "Lifetime of a request-scoped DB session.", ("kind",))
+DB_COMMIT_SECONDS = Histogram("lumina_db_commit_duration_seconds", "Time spent committing a DB transaction.")
+
+
+class StageTimer:
+    """Times consecutive stages of one handler: ``timer.stage("ai")`` closes the previous stage."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._stage = None
+        self._started = 0.0
+
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._stage is not None:
+            STAGE_SECONDS.observe(now - self._started, handler=self.handler, stage=self._stage)
+        self._stage, self._started = name, now
+
+    def done(self):
+        self.stage(None)
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering) recording request latency.
+
+    Labels use the matched route template (``/workflows/{workflow_id}``), so
+    ids don't explode the series count.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=f"{status[0] // 100}xx",
+            )
+
+
+def _flatten(prefix, stats):
+    for key, value in stats.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}")
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def render(gauges=None):
+    """Prometheus text exposition of every registered metric plus ``gauges`` (a nested stats dict)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for name, value in _flatten("lumina", gauges or {}):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
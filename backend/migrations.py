@@ -0,0 +1,126 @@
+"""Idempotent, in-place schema upgrades for existing SQLite databases.
+
+``Base.metadata.create_all`` only creates missing tables, so columns added to
+an existing model never reach a database created by an older build. Each
+upgrade here adds what is missing and backfills it from ``result_data`` (or,
+for ``input_hash``, from ``input_data``). Indexes declared on the model,
+such as the listing's keyset indexes, are created when missing.
+Safe to run on every startup.
+"""
+from sqlalchemy import inspect, or_, text
+
+from database import SessionLocal, WorkflowDB
+from dedup import input_hash
+
+BACKFILL_CHUNK = 1000
+
+# column name -> (DDL type, result_data key)
+WORKFLOW_METRIC_COLUMNS = {
+    "severity": ("VARCHAR", "severity"),
+    "estimated_financial_loss": ("FLOAT", "estimated_financial_loss"),
+    "clarity_score": ("INTEGER", "clarity_score"),
+    "waste_ratio": ("FLOAT", "waste_ratio"),
+}
+
+
+def _add_missing_columns(engine, table, columns):
+    existing = {c["name"] for c in inspect(engine).get_columns(table)}
+    added = []
+    with engine.begin() as conn:
+        for name, (ddl_type, _) in columns.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+                added.append(name)
+    return added
+
+
+def _missing_metrics():
+    return or_(*[getattr(WorkflowDB, name).is_(None) for name in WORKFLOW_METRIC_COLUMNS])
+
+
+def backfill_workflow_metrics(session_factory=SessionLocal):
+    """Copy metrics out of result_data for rows written before the columns existed."""
+    db = session_factory()
+    updated = 0
+    try:
+        # Every metric column is indexed, so these probes are cheap on a
+        # fully migrated table and we skip the scan entirely.
+        if not any(
+            db.query(WorkflowDB.id).filter(getattr(WorkflowDB, name).is_(None)).first()
+            for name in WORKFLOW_METRIC_COLUMNS
+        ):
+            return 0
+
+        last_id = 0
+        while True:
+            # Keyset over the primary key so the scan stays O(n) overall
+            rows = (
+                db.query(WorkflowDB.id, WorkflowDB.result_data)
+                .filter(WorkflowDB.id > last_id, _missing_metrics())
+                .order_by(WorkflowDB.id)
+                .limit(BACKFILL_CHUNK)
+                .all()
+            )
+            if not rows:
+                break
+            db.bulk_update_mappings(WorkflowDB, [
+                {"id": wf_id, **workflow_metric_values(result_data or {})}
+                for wf_id, result_data in rows
+            ])
+            db.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        db.close()
+    return updated
+
+
+def backfill_input_hashes(session_factory=SessionLocal):
+    """Hash the stored inputs of rows written before ``input_hash`` existed."""
+    db = session_factory()
+    updated = 0
+    try:
+        last_id = 0
+        while True:
+            rows = (
+                db.query(WorkflowDB.id, WorkflowDB.input_data)
+                .filter(WorkflowDB.id > last_id, WorkflowDB.input_hash.is_(None))
+                .order_by(WorkflowDB.id)
+                .limit(BACKFILL_CHUNK)
+                .all()
+            )
+            if not rows:
+                break
+            db.bulk_update_mappings(WorkflowDB, [
+                {"id": wf_id, "input_hash": input_hash(input_data or {})}
+                for wf_id, input_data in rows
+            ])
+            db.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        db.close()
+    return updated
+
+
+def workflow_metric_values(result_data):
+    """Typed column values for a result_data payload."""
+    return {
+        "severity": result_data.get("severity", "Low"),
+        "estimated_financial_loss": float(result_data.get("estimated_financial_loss") or 0.0),
+        "clarity_score": int(result_data.get("clarity_score") or 0),
+        "waste_ratio": float(result_data.get("waste_ratio") or 0.0),
+    }
+
+
+def run_migrations(engine):
+    _add_missing_columns(engine, WorkflowDB.__tablename__, WORKFLOW_METRIC_COLUMNS)
+    # Every writer sets input_hash, so only a freshly added column needs filling
+    hash_added = _add_missing_columns(engine, WorkflowDB.__tablename__, {"input_hash": ("VARCHAR", None)})
+    # Covers every index in WorkflowDB.__table_args__, including ones added
+    # after the table was created (e.g. ix_workflows_owner_loss_id)
+    for index in WorkflowDB.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    backfill_workflow_metrics()
+    if hash_added:
+        backfill_input_hashes()
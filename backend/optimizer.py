@@ -0,0 +1,215 @@
+"""Constrained what-if optimizer: Pareto frontier of weekly savings vs change cost.
+
+The search space is every combination of five levers, each only ever reduced
+from the workflow's current value:
+
+* ``people_involved``    - integer, down to ``min_headcount``
+* ``approvals_per_task`` - integer, down to ``min_approvals`` (gates that must stay)
+* ``tool_count``         - integer, down to ``min_tools``
+* ``avg_delays_hours``   - cut in steps of ``PERCENT_STEP`` up to ``max_delay_reduction_pct``
+* ``rejection_rate``     - cut the same way, up to ``max_rejection_reduction_pct``
+
+Change cost is linear in the size of each change (``EFFORT_WEIGHTS``, which
+the caller can override). Every candidate is scored with the same
+``loss_engine.compute`` that ``/analyze`` uses.
+
+The search runs one headcount level at a time; each level is a 4-D grid of
+the other levers, scored in one vectorized call. Pruning keeps it small:
+
+* integer levels are capped at ``OPTIMIZE_MAX_LEVELS`` (evenly spaced,
+  always including both ends)
+* tool counts below ``loss_engine.FREE_TOOLS`` are dropped: they cost more
+  and save nothing, so they can never be on the frontier
+* candidates over ``max_change_cost`` are masked out before they are scored
+* only the running Pareto frontier is kept between levels
+
+Levels are visited in an interleaved order and scored in chunks of at most
+``OPTIMIZE_CHUNK`` candidates, with the deadline checked between chunks. A
+search cut short by the latency budget still covers the whole headcount
+range, only more coarsely. It then reports ``complete: false``;
+``levels_searched`` counts only fully scored headcount levels and
+``levels_partial`` is 1 if the deadline hit inside one.
+"""
+import os
+import time
+
+import numpy as np
+
+import loss_engine
+
+OPTIMIZE_BUDGET_MS = float(os.getenv("OPTIMIZE_BUDGET_MS", "250"))
+OPTIMIZE_MAX_LEVELS = int(os.getenv("OPTIMIZE_MAX_LEVELS", "40"))
+OPTIMIZE_CHUNK = 16384
+PERCENT_STEP = 5.0
+LEVEL_STRIDE = 4
+
+LEVERS = ("people_involved", "approvals_per_task", "tool_count", "avg_delays_hours", "rejection_rate")
+# Change cost per unit: per person, per approval gate, per tool, per percentage point
+EFFORT_WEIGHTS = {
+    "people_involved": 2.0,
+    "approvals_per_task": 1.0,
+    "tool_count": 3.0,
+    "avg_delays_hours": 0.05,
+    "rejection_rate": 0.05,
+}
+
+
+def _integer_levels(current, minimum, max_levels=None):
+    """Values from ``current`` down to ``minimum``, thinned to ``max_levels``."""
+    current, minimum = int(current), int(min(minimum, current))
+    levels = np.arange(current, minimum - 1, -1, dtype=np.float64)
+    if max_levels and len(levels) > max_levels:
+        levels = np.unique(np.rint(np.linspace(minimum, current, max_levels)))[::-1]
+    return levels
+
+
+def _percent_levels(max_pct):
+    """Reductions in percent: 0, PERCENT_STEP, ... up to ``max_pct``."""
+    return np.arange(0.0, max_pct + 1e-9, PERCENT_STEP)
+
+
+def _interleave(n, stride=LEVEL_STRIDE):
+    return np.concatenate([np.arange(k, n, stride) for k in range(stride)])
+
+
+def pareto_front(cost, savings):
+    """Indices of non-dominated points (lower cost, higher savings), cheapest first."""
+    if len(cost) == 0:
+        return np.empty(0, dtype=np.int64)
+    order = np.lexsort((-savings, cost))
+    s = savings[order]
+    best_before = np.concatenate(([-np.inf], np.maximum.accumulate(s)[:-1]))
+    return order[s > best_before]
+
+
+def _thin(indices, max_points):
+    if len(indices) <= max_points:
+        return indices
+    keep = np.unique(np.rint(np.linspace(0, len(indices) - 1, max_points)).astype(np.int64))
+    return indices[keep]
+
+
+def optimize(
+    base,
+    min_headcount=1,
+    min_approvals=0,
+    min_tools=0,
+    max_delay_reduction_pct=75.0,
+    max_rejection_reduction_pct=75.0,
+    max_change_cost=None,
+    fixed=(),
+    effort_weights=None,
+    budget_ms=OPTIMIZE_BUDGET_MS,
+    max_points=50,
+):
+    """Search the lever space around ``base`` (scalars keyed like ``loss_engine.INPUT_FIELDS``)."""
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+    weights = {**EFFORT_WEIGHTS, **(effort_weights or {})}
+
+    people = _integer_levels(base["people_involved"], base["people_involved"] if "people_involved" in fixed else min_headcount, OPTIMIZE_MAX_LEVELS)
+    approvals = _integer_levels(base["approvals_per_task"], base["approvals_per_task"] if "approvals_per_task" in fixed else min_approvals, OPTIMIZE_MAX_LEVELS)
+    tool_floor = max(min_tools, min(loss_engine.FREE_TOOLS, base["tool_count"]))
+    tools = _integer_levels(base["tool_count"], base["tool_count"] if "tool_count" in fixed else tool_floor, OPTIMIZE_MAX_LEVELS)
+    delay_cut = _percent_levels(0.0 if "avg_delays_hours" in fixed else max_delay_reduction_pct)
+    rejection_cut = _percent_levels(0.0 if "rejection_rate" in fixed else max_rejection_reduction_pct)
+
+    # The 4-D grid shared by every headcount level, flattened once
+    a, t, d, r = (g.ravel() for g in np.meshgrid(approvals, tools, delay_cut, rejection_cut, indexing="ij"))
+    grid_cost = (
+        (base["approvals_per_task"] - a) * weights["approvals_per_task"]
+        + (base["tool_count"] - t) * weights["tool_count"]
+        + d * weights["avg_delays_hours"]
+        + r * weights["rejection_rate"]
+    )
+    delays = base["avg_delays_hours"] * (1 - d / 100)
+    rejection = base["rejection_rate"] * (1 - r / 100)
+    fixed_cols = {f: base[f] for f in ("monthly_volume", "avg_annual_salary", "total_project_budget")}
+
+    baseline = loss_engine.compute({f: np.array([float(base[f])]) for f in loss_engine.INPUT_FIELDS})
+    baseline_loss = baseline["financial_loss_weekly"][0].item()
+
+    # Running frontier as parallel arrays: people, grid index, cost, savings, loss, clarity
+    front = [np.empty(0) for _ in range(6)]
+    candidates = len(people) * len(a)
+    evaluated = pruned = levels_done = levels_partial = 0
+    complete = True
+
+    for level in _interleave(len(people)):
+        if (levels_done or evaluated) and time.perf_counter() > deadline:
+            complete = False
+            break
+        p = people[level]
+        cost = grid_cost + (base["people_involved"] - p) * weights["people_involved"]
+        candidates_left = np.flatnonzero(cost <= max_change_cost) if max_change_cost is not None else np.arange(len(cost))
+        pruned += len(cost) - len(candidates_left)
+
+        for start in range(0, len(candidates_left), OPTIMIZE_CHUNK):
+            if evaluated and time.perf_counter() > deadline:
+                complete = False
+                break
+            keep = candidates_left[start:start + OPTIMIZE_CHUNK]
+            n = len(keep)
+            scored = loss_engine.compute({
+                "people_involved": np.full(n, p),
+                "approvals_per_task": a[keep],
+                "tool_count": t[keep],
+                "avg_delays_hours": delays[keep],
+                "rejection_rate": rejection[keep],
+                **{f: np.full(n, float(v)) for f, v in fixed_cols.items()},
+            })
+            evaluated += n
+            loss = scored["financial_loss_weekly"]
+            local = pareto_front(cost[keep], baseline_loss - loss)
+            merged = [
+                np.concatenate((front[0], np.full(len(local), p))),
+                np.concatenate((front[1], keep[local])),
+                np.concatenate((front[2], cost[keep][local])),
+                np.concatenate((front[3], (baseline_loss - loss)[local])),
+                np.concatenate((front[4], loss[local])),
+                np.concatenate((front[5], scored["clarity_score"][local])),
+            ]
+            best = pareto_front(merged[2], merged[3])
+            front = [m[best] for m in merged]
+        if not complete:
+            # The deadline hit inside this level: some of its chunks were scored
+            levels_partial = 1
+            break
+        levels_done += 1
+
+    points = []
+    for i in _thin(np.arange(len(front[0])), max_points):
+        g = int(front[1][i])
+        values = {
+            "people_involved": int(front[0][i]),
+            "approvals_per_task": int(a[g]),
+            "tool_count": int(t[g]),
+            "avg_delays_hours": delays[g].item(),
+            "rejection_rate": rejection[g].item(),
+        }
+        # Compare unrounded values; round only what is shown
+        inputs = {k: round(v, 2) if isinstance(v, float) else v for k, v in values.items()}
+        points.append({
+            "changes": {k: inputs[k] for k, v in values.items() if v != base[k]},
+            "inputs": inputs,
+            "change_cost": round(front[2][i].item(), 2),
+            "weekly_savings": round(front[3][i].item(), 2),
+            "savings_pct": round(front[3][i].item() / baseline_loss * 100, 2) if baseline_loss else 0.0,
+            "new_weekly_loss": round(front[4][i].item(), 2),
+            "clarity_score": int(front[5][i]),
+        })
+
+    return {
+        "baseline_weekly_loss": round(baseline_loss, 2),
+        "frontier": points,
+        "frontier_size": len(front[0]),
+        "candidates": candidates,
+        "evaluated": evaluated,
+        "pruned_by_cost": pruned,
+        "levels_searched": levels_done,
+        "levels_partial": levels_partial,
+        "levels_total": len(people),
+        "complete": complete,
+        "effort_weights": weights,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,209 @@
+"""Peer benchmark index: percentile rank of a workflow against similar ones.
+
+Peers are stored workflows in the same size band (``people_involved``) and
+tool-count band. Each peer group keeps its clarity scores and waste ratios
+in sorted lists. A lookup is two bisects, O(log n). An insert or removal is
+a bisect plus a list shift; the table is never scanned.
+
+The index is loaded once at startup. After that it is kept current by the
+handlers that create, re-score or delete workflows (``add``, which also
+replaces an existing entry, and ``remove``). The benchmark is the mean of two percentiles:
+
+* clarity: share of peers with a *lower* clarity score (higher is better)
+* waste:   share of peers with a *higher* waste ratio (lower is better)
+
+Ties count half. Groups with fewer than ``PEER_MIN_GROUP`` members fall back
+to the whole portfolio; with no data at all the benchmark is a neutral 50.
+"""
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from sqlalchemy import func
+
+from database import WorkflowDB
+
+PEER_MIN_GROUP = int(os.getenv("PEER_MIN_GROUP", "5"))
+# Lower edges of the size / tool-count bands
+PEOPLE_BANDS = (1, 4, 8, 16, 31)
+TOOL_BANDS = (0, 2, 4, 6)
+NEUTRAL_SCORE = 50
+ALL_PEERS = "all"
+
+
+def _band(value, edges):
+    return max(0, bisect_right(edges, value) - 1)
+
+
+def peer_group(people_involved, tool_count):
+    return (_band(people_involved, PEOPLE_BANDS), _band(tool_count, TOOL_BANDS))
+
+
+def _describe(group):
+    if group == ALL_PEERS:
+        return "all workflows"
+    (p, t) = group
+    people_hi = f"-{PEOPLE_BANDS[p + 1] - 1}" if p + 1 < len(PEOPLE_BANDS) else "+"
+    tools_hi = f"-{TOOL_BANDS[t + 1] - 1}" if t + 1 < len(TOOL_BANDS) else "+"
+    return f"{PEOPLE_BANDS[p]}{people_hi} people, {TOOL_BANDS[t]}{tools_hi} tools"
+
+
+class _Group:
+    __slots__ = ("clarity", "waste")
+
+    def __init__(self):
+        self.clarity = []
+        self.waste = []
+
+    def add(self, clarity, waste):
+        insort(self.clarity, clarity)
+        insort(self.waste, waste)
+
+    def remove(self, clarity, waste):
+        for values, value in ((self.clarity, clarity), (self.waste, waste)):
+            i = bisect_left(values, value)
+            if i < len(values) and values[i] == value:
+                values.pop(i)
+
+    def percentiles(self, clarity, waste, own=0):
+        """``own``: copies of these exact values in the group that are the workflow itself."""
+        n = len(self.clarity) - own
+        c_lo, c_hi = bisect_left(self.clarity, clarity), bisect_right(self.clarity, clarity) - own
+        w_lo, w_hi = bisect_left(self.waste, waste), bisect_right(self.waste, waste) - own
+        clarity_pct = (c_lo + 0.5 * (c_hi - c_lo)) / n * 100
+        waste_pct = (n - w_hi + 0.5 * (w_hi - w_lo)) / n * 100
+        return clarity_pct, waste_pct
+
+
+class PeerIndex:
+    def __init__(self, min_group=PEER_MIN_GROUP):
+        self.min_group = min_group
+        self._groups = {}
+        self._entries = {}  # workflow id -> (group, clarity, waste)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.fallbacks = 0
+
+    def _add(self, workflow_id, group, clarity, waste):
+        if workflow_id in self._entries:
+            self._remove(workflow_id)
+        self._entries[workflow_id] = (group, clarity, waste)
+        self._groups.setdefault(group, _Group()).add(clarity, waste)
+        self._groups.setdefault(ALL_PEERS, _Group()).add(clarity, waste)
+
+    def _remove(self, workflow_id):
+        entry = self._entries.pop(workflow_id, None)
+        if entry is not None:
+            group, clarity, waste = entry
+            self._groups[group].remove(clarity, waste)
+            self._groups[ALL_PEERS].remove(clarity, waste)
+
+    def load(self, session_factory, chunk_size=5000):
+        """Build the index from the workflows table (typed columns + two JSON fields)."""
+        db = session_factory()
+        try:
+            query = db.query(
+                WorkflowDB.id,
+                WorkflowDB.input_data["people_involved"].as_integer(),
+                # -> on PostgreSQL, json_extract on SQLite; both hand json_array_length a JSON array
+                func.json_array_length(WorkflowDB.input_data["tools_used"]),
+                WorkflowDB.clarity_score,
+                WorkflowDB.waste_ratio,
+            ).filter(WorkflowDB.clarity_score.isnot(None), WorkflowDB.waste_ratio.isnot(None))
+            groups, entries = {ALL_PEERS: _Group()}, {}
+            for workflow_id, people, tools, clarity, waste in query.yield_per(chunk_size):
+                group = peer_group(people or 0, tools or 0)
+                entries[workflow_id] = (group, clarity, waste)
+                target = groups.setdefault(group, _Group())
+                for g in (target, groups[ALL_PEERS]):
+                    g.clarity.append(clarity)
+                    g.waste.append(waste)
+            # Bulk load: sort each list once instead of n insorts
+            for g in groups.values():
+                g.clarity.sort()
+                g.waste.sort()
+        finally:
+            db.close()
+        with self._lock:
+            self._groups, self._entries = groups, entries
+
+    def add(self, workflow_id, input_data, result_data):
+        group = peer_group(input_data["people_involved"], len(input_data.get("tools_used") or []))
+        with self._lock:
+            self._add(workflow_id, group, result_data["clarity_score"], result_data["waste_ratio"])
+
+    def remove(self, workflow_id):
+        with self._lock:
+            self._remove(workflow_id)
+
+    def _lookup(self, group, clarity, waste, own=0):
+        self.lookups += 1
+        peers = self._groups.get(group)
+        if peers is None or len(peers.clarity) - own < self.min_group:
+            self.fallbacks += 1
+            group, peers = ALL_PEERS, self._groups.get(ALL_PEERS)
+        if peers is None or len(peers.clarity) - own <= 0:
+            return {"score": NEUTRAL_SCORE, "peer_group": _describe(group), "peers": 0,
+                    "clarity_percentile": None, "waste_percentile": None}
+        clarity_pct, waste_pct = peers.percentiles(clarity, waste, own)
+        return {
+            "score": int(round((clarity_pct + waste_pct) / 2)),
+            "peer_group": _describe(group),
+            "peers": len(peers.clarity) - own,
+            "clarity_percentile": round(clarity_pct, 1),
+            "waste_percentile": round(waste_pct, 1),
+        }
+
+    def benchmark(self, people_involved, tool_count, clarity, waste, exclude_id=None):
+        """Peer benchmark for these metrics -> dict with the 0-100 ``score``.
+
+        ``exclude_id`` leaves a workflow's own stored entry out of its peer set.
+        """
+        group = peer_group(people_involved, tool_count)
+        with self._lock:
+            own = self._entries.get(exclude_id) if exclude_id is not None else None
+            if own is not None:
+                self._remove(exclude_id)
+            try:
+                return self._lookup(group, clarity, waste)
+            finally:
+                if own is not None:
+                    self._add(exclude_id, *own)
+
+    def benchmark_many(self, rows):
+        """Benchmarks for a batch of ``(people, tool_count, clarity, waste)``.
+
+        Each row is ranked against the stored peers *and* the rest of its batch,
+        so a first import into an empty portfolio still gets meaningful scores.
+        The batch is only staged; call ``add`` once the rows are committed.
+        """
+        staged = [(("batch", i), peer_group(p, t), c, w) for i, (p, t, c, w) in enumerate(rows)]
+        with self._lock:
+            for key, group, clarity, waste in staged:
+                self._add(key, group, clarity, waste)
+            try:
+                # own=1: each row is in its group, and is discounted from its own ranking
+                return [self._lookup(group, clarity, waste, own=1) for _, group, clarity, waste in staged]
+            finally:
+                for key, *_ in staged:
+                    self._remove(key)
+
+    def benchmark_for(self, input_data, result_data, exclude_id=None):
+        return self.benchmark(
+            input_data["people_involved"],
+            len(input_data.get("tools_used") or []),
+            result_data["clarity_score"],
+            result_data["waste_ratio"],
+            exclude_id=exclude_id,
+        )
+
+    def stats(self):
+        return {
+            "workflows": len(self._entries),
+            "groups": len(self._groups) - (ALL_PEERS in self._groups),
+            "lookups": self.lookups,
+            "fallbacks": self.fallbacks,
+        }
+
+
+peer_index = PeerIndex()
@@ -0,0 +1,149 @@
+"""PPTX executive decks, built from a template parsed once per process.
+
+The template (a branded ``.pptx`` at ``PPTX_TEMPLATE_PATH``, or python-pptx's
+default deck) is parsed on first use and kept in memory. Every report then
+works on a deep copy of that parsed presentation, which skips re-reading the
+package and setting up its masters and layouts for every report. The gain is
+modest: slide building dominates a full render, so the copy trims a couple of
+milliseconds off each deck. The template itself is never touched again.
+
+Two deck variants share the slide builders:
+
+* ``long``  - 'Invisible Business Loss Report': title, summary, friction points, action plan
+* ``short`` - 'LUMINA Intelligence Report': title, summary, top-5 roadmap
+
+python-pptx is imported when the template is first loaded, so importing
+this module (as the API process does) stays cheap.
+
+The template needs a title layout and a title-and-content layout at the
+indexes below; any slides it ships with are dropped.
+"""
+import copy
+import io
+import os
+from datetime import datetime
+
+PPTX_TEMPLATE_PATH = os.getenv("PPTX_TEMPLATE_PATH")
+TITLE_LAYOUT = 0
+CONTENT_LAYOUT = 1
+
+_template = None
+
+
+def load_template():
+    """Parse the template once per process and return it."""
+    global _template
+    if _template is None:
+        from pptx import Presentation
+
+        prs = Presentation(PPTX_TEMPLATE_PATH) if PPTX_TEMPLATE_PATH else Presentation()
+        # Keep the masters/layouts/theme, drop any sample slides. Works on the
+        # XML directly: touching ``prs.slides`` caches a collection that no
+        # longer lines up with the deep copies.
+        slide_ids = prs._element.sldIdLst
+        if slide_ids is not None:
+            for slide_id in list(slide_ids):
+                prs.part.drop_rel(slide_id.rId)
+                slide_ids.remove(slide_id)
+        _template = prs
+    return _template
+
+
+def _new_deck():
+    return copy.deepcopy(load_template())
+
+
+def _add_slide(prs, layout, title_text):
+    slide = prs.slides.add_slide(prs.slide_layouts[layout])
+    slide.shapes.title.text = title_text
+    return slide
+
+
+# --- Slide builders ---
+
+def _long_title(prs, name, inp, res):
+    slide = _add_slide(prs, TITLE_LAYOUT, "Invisible Business Loss Report")
+    slide.placeholders[1].text = f"Analysis for: {name}\nGenerated by IBLD Executive AI"
+
+
+def _long_summary(prs, name, inp, res):
+    slide = _add_slide(prs, CONTENT_LAYOUT, "Executive Summary")
+    slide.placeholders[1].text = (
+        f"Process: {inp['name']}\n"
+        f"Team Size: {inp['people_involved']} | Approvals: {inp['approvals_per_task']}\n\n"
+        f"Financial Impact: ₹{res['estimated_financial_loss']:,} / week\n"
+        f"Time Wasted: {res['weekly_time_loss_hours']} hours / week\n"
+        f"Clarity Score: {res['clarity_score']}/100 (Industry Avg: {res['industry_benchmark_score']})"
+    )
+
+
+def _friction_points(prs, name, inp, res):
+    slide = _add_slide(prs, CONTENT_LAYOUT, "Identified Friction Points")
+    bullets = ""
+    for point in res.get('invisible_loss_points', [])[:3]:
+        bullets += f"• {point['title']}: {point['reason']} (Impact: {point['impact']})\n"
+    slide.placeholders[1].text = bullets
+
+
+def _action_plan(prs, name, inp, res):
+    slide = _add_slide(prs, CONTENT_LAYOUT, "Strategic Action Plan")
+    recs = ""
+    for rec in res.get('recommendations', []):
+        recs += f"• {rec['type'].upper()}: {rec['action']} -> {rec['impact']}\n"
+    slide.placeholders[1].text = recs
+
+
+def _short_title(prs, name, inp, res):
+    slide = _add_slide(prs, TITLE_LAYOUT, "LUMINA Intelligence Report")
+    slide.placeholders[1].text = f"Analysis: {inp.get('name', 'Workflow')}\nGenerated: {datetime.now().strftime('%Y-%m-%d')}"
+
+
+def _short_summary(prs, name, inp, res):
+    slide = _add_slide(prs, CONTENT_LAYOUT, "Executive Summary")
+    tf = slide.placeholders[1].text_frame
+    tf.text = f"Clarity Score: {res.get('clarity_score', 0)}/100"
+    for line in (
+        f"Weekly Time Loss: {res.get('weekly_time_loss_hours', 0)} hours",
+        f"Estimated Annual Financial Loss: INR {res.get('estimated_financial_loss', 0) * 50:,.0f}",
+        f"Risk Severity: {res.get('severity', 'Unknown')}",
+    ):
+        p = tf.add_paragraph()
+        p.text = line
+        p.level = 1
+
+
+def _roadmap(prs, name, inp, res):
+    slide = _add_slide(prs, CONTENT_LAYOUT, "Strategic Roadmap")
+    tf = slide.placeholders[1].text_frame
+    tf.text = "Recommended Actions:"
+    for rec in res.get('recommendations', [])[:5]:  # Top 5
+        p = tf.add_paragraph()
+        p.text = f"{rec.get('type')}: {rec.get('action')}"
+        p.level = 1
+
+        p = tf.add_paragraph()
+        p.text = f"Impact: {rec.get('impact')}"
+        p.level = 2
+
+
+# variant -> (filename prefix, slide builders)
+VARIANTS = {
+    "long": ("IBLD_Report", (_long_title, _long_summary, _friction_points, _action_plan)),
+    "short": ("Lumina_Report", (_short_title, _short_summary, _roadmap)),
+}
+
+
+def render_pptx(workflow, variant="long"):
+    """Fill a cloned template with ``workflow`` (a snapshot dict) -> (filename, bytes)."""
+    prefix, builders = VARIANTS[variant]
+    prs = _new_deck()
+    for build in builders:
+        build(prs, workflow["name"], workflow["input_data"], workflow["result_data"])
+
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return f"{prefix}_{workflow['id']}.pptx", buffer.getvalue()
+
+
+def render_pptx_short(workflow):
+    return render_pptx(workflow, variant="short")
@@ -0,0 +1,156 @@
+"""Import-time and cold-start profile for the API.
+
+Each run uses fresh interpreters against a scratch SQLite DB with the stub AI
+model, so results don't depend on local state or network. Import cost comes
+from a separate ``python -X importtime -c "import main"``. The timed process
+starts export-pool workers, and spawn would pass ``-X importtime`` on to
+them, mixing their ReportLab/pptx imports into the report. A run records:
+
+* import cost of ``main`` and of its heaviest direct imports
+* time to finish lifespan startup (including ``STARTUP_WARMUP`` hooks)
+* first and second call latency of ``/``, ``/analyze`` and the PDF/PPTX exports
+
+Medians over ``--runs`` are printed as a table and optionally written as JSON:
+
+    python profile_startup.py --runs 5 --output startup.json
+    python profile_startup.py --warmup all
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_WORKFLOW = {
+    "name": "Profile", "description": "Invoice approval with manual re-keying",
+    "people_involved": 8, "approvals_per_task": 3, "tools_used": ["ERP", "Email", "Excel"],
+    "avg_delays_hours": 6, "rejection_rate": 10, "monthly_volume": 200,
+}
+
+
+def _child():
+    """Runs inside the profiled interpreter; prints one JSON line of timings (ms)."""
+    started = time.perf_counter()
+    import main
+    from fastapi.testclient import TestClient
+    timings = {"import_main": (time.perf_counter() - started) * 1000}
+
+    def timed(label, call):
+        t = time.perf_counter()
+        response = call()
+        timings[label] = (time.perf_counter() - t) * 1000
+        return response
+
+    t = time.perf_counter()
+    with TestClient(main.app) as client:
+        timings["lifespan_startup"] = (time.perf_counter() - t) * 1000
+        client.post("/users/", json={"username": "profile", "password": "profile"})
+        token = client.post("/token", data={"username": "profile", "password": "profile"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        timed("root_first", lambda: client.get("/"))
+        first = timed("analyze_first", lambda: client.post("/analyze", json=SAMPLE_WORKFLOW, headers=headers)).json()["id"]
+        # force=true: an identical input would otherwise be deduplicated to the first id
+        second = timed("analyze_second", lambda: client.post("/analyze?force=true", json=SAMPLE_WORKFLOW, headers=headers)).json()["id"]
+        assert second != first, "second /analyze was deduplicated"
+        for kind in ("pdf", "pptx"):
+            # Artifacts are cached per workflow id, so the second export is a real render
+            timed(f"export_{kind}_first", lambda: client.get(f"/export/{kind}/{first}"))
+            timed(f"export_{kind}_second", lambda: client.get(f"/export/{kind}/{second}"))
+    print(json.dumps({k: round(v, 2) for k, v in timings.items()}))
+
+
+def _parse_importtime(stderr, top):
+    """Cumulative microseconds of ``main`` and its direct imports."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            try:
+                modules[name.strip()] = int(cumulative)
+            except ValueError:
+                pass  # header line
+    heaviest = sorted(modules.items(), key=lambda item: -item[1])[:top]
+    return {name: us / 1000 for name, us in heaviest}
+
+
+def profile_once(warmup, top):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": BACKEND_DIR,
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'profile.db')}",
+            "AI_BACKEND": "stub",
+            "AI_STUB_LATENCY": "0",
+            "STARTUP_WARMUP": warmup,
+        })
+        env.pop("ASYNC_DATABASE_URL", None)
+        imports = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=workdir, env=env, capture_output=True, text=True, check=False,
+        )
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            cwd=workdir, env=env, capture_output=True, text=True, check=False,
+        )
+    for run in (imports, proc):
+        if run.returncode != 0:
+            raise RuntimeError(f"profiled interpreter failed:\n{run.stderr[-4000:]}")
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    return timings, _parse_importtime(imports.stderr, top)
+
+
+def _median(samples):
+    keys = dict.fromkeys(key for sample in samples for key in sample)
+    return {key: round(statistics.median(s[key] for s in samples if key in s), 2) for key in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", default="", help="STARTUP_WARMUP value for the profiled process (e.g. 'all')")
+    parser.add_argument("--top", type=int, default=15, help="direct imports of main to report")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child()
+        return
+
+    phase_runs, import_runs = [], []
+    for _ in range(args.runs):
+        phases, imports = profile_once(args.warmup, args.top)
+        phase_runs.append(phases)
+        import_runs.append(imports)
+
+    report = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "warmup": args.warmup,
+        "phases_ms": _median(phase_runs),
+        "imports_ms": dict(sorted(_median(import_runs).items(), key=lambda item: -item[1])),
+    }
+
+    print(f"{'phase':<28}{'median ms':>12}")
+    for name, value in report["phases_ms"].items():
+        print(f"{name:<28}{value:>12.1f}")
+    print(f"\n{'import (cumulative)':<28}{'median ms':>12}")
+    for name, value in report["imports_ms"].items():
+        print(f"{name:<28}{value:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
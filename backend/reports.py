@@ -0,0 +1,151 @@
+"""Executive report renderers (PDF via ReportLab; PPTX decks live in pptx_deck).
+
+Renderers take a plain workflow snapshot dict (id, name, input_data,
+result_data) and return ``(filename, bytes)``; nothing touches the disk.
+
+ReportLab is imported on first render, not at import time: the API process
+only needs ``workflow_snapshot`` and the media types, and the export workers
+load the renderer in their initializer.
+"""
+import io
+from datetime import datetime
+
+PDF_MEDIA_TYPE = 'application/pdf'
+PPTX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+
+def workflow_snapshot(workflow):
+    """Plain-dict view of a WorkflowDB row, safe to pass to renderers."""
+    return {
+        "id": workflow.id,
+        "name": workflow.name,
+        "input_data": workflow.input_data,
+        "result_data": workflow.result_data,
+    }
+
+
+def load_pdf_backend():
+    """Import ReportLab ahead of the first render (export worker warm-up)."""
+    import reportlab.platypus  # noqa: F401
+
+
+def render_pdf_report(workflow):
+    """Multi-page LUMINA audit PDF -> (filename, bytes)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
+    workflow_id = workflow["id"]
+    res = workflow["result_data"]
+    inp = workflow["input_data"]
+    
+    filename = f"LUMINA_Audit_Report_{workflow_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
+    buffer = io.BytesIO()
+    
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
+    story = []
+    
+    styles = getSampleStyleSheet()
+    # Custom Styles
+    style_title = ParagraphStyle('LuminaTitle', parent=styles['Heading1'], fontSize=42, textColor=colors.HexColor("#2d2626"), spaceAfter=20, alignment=1)
+    style_subtitle = ParagraphStyle('LuminaSubtitle', parent=styles['Normal'], fontSize=16, textColor=colors.HexColor("#7a6e6e"), alignment=1, spaceAfter=60)
+    style_h1 = ParagraphStyle('LuminaH1', parent=styles['Heading2'], fontSize=20, textColor=colors.HexColor("#2d2626"), spaceAfter=15, spaceBefore=20)
+    style_metric = ParagraphStyle('LuminaMetric', parent=styles['Normal'], fontSize=18, textColor=colors.HexColor("#2d2626"), alignment=1)
+    style_metric_label = ParagraphStyle('LuminaMetricLabel', parent=styles['Normal'], fontSize=10, textColor=colors.HexColor("#7a6e6e"), alignment=1)
+    
+    # --- PAGE 1: COVER ---
+    story.append(Spacer(1, 150))
+    story.append(Paragraph("LUMINA", style_title))
+    story.append(Paragraph("OPERATIONAL INTELLIGENCE AUDIT", ParagraphStyle('Sub', parent=style_subtitle, fontSize=14, spaceAfter=10, tracking=2)))
+    story.append(Spacer(1, 20))
+    story.append(Paragraph(f"Subject: {inp['name']}", style_subtitle))
+    story.append(Spacer(1, 150))
+    story.append(Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", ParagraphStyle('Date', parent=styles['Normal'], alignment=1, textColor=colors.gray)))
+    story.append(Paragraph("CONFIDENTIAL // INTERNAL USE ONLY", ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=1, textColor=colors.lightgrey)))
+    story.append(PageBreak())
+    
+    # --- PAGE 2: EXECUTIVE SUMMARY ---
+    story.append(Paragraph("Executive Summary", style_h1))
+    story.append(Paragraph("At A Glance", styles['Heading3']))
+    
+    # Metrics Table
+    financial_str = f"INR {res['estimated_financial_loss']:,.0f}"
+    clarity_str = f"{res['clarity_score']}/100"
+    efficiency_str = "OPTIMIZED" if res['clarity_score'] > 80 else ("SUB-OPTIMAL" if res['clarity_score'] > 50 else "CRITICAL")
+    eff_color = colors.HexColor("#3fb950") if res['clarity_score'] > 80 else (colors.HexColor("#d29922") if res['clarity_score'] > 50 else colors.HexColor("#d94242"))
+    
+    data = [
+        [Paragraph(financial_str, style_metric), Paragraph(clarity_str, style_metric), Paragraph(efficiency_str, ParagraphStyle('Eff', parent=style_metric, textColor=eff_color))],
+        [Paragraph("Annual Capital Bleed", style_metric_label), Paragraph("Clarity Score", style_metric_label), Paragraph("Efficiency Rating", style_metric_label)]
+    ]
+    
+    t = Table(data, colWidths=[2.3*inch, 2.3*inch, 2.3*inch])
+    t.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('BACKGROUND', (0,0), (-1,-1), colors.HexColor("#fdf6f5")),
+        ('BOX', (0,0), (-1,-1), 1, colors.white),
+        ('PADDING', (0,0), (-1,-1), 20),
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 30))
+    
+    # Verdict
+    story.append(Paragraph("The Operations Verdict", styles['Heading3']))
+    verdict_text = f"This workflow is currently operating at a <b>{efficiency_str}</b> level. The analysis identified {len(res.get('invisible_loss_points', []))} major friction points contributing to a {res.get('waste_ratio',0)}% waste of total investment. Immediate remediation is recommended to recover the reported capital bleed."
+    story.append(Paragraph(verdict_text, styles['Normal']))
+    story.append(PageBreak())
+    
+    # --- PAGE 3: DEEP DIVE ---
+    story.append(Paragraph("Friction Point Analysis", style_h1))
+    
+    table_data = [['Blindspot Issue', 'Root Cause', 'Impact']]
+    for p in res.get('invisible_loss_points', []):
+        table_data.append([
+            Paragraph(p['title'], styles['Normal']),
+            Paragraph(p['root_cause'] or p['blindness_reason'] or "Process Ambiguity", styles['BodyText']),
+            Paragraph(p['impact'] or "High Latency", styles['BodyText'])
+        ])
+    
+    t2 = Table(table_data, colWidths=[2*inch, 3*inch, 2*inch])
+    t2.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2d2626")),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,0), 10),
+        ('BOTTOMPADDING', (0,0), (-1,0), 12),
+        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#e0e0e0")),
+        ('PADDING', (0,0), (-1,-1), 10),
+    ]))
+    story.append(t2)
+    story.append(PageBreak())
+
+    # --- PAGE 4: STRATEGIC ROADMAP ---
+    story.append(Paragraph("Strategic Remediation Roadmap", style_h1))
+    
+    # Split Recs
+    quick_wins = [r for r in res.get('recommendations', []) if r['type'] in ['Automate', 'Eliminate']]
+    structural = [r for r in res.get('recommendations', []) if r['type'] not in ['Automate', 'Eliminate']]
+    
+    story.append(Paragraph("Phase 1: Quick Wins (0-30 Days)", styles['Heading3']))
+    for qw in quick_wins:
+        story.append(Paragraph(f"• <b>{qw['action']}</b>", styles['Normal']))
+        story.append(Paragraph(f"  <i>Impact: {qw['impact']}</i>", ParagraphStyle('Indent', parent=styles['BodyText'], leftIndent=20)))
+        story.append(Spacer(1, 10))
+        
+    story.append(Spacer(1, 20))
+    story.append(Paragraph("Phase 2: Structural Transformation", styles['Heading3']))
+    for st in structural:
+        story.append(Paragraph(f"• <b>{st['action']}</b>", styles['Normal']))
+        story.append(Paragraph(f"  <i>Impact: {st['impact']}</i>", ParagraphStyle('Indent', parent=styles['BodyText'], leftIndent=20)))
+        story.append(Spacer(1, 10))
+        
+    story.append(Spacer(1, 40))
+    story.append(Paragraph(f"Projected Annual Value Unlocked: ₹{res['estimated_financial_loss']*50:,.0f}", ParagraphStyle('FooterBold', parent=styles['Heading3'], textColor=colors.HexColor("#3fb950"), alignment=2)))
+
+    doc.build(story)
+    
+    return filename, buffer.getvalue()
@@ -0,0 +1,59 @@
+"""Single-flight coalescing for concurrent identical work.
+
+A shared report link or a double-submitted form can start the same expensive
+call many times at once: the same export render, or the same AI prompt.
+``SingleFlight.do(key, fn)`` runs ``fn()`` once per key at a time. Callers
+that arrive while that call is in flight await the same task and receive
+its result, or the same exception.
+
+The shared call runs as its own task, and each caller awaits it through
+``asyncio.shield``. A caller that disconnects or times out stops waiting
+without cancelling the work for the others. Nothing is cached here; a key is
+forgotten as soon as its call finishes (caching is the job of
+``artifact_cache`` / ``ai_point_cache``).
+"""
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}  # key -> asyncio.Task
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so an error nobody awaited anymore isn't logged as lost
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def do(self, key, fn):
+        """Result of ``await fn()``, shared with every concurrent caller using ``key``."""
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "coalesced_ratio": round(self.coalesced / calls, 4) if calls else 0.0,
+        }
+
+
+# One group per kind of work, so keys never collide across them
+analyze_flights = SingleFlight("analyze")
+export_flights = SingleFlight("export")
+ai_flights = SingleFlight("ai")
@@ -0,0 +1,54 @@
+"""Shared fixtures: the API on a scratch SQLite DB with the stub AI model.
+
+The environment has to be set before ``main`` (and through it ``database``)
+is imported, so it happens at module import, not in a fixture.
+"""
+import os
+import sys
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="lumina-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["AI_BACKEND"] = "stub"
+os.environ["AI_STUB_LATENCY"] = "0"
+os.environ["STARTUP_WARMUP"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+SAMPLE_WORKFLOW = {
+    "name": "Invoice approval",
+    "description": "Invoices are re-keyed from email into the ERP and approved twice",
+    "people_involved": 8,
+    "approvals_per_task": 3,
+    "tools_used": ["ERP", "Email", "Excel", "Slack"],
+    "avg_delays_hours": 6,
+    "rejection_rate": 10,
+    "monthly_volume": 200,
+}
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def headers(client):
+    client.post("/users/", json={"username": "tester", "password": "tester"})
+    token = client.post("/token", data={"username": "tester", "password": "tester"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def workflow(client, headers):
+    """A freshly analyzed workflow (forced, so tests never share a row)."""
+    response = client.post("/analyze?force=true", json=SAMPLE_WORKFLOW, headers=headers)
+    assert response.status_code == 200
+    return response.json()
@@ -0,0 +1,107 @@
+"""POST /analyze/import: per-row errors in CSV and NDJSON uploads."""
+import io
+import json
+
+import bulk_import
+import main
+
+CSV_HEADER = "name,description,people_involved,approvals_per_task,tools_used,avg_delays_hours,monthly_volume\n"
+
+
+def events(frames):
+    """Parse SSE frames into ``[(event, payload)]``."""
+    parsed = []
+    for frame in "".join(frames).strip().split("\n\n"):
+        name, data = frame.split("\n")
+        parsed.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+def run_import(text, fmt, chunk_size=bulk_import.IMPORT_CHUNK_SIZE, owner_id=None):
+    frames = bulk_import.stream_import(io.BytesIO(text.encode("utf-8")), fmt, owner_id, main.WorkflowInput, chunk_size=chunk_size)
+    return events(frames)
+
+
+def row_errors(parsed):
+    return {payload["line"]: payload["errors"] for name, payload in parsed if name == "row_error"}
+
+
+def test_csv_row_errors_carry_line_and_field(client):
+    text = CSV_HEADER + (
+        "Good,ok,4,2,ERP;Email,3,10\n"
+        "Bad number,x,many,2,ERP,3,10\n"
+        "Blank tools,x,4,2,,3,10\n"
+        "Bad list,x,4,2,[\"ERP\",3,10\n"
+        "Missing people,x,,2,ERP,3,10\n"
+    )
+    parsed = run_import(text, "csv")
+    errors = row_errors(parsed)
+
+    # Line numbers count the header, so the first data row is line 2
+    assert set(errors) == {3, 5, 6}
+    assert errors[3][0]["field"] == "people_involved"
+    assert errors[5][0]["message"].startswith("Invalid list value")
+    assert errors[6] == [{"field": "people_involved", "message": "Field required"}]
+
+    name, done = parsed[-1]
+    assert name == "done"
+    assert (done["processed"], done["imported"], done["failed"]) == (5, 2, 3)
+
+
+def test_ndjson_row_errors(client):
+    lines = [
+        json.dumps({"name": "Good", "description": "", "people_involved": 3, "approvals_per_task": 1, "tools_used": [], "avg_delays_hours": 1}),
+        "{not json",
+        "",
+        "[1, 2]",
+        json.dumps({"name": "Bad", "description": "", "people_involved": 3, "approvals_per_task": 1, "tools_used": "ERP", "avg_delays_hours": 1}),
+    ]
+    parsed = run_import("\n".join(lines) + "\n", "ndjson")
+    errors = row_errors(parsed)
+
+    assert set(errors) == {2, 4, 5}
+    assert errors[2][0]["message"].startswith("Invalid JSON")
+    assert errors[4] == [{"field": None, "message": "Expected a JSON object"}]
+    assert errors[5][0]["field"] == "tools_used"
+    # The blank line is skipped, not counted
+    assert parsed[-1][1]["processed"] == 4
+    assert parsed[-1][1]["imported"] == 1
+
+
+def test_bad_rows_do_not_block_chunks(client):
+    good = "Row {n},x,4,2,ERP,3,10\n"
+    text = CSV_HEADER + "".join(good.format(n=n) if n % 3 else "Bad,x,4,2,ERP,soon,10\n" for n in range(1, 10))
+    parsed = run_import(text, "csv", chunk_size=2)
+
+    progress = [payload for name, payload in parsed if name == "progress"]
+    assert [p["imported"] for p in progress] == [2, 4, 6]
+    assert [p["failed"] for p in progress] == [0, 1, 2]
+    assert (parsed[-1][1]["failed"], parsed[-1][1]["chunks"]) == (3, 3)
+
+
+def test_row_error_events_are_capped(client, monkeypatch):
+    monkeypatch.setattr(bulk_import, "IMPORT_MAX_ROW_ERRORS", 2)
+    text = CSV_HEADER + "Bad,x,many,2,ERP,3,10\n" * 5
+    parsed = run_import(text, "csv")
+
+    assert len(row_errors(parsed)) == 2
+    assert parsed[-1][1]["failed"] == 5
+    assert parsed[-1][1]["errors_reported"] == 2
+
+
+def test_undecodable_upload_reports_an_error(client):
+    frames = bulk_import.stream_import(io.BytesIO(CSV_HEADER.encode() + b"\xff\xfe\n"), "csv", None, main.WorkflowInput)
+    name, payload = events(frames)[-1]
+    assert name == "error"
+    assert payload["message"].startswith("Could not parse the upload")
+
+
+def test_endpoint_streams_events_and_rejects_unknown_types(client, headers):
+    text = CSV_HEADER + "Good,ok,4,2,ERP,3,10\nBad,x,many,2,ERP,3,10\n"
+    response = client.post("/analyze/import", files={"file": ("rows.csv", text, "text/csv")}, headers=headers)
+    assert response.status_code == 200
+    parsed = events([response.text])
+    assert [name for name, _ in parsed] == ["row_error", "progress", "done"]
+
+    response = client.post("/analyze/import", files={"file": ("rows.xlsx", b"", "application/octet-stream")}, headers=headers)
+    assert response.status_code == 415
@@ -0,0 +1,64 @@
+"""POST /analyze: input-hash deduplication of repeat calls."""
+import pytest
+
+from conftest import SAMPLE_WORKFLOW
+
+
+def unique_workflow(name):
+    # A name of its own keeps other tests' rows out of the dedup window
+    return {**SAMPLE_WORKFLOW, "name": name}
+
+
+def test_duplicate_without_simulate_gets_the_flat_band(client, headers):
+    data = unique_workflow("Dedup flat band")
+    simulated = client.post("/analyze?simulate=true&samples=20000&seed=3", json=data, headers=headers).json()
+    assert simulated["confidence_interval"]["method"] == "monte_carlo"
+
+    repeat = client.post("/analyze", json=data, headers=headers).json()
+    assert repeat["deduplicated"] is True
+    assert repeat["id"] == simulated["id"]
+    weekly = repeat["estimated_financial_loss"]
+    assert "method" not in repeat["confidence_interval"]
+    assert repeat["confidence_interval"]["lower"] == pytest.approx(weekly * 0.85, abs=0.01)
+    assert repeat["confidence_interval"]["upper"] == pytest.approx(weekly * 1.15, abs=0.01)
+
+
+def test_repeat_returns_the_stored_row(client, headers):
+    data = unique_workflow("Dedup repeat")
+    first = client.post("/analyze", json=data, headers=headers).json()
+    assert first["deduplicated"] is False
+
+    repeat = client.post("/analyze", json=data, headers=headers).json()
+    assert repeat["deduplicated"] is True
+    assert repeat["id"] == first["id"]
+    assert repeat["estimated_financial_loss"] == first["estimated_financial_loss"]
+
+
+def test_normalization_ignores_whitespace_tool_order_and_number_form(client, headers):
+    data = unique_workflow("Dedup normalized")
+    first = client.post("/analyze", json=data, headers=headers).json()
+    variant = {
+        **data,
+        "name": f"  {data['name']}  ",
+        "description": data["description"].replace(" ", "   "),
+        "tools_used": list(reversed(data["tools_used"])),
+        "avg_delays_hours": float(data["avg_delays_hours"]),
+    }
+    repeat = client.post("/analyze", json=variant, headers=headers).json()
+    assert repeat["id"] == first["id"]
+
+
+def test_changed_input_force_and_other_owner_run_fresh(client, headers):
+    data = unique_workflow("Dedup fresh")
+    first = client.post("/analyze", json=data, headers=headers).json()
+
+    changed = client.post("/analyze", json={**data, "monthly_volume": data["monthly_volume"] + 1}, headers=headers).json()
+    assert changed["id"] != first["id"] and changed["deduplicated"] is False
+
+    forced = client.post("/analyze?force=true", json=data, headers=headers).json()
+    assert forced["id"] != first["id"] and forced["deduplicated"] is False
+
+    client.post("/users/", json={"username": "other-owner", "password": "other-owner"})
+    token = client.post("/token", data={"username": "other-owner", "password": "other-owner"}).json()["access_token"]
+    other = client.post("/analyze", json=data, headers={"Authorization": f"Bearer {token}"}).json()
+    assert other["id"] not in (first["id"], forced["id"]) and other["deduplicated"] is False
@@ -0,0 +1,91 @@
+"""ExportJobs: finished jobs are evicted by count and by artifact bytes."""
+from concurrent.futures import Future
+
+import pytest
+
+from export_jobs import ExportJobs
+
+
+class FakePool:
+    """Hands out futures the test resolves by hand."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, kind, snapshot):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def finish(future, content):
+    future.set_running_or_notify_cancel()
+    future.set_result(("report.pdf", content))
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+def test_oldest_finished_jobs_go_first_by_count(pool):
+    jobs = ExportJobs(pool, retention=2, max_bytes=1000)
+    first, second, third = (jobs.completed("pdf", n, "report.pdf", b"x") for n in range(3))
+
+    assert jobs.get(first.id) is None
+    assert jobs.get(second.id) is second and jobs.get(third.id) is third
+    assert jobs.bytes == 2
+
+
+def test_artifact_bytes_are_bounded(pool):
+    jobs = ExportJobs(pool, retention=100, max_bytes=10)
+    held = [jobs.completed("pdf", n, "report.pdf", b"x" * 4) for n in range(4)]
+
+    assert [jobs.get(job.id) is not None for job in held] == [False, False, True, True]
+    assert jobs.bytes == 8
+    assert jobs.stats()["done"] == 2
+
+
+def test_a_job_larger_than_the_budget_is_kept_until_the_next_one(pool):
+    jobs = ExportJobs(pool, retention=100, max_bytes=10)
+    small = jobs.completed("pdf", 1, "report.pdf", b"x" * 4)
+    large = jobs.completed("pdf", 2, "report.pdf", b"x" * 50)
+
+    assert jobs.get(small.id) is None
+    assert jobs.get(large.id) is large
+    assert jobs.bytes == 50
+
+    after = jobs.completed("pdf", 3, "report.pdf", b"x")
+    assert jobs.get(large.id) is None
+    assert jobs.bytes == 1 and jobs.get(after.id) is after
+
+
+def test_queued_and_running_jobs_are_never_evicted(pool):
+    jobs = ExportJobs(pool, retention=1, max_bytes=1000)
+    pending = [jobs.submit("pdf", {"id": n}) for n in range(3)]
+    assert all(jobs.get(job.id) is job for job in pending)
+    assert jobs.stats()["queued"] == 3
+
+    pool.futures[1].set_running_or_notify_cancel()
+    assert jobs.get(pending[1].id).status == "running"
+
+    # Finishing one evicts nothing else (the rest are still pending)...
+    finish(pool.futures[0], b"abc")
+    assert all(jobs.get(job.id) is job for job in pending)
+    # ...finishing the next one drops the older finished job
+    pool.futures[2].set_running_or_notify_cancel()
+    pool.futures[2].set_exception(RuntimeError("render crashed"))
+    assert jobs.get(pending[0].id) is None
+    assert jobs.get(pending[2].id).status == "failed"
+    assert jobs.bytes == 0
+
+
+def test_successful_jobs_report_to_on_success(pool):
+    jobs = ExportJobs(pool, retention=10, max_bytes=1000)
+    stored = []
+    job = jobs.submit("pdf", {"id": 1}, on_success=lambda filename, content: stored.append((filename, content)))
+    finish(pool.futures[0], b"pdf-bytes")
+
+    assert job.status == "done"
+    assert stored == [("report.pdf", b"pdf-bytes")]
+    assert jobs.stats()["bytes"] == len(b"pdf-bytes")
@@ -0,0 +1,17 @@
+"""GET /workflows: keyset listing is served in index order."""
+import pytest
+from sqlalchemy import text
+
+from database import engine
+
+
+@pytest.mark.parametrize("where", ["", "WHERE owner_id = 1", "WHERE severity = 'High'"])
+def test_loss_order_needs_no_sort_step(client, where):
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            f"EXPLAIN QUERY PLAN SELECT id FROM workflows {where} "
+            "ORDER BY estimated_financial_loss DESC, id DESC LIMIT 20"
+        )).all()
+    details = " ".join(step[-1] for step in plan)
+    assert "INDEX" in details
+    assert "TEMP B-TREE" not in details
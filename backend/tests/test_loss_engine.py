@@ -0,0 +1,98 @@
+"""loss_engine.compute against the original per-workflow formulas."""
+import numpy as np
+import pytest
+
+import loss_engine
+
+
+def baseline(d):
+    """The scalar math ``analyze_workflow`` ran inline before loss_engine existed."""
+    tool_friction = max(0, len(d["tools_used"]) - 2) * 0.5 * d["people_involved"]
+    approval_friction = d["approvals_per_task"] * d["people_involved"] * 1.5
+    base_delay_impact = d["avg_delays_hours"] * d["people_involved"]
+    rework_impact = (base_delay_impact + approval_friction) * (d["rejection_rate"] / 100) * 1.5
+    time_loss_per_run = tool_friction + approval_friction + base_delay_impact + rework_impact
+
+    hourly_rate = d["avg_annual_salary"] / 2000
+    annual_financial_loss = time_loss_per_run * hourly_rate * d["monthly_volume"] * 12
+    financial_loss_weekly = annual_financial_loss / 50
+    weekly_time_loss = (time_loss_per_run * d["monthly_volume"] * 12) / 50
+
+    total_investment = d["total_project_budget"]
+    if total_investment <= 0:
+        total_investment = d["avg_annual_salary"] * d["people_involved"]
+    waste_ratio = 0
+    if total_investment > 0:
+        waste_ratio = round((annual_financial_loss / total_investment) * 100, 1)
+
+    if financial_loss_weekly > 500000:
+        severity = "High"
+    elif financial_loss_weekly > 100000:
+        severity = "Medium"
+    else:
+        severity = "Low"
+
+    clarity = 100 - d["people_involved"] * 2 - len(d["tools_used"]) * 5 - d["approvals_per_task"] * 10
+    clarity = max(10, min(100, clarity))
+
+    active_work_time = d["people_involved"] * 2
+    total_wait_time = d["avg_delays_hours"] * d["people_involved"] + d["approvals_per_task"] * 24
+    total_cycle_time = active_work_time + total_wait_time
+    ddi = round((total_wait_time / total_cycle_time) * 10, 1) if total_cycle_time > 0 else 0
+
+    savings_approval = 0
+    if d["approvals_per_task"] > 1:
+        new_loss = tool_friction + (d["approvals_per_task"] - 1) * d["people_involved"] * 1.5 + base_delay_impact
+        savings_approval = (weekly_time_loss - new_loss) * hourly_rate
+
+    return {
+        "weekly_time_loss": weekly_time_loss,
+        "financial_loss_weekly": financial_loss_weekly,
+        "rework_impact": rework_impact,
+        "total_investment": total_investment,
+        "waste_ratio": waste_ratio,
+        "severity": severity,
+        "clarity_score": clarity,
+        "decision_delay_index": min(10, ddi),
+        "savings_approval": savings_approval,
+    }
+
+
+def random_inputs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "name": f"wf-{i}",
+            "description": "",
+            "people_involved": int(rng.integers(0, 40)),
+            "approvals_per_task": int(rng.integers(0, 8)),
+            "tools_used": [f"tool-{t}" for t in range(rng.integers(0, 9))],
+            "avg_delays_hours": float(rng.choice([0.0, rng.uniform(0, 72)])),
+            "rejection_rate": float(rng.uniform(0, 100)),
+            "monthly_volume": int(rng.integers(0, 2000)),
+            "avg_annual_salary": float(rng.choice([0.0, rng.uniform(1e5, 5e6)])),
+            # Zero budgets exercise the personnel-cost fallback
+            "total_project_budget": float(rng.choice([0.0, rng.uniform(1e5, 1e8)])),
+        })
+    return rows
+
+
+def test_vectorized_matches_baseline_row_by_row():
+    inputs = random_inputs(500)
+    result = loss_engine.compute(loss_engine.to_arrays(inputs))
+    for i, (d, m) in enumerate(zip(inputs, loss_engine.rows(result))):
+        expected = baseline(d)
+        for key in ("weekly_time_loss", "financial_loss_weekly", "rework_impact", "total_investment", "savings_approval"):
+            assert m[key] == pytest.approx(expected[key], rel=1e-12, abs=1e-9), (i, key)
+        assert round(m["waste_ratio"], 1) == pytest.approx(expected["waste_ratio"]), i
+        assert loss_engine.SEVERITY_LABELS[int(m["severity_code"])] == expected["severity"], i
+        assert int(m["clarity_score"]) == expected["clarity_score"], i
+        assert min(10, round(m["decision_delay_index"], 1)) == pytest.approx(expected["decision_delay_index"]), i
+
+
+def test_batch_rows_match_single_rows():
+    inputs = random_inputs(50, seed=1)
+    batch = list(loss_engine.rows(loss_engine.compute(loss_engine.to_arrays(inputs))))
+    for d, m in zip(inputs, batch):
+        assert loss_engine.row(loss_engine.compute(loss_engine.to_arrays([d])), 0) == m
@@ -0,0 +1,154 @@
+"""Pareto search of the what-if optimizer against an exhaustive reference."""
+import itertools
+
+import numpy as np
+import pytest
+
+import loss_engine
+import optimizer
+
+BASE = {
+    "people_involved": 8,
+    "approvals_per_task": 3,
+    "tool_count": 6,
+    "avg_delays_hours": 6.0,
+    "rejection_rate": 10.0,
+    "monthly_volume": 200,
+    "avg_annual_salary": 1200000.0,
+    "total_project_budget": 500000.0,
+}
+LIMITS = {"max_delay_reduction_pct": 20.0, "max_rejection_reduction_pct": 10.0}
+
+
+def weekly_loss(inputs):
+    values = {**BASE, **inputs}
+    return loss_engine.compute({f: np.array([float(values[f])]) for f in loss_engine.INPUT_FIELDS})["financial_loss_weekly"][0].item()
+
+
+def exhaustive_front(max_change_cost=None):
+    """(cost, savings) of every non-dominated candidate, by brute force."""
+    baseline = weekly_loss({})
+    w = optimizer.EFFORT_WEIGHTS
+    points = []
+    for p, a, t, d, r in itertools.product(
+        range(1, BASE["people_involved"] + 1),
+        range(0, BASE["approvals_per_task"] + 1),
+        range(0, BASE["tool_count"] + 1),
+        np.arange(0, LIMITS["max_delay_reduction_pct"] + 1, optimizer.PERCENT_STEP),
+        np.arange(0, LIMITS["max_rejection_reduction_pct"] + 1, optimizer.PERCENT_STEP),
+    ):
+        cost = (
+            (BASE["people_involved"] - p) * w["people_involved"]
+            + (BASE["approvals_per_task"] - a) * w["approvals_per_task"]
+            + (BASE["tool_count"] - t) * w["tool_count"]
+            + d * w["avg_delays_hours"] + r * w["rejection_rate"]
+        )
+        if max_change_cost is not None and cost > max_change_cost:
+            continue
+        loss = weekly_loss({
+            "people_involved": p, "approvals_per_task": a, "tool_count": t,
+            "avg_delays_hours": BASE["avg_delays_hours"] * (1 - d / 100),
+            "rejection_rate": BASE["rejection_rate"] * (1 - r / 100),
+        })
+        points.append((cost, baseline - loss))
+    cost, savings = np.array(points).T
+    front = optimizer.pareto_front(cost, savings)
+    return [(round(cost[i], 2), round(savings[i], 2)) for i in front]
+
+
+def search(**kwargs):
+    return optimizer.optimize(BASE, budget_ms=60000, max_points=1000, **LIMITS, **kwargs)
+
+
+def test_pareto_front_helper():
+    cost = np.array([1.0, 2.0, 2.0, 3.0, 0.0])
+    savings = np.array([5.0, 4.0, 6.0, 6.0, 0.0])
+    assert optimizer.pareto_front(cost, savings).tolist() == [4, 0, 2]
+    assert optimizer.pareto_front(np.empty(0), np.empty(0)).tolist() == []
+
+
+@pytest.mark.parametrize("max_change_cost", [None, 4.0])
+def test_frontier_matches_exhaustive_search(max_change_cost):
+    result = search(max_change_cost=max_change_cost)
+    assert result["complete"]
+    found = [(p["change_cost"], p["weekly_savings"]) for p in result["frontier"]]
+    assert found == exhaustive_front(max_change_cost)
+
+
+def test_frontier_points_are_consistent():
+    result = search()
+    frontier = result["frontier"]
+    assert frontier[0]["change_cost"] == 0 and frontier[0]["changes"] == {}
+    costs = [p["change_cost"] for p in frontier]
+    savings = [p["weekly_savings"] for p in frontier]
+    assert costs == sorted(costs) and savings == sorted(savings)
+    for point in frontier:
+        assert point["new_weekly_loss"] == pytest.approx(weekly_loss(point["inputs"]), abs=0.01)
+        assert point["weekly_savings"] == pytest.approx(result["baseline_weekly_loss"] - point["new_weekly_loss"], abs=0.02)
+
+
+def test_constraints_are_respected():
+    result = search(min_headcount=5, min_approvals=2, fixed={"tool_count"})
+    for point in result["frontier"]:
+        assert point["inputs"]["people_involved"] >= 5
+        assert point["inputs"]["approvals_per_task"] >= 2
+        assert point["inputs"]["tool_count"] == BASE["tool_count"]
+
+
+def test_effort_weights_change_the_cost():
+    # Free tool cuts: the cheapest frontier step removes tools down to FREE_TOOLS
+    result = search(effort_weights={"tool_count": 0.0})
+    free = [p for p in result["frontier"] if p["change_cost"] == 0]
+    assert len(free) == 1
+    assert free[0]["inputs"]["tool_count"] == loss_engine.FREE_TOOLS
+    assert free[0]["weekly_savings"] > 0
+
+
+def test_frontier_is_thinned_to_max_points():
+    full = search()["frontier"]
+    thinned = optimizer.optimize(BASE, budget_ms=60000, max_points=5, **LIMITS)["frontier"]
+    assert len(full) > 5
+    assert len(thinned) == 5
+    # Both ends of the frontier survive thinning
+    assert thinned[0] == full[0] and thinned[-1] == full[-1]
+
+
+def test_budget_cut_search_reports_incomplete(monkeypatch):
+    monkeypatch.setattr(optimizer, "OPTIMIZE_CHUNK", 8)
+    result = optimizer.optimize(BASE, budget_ms=0)
+    assert not result["complete"]
+    # Only the first chunk ran, so no headcount level was finished
+    assert (result["levels_searched"], result["levels_partial"]) == (0, 1)
+    assert result["evaluated"] == 8
+    assert result["frontier"]
+
+
+def test_levels_cut_between_levels_are_not_partial(monkeypatch):
+    # Each level of this grid is one chunk; the clock runs out right after the first
+    clock = iter([0.0] + [10.0] * 100)
+    monkeypatch.setattr(optimizer.time, "perf_counter", lambda: next(clock))
+    result = optimizer.optimize(BASE, budget_ms=1000, **LIMITS)
+    assert not result["complete"]
+    assert (result["levels_searched"], result["levels_partial"]) == (1, 0)
+
+
+def test_untouched_fractional_inputs_are_not_reported_as_changes():
+    base = {**BASE, "avg_delays_hours": 12.345, "rejection_rate": 7.777}
+    result = optimizer.optimize(base, budget_ms=60000, **LIMITS)
+    for point in result["frontier"]:
+        for lever in ("avg_delays_hours", "rejection_rate"):
+            unchanged = point["inputs"][lever] == round(base[lever], 2)
+            assert (lever in point["changes"]) != unchanged, (lever, point)
+    assert result["frontier"][0]["changes"] == {}
+
+
+def test_optimize_endpoint(client, headers, workflow):
+    response = client.post(f"/workflows/{workflow['id']}/optimize", json={"max_change_cost": 10}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["workflow_id"] == workflow["id"]
+    assert all(p["change_cost"] <= 10 for p in body["frontier"])
+    assert client.post("/workflows/999999/optimize", json={}, headers=headers).status_code == 404
+    url = f"/workflows/{workflow['id']}/optimize"
+    assert client.post(url, json={"fixed": ["budget"]}, headers=headers).status_code == 422
+    assert client.post(url, json={"effort_weights": {"tool_count": -1}}, headers=headers).status_code == 422
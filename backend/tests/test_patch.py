@@ -0,0 +1,146 @@
+"""PATCH /workflows/{id}: incremental re-analysis, AI reuse and versioning."""
+import pytest
+
+import ai_reasoning
+import loss_engine
+import main
+from database import SessionLocal, WorkflowVersionDB
+
+from conftest import SAMPLE_WORKFLOW
+
+# Response metadata, plus keys that depend on the rest of the portfolio
+# rather than on the workflow's own inputs
+IGNORED_KEYS = {"id", "deduplicated", "industry_benchmark_score", "peer_benchmark"}
+
+
+@pytest.fixture
+def ai_calls(monkeypatch):
+    """Counts the AI prompts PATCH sends."""
+    calls = []
+    original = ai_reasoning.generate_loss_points
+
+    async def counting(data, *args, **kwargs):
+        calls.append(data)
+        return await original(data, *args, **kwargs)
+
+    monkeypatch.setattr(ai_reasoning, "generate_loss_points", counting)
+    return calls
+
+
+@pytest.mark.parametrize("update", [
+    {"monthly_volume": 450},
+    {"avg_delays_hours": 1.5, "rejection_rate": 25},
+    {"avg_annual_salary": 3000000},
+    {"people_involved": 3, "tools_used": ["ERP"]},
+    {"name": "Renamed"},
+    {"people_involved": 2, "monthly_volume": 1, "avg_delays_hours": 0, "rejection_rate": 0},
+])
+def test_patch_matches_fresh_analysis(client, headers, workflow, update):
+    patched = client.patch(f"/workflows/{workflow['id']}", json=update, headers=headers)
+    assert patched.status_code == 200
+    fresh = client.post("/analyze?force=true", json={**SAMPLE_WORKFLOW, **update}, headers=headers)
+    assert fresh.status_code == 200
+
+    expected = {k: v for k, v in fresh.json().items() if k not in IGNORED_KEYS}
+    assert {k: patched.json()[k] for k in expected} == expected
+
+
+def test_patch_resamples_monte_carlo_band_like_a_fresh_analysis(client, headers):
+    query = "force=true&simulate=true&samples=20000&seed=7"
+    original = client.post(f"/analyze?{query}", json=SAMPLE_WORKFLOW, headers=headers).json()
+    update = {"monthly_volume": 450}
+    patched = client.patch(f"/workflows/{original['id']}", json=update, headers=headers).json()
+    fresh = client.post(f"/analyze?{query}", json={**SAMPLE_WORKFLOW, **update}, headers=headers).json()
+    band = patched["confidence_interval"]
+    assert band["method"] == "monte_carlo"
+    assert band["samples"] == original["confidence_interval"]["samples"]
+    # The fresh run may be budget-capped to another count; compare like for like
+    if fresh["confidence_interval"]["samples"] == band["samples"]:
+        assert band == fresh["confidence_interval"]
+
+
+def test_patch_band_with_a_derived_seed_matches_a_fresh_analysis(client, headers):
+    original = client.post("/analyze?force=true&simulate=true&samples=20000", json=SAMPLE_WORKFLOW, headers=headers).json()
+    update = {"avg_delays_hours": 9}
+    patched = client.patch(f"/workflows/{original['id']}", json=update, headers=headers).json()
+    new_data = main.WorkflowInput(**{**SAMPLE_WORKFLOW, **update})
+
+    band = patched["confidence_interval"]
+    assert band["seed"] == main.default_simulation_seed(new_data) != original["confidence_interval"]["seed"]
+    expected = loss_engine.simulate_confidence(loss_engine.scalars(new_data), samples=band["samples"], seed=band["seed"], budget_ms=None)
+    assert band == {**expected, "samples_requested": 20000}
+
+
+def test_patch_band_does_not_depend_on_the_time_budget(client, headers):
+    original = client.post("/analyze?force=true&simulate=true&samples=100000&seed=7", json=SAMPLE_WORKFLOW, headers=headers).json()
+    band = original["confidence_interval"]
+    patched = client.patch(f"/workflows/{original['id']}", json={"name": "Renamed", "monthly_volume": 450}, headers=headers).json()
+    expected = loss_engine.simulate_confidence(
+        loss_engine.scalars(main.WorkflowInput(**{**SAMPLE_WORKFLOW, "monthly_volume": 450})),
+        samples=band["samples"], seed=7, budget_ms=None,
+    )
+    assert patched["confidence_interval"] == {**expected, "samples_requested": 100000}
+
+
+def test_ai_reused_unless_prompt_fields_change(client, headers, workflow, ai_calls):
+    url = f"/workflows/{workflow['id']}"
+    for update in ({"monthly_volume": 20}, {"avg_delays_hours": 2}, {"name": "Renamed"}, {"rejection_rate": 3}):
+        assert not set(update) & ai_reasoning.PROMPT_FIELDS
+        response = client.patch(url, json=update, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["invisible_loss_points"] == workflow["invisible_loss_points"]
+    assert ai_calls == []
+
+    for n, update in enumerate(({"description": "Now fully manual"}, {"approvals_per_task": 1}), start=1):
+        assert set(update) <= ai_reasoning.PROMPT_FIELDS
+        assert client.patch(url, json=update, headers=headers).status_code == 200
+        assert len(ai_calls) == n
+
+
+def test_unchanged_patch_is_a_no_op(client, headers, workflow, ai_calls):
+    response = client.patch(f"/workflows/{workflow['id']}", json={"monthly_volume": SAMPLE_WORKFLOW["monthly_volume"]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert response.json()["changed_fields"] == []
+    assert client.get(f"/workflows/{workflow['id']}/versions").json()["versions"] == []
+    assert ai_calls == []
+
+
+def test_versions_record_each_change(client, headers, workflow):
+    url = f"/workflows/{workflow['id']}"
+    first = client.patch(url, json={"monthly_volume": 300}, headers=headers).json()
+    second = client.patch(url, json={"people_involved": 4, "rejection_rate": 2}, headers=headers).json()
+    assert (first["version"], second["version"]) == (2, 3)
+    assert second["changed_fields"] == ["people_involved", "rejection_rate"]
+
+    versions = client.get(f"{url}/versions?full=true").json()["versions"]
+    assert [v["version"] for v in versions] == [1, 2, 3]
+    assert [v["changed_fields"] for v in versions] == [[], ["monthly_volume"], ["people_involved", "rejection_rate"]]
+    assert versions[0]["input_data"]["monthly_volume"] == SAMPLE_WORKFLOW["monthly_volume"]
+    assert versions[0]["estimated_financial_loss"] == workflow["estimated_financial_loss"]
+    assert versions[2]["result_data"]["estimated_financial_loss"] == second["estimated_financial_loss"]
+
+
+def test_concurrent_edit_conflicts(client, headers, workflow):
+    # Another writer saved the first version between our read and our commit
+    db = SessionLocal()
+    try:
+        db.add(main.workflow_version_row(main.WorkflowDB(id=workflow["id"], input_data={}, result_data={}), 1, []))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.patch(f"/workflows/{workflow['id']}", json={"monthly_volume": 999}, headers=headers)
+    assert response.status_code == 409
+    # The failed edit left no version rows behind
+    db = SessionLocal()
+    try:
+        versions = db.query(WorkflowVersionDB.version).filter(WorkflowVersionDB.workflow_id == workflow["id"]).all()
+    finally:
+        db.close()
+    assert versions == [(1,)]
+    assert client.get(f"/workflows/{workflow['id']}").json()["input_data"]["monthly_volume"] == SAMPLE_WORKFLOW["monthly_volume"]
+
+
+def test_patch_unknown_workflow(client, headers):
+    assert client.patch("/workflows/999999", json={"name": "x"}, headers=headers).status_code == 404
@@ -0,0 +1,111 @@
+"""peer_index: percentile ranks against a brute-force count of the peer group."""
+import random
+
+from database import SessionLocal, WorkflowDB
+from peer_index import ALL_PEERS, NEUTRAL_SCORE, PEOPLE_BANDS, TOOL_BANDS, PeerIndex, peer_group
+
+
+def brute_force(peers, clarity, waste):
+    n = len(peers)
+    lower = sum(c < clarity for c, _ in peers) + 0.5 * sum(c == clarity for c, _ in peers)
+    higher = sum(w > waste for _, w in peers) + 0.5 * sum(w == waste for _, w in peers)
+    return lower / n * 100, higher / n * 100
+
+
+def populated(n=300, seed=0):
+    rng = random.Random(seed)
+    index = PeerIndex(min_group=1)
+    rows = {}
+    for workflow_id in range(n):
+        people, tools = rng.randint(1, 40), rng.randint(0, 8)
+        # Coarse values so ties are common
+        clarity, waste = rng.randrange(10, 101, 5), round(rng.uniform(0, 20), 0)
+        index.add(workflow_id, {"people_involved": people, "tools_used": ["t"] * tools}, {"clarity_score": clarity, "waste_ratio": waste})
+        rows[workflow_id] = (peer_group(people, tools), clarity, waste)
+    return index, rows
+
+
+def test_percentiles_match_brute_force():
+    index, rows = populated()
+    rng = random.Random(1)
+    for _ in range(200):
+        people, tools = rng.randint(1, 40), rng.randint(0, 8)
+        clarity, waste = rng.randrange(10, 101, 5), round(rng.uniform(0, 20), 0)
+        group = peer_group(people, tools)
+        peers = [(c, w) for g, c, w in rows.values() if g == group]
+        result = index.benchmark(people, tools, clarity, waste)
+        if not peers:
+            continue  # falls back to the whole portfolio, covered below
+        clarity_pct, waste_pct = brute_force(peers, clarity, waste)
+        assert result["peers"] == len(peers)
+        assert result["clarity_percentile"] == round(clarity_pct, 1)
+        assert result["waste_percentile"] == round(waste_pct, 1)
+        assert result["score"] == int(round((clarity_pct + waste_pct) / 2))
+
+
+def test_small_group_falls_back_to_all_workflows():
+    index, rows = populated(n=40)
+    index.min_group = 1000
+    result = index.benchmark(5, 3, 50, 5.0)
+    clarity_pct, waste_pct = brute_force([(c, w) for _, c, w in rows.values()], 50, 5.0)
+    assert result["peer_group"] == "all workflows"
+    assert result["peers"] == 40
+    assert result["clarity_percentile"] == round(clarity_pct, 1)
+    assert index.stats()["fallbacks"] == 1
+
+
+def test_empty_index_is_neutral():
+    result = PeerIndex().benchmark(5, 3, 50, 5.0)
+    assert result["score"] == NEUTRAL_SCORE
+    assert result["peers"] == 0
+
+
+def test_exclude_id_and_remove_drop_the_workflow():
+    index, rows = populated(n=60)
+    workflow_id = 7
+    group, clarity, waste = rows[workflow_id]
+    peers = [(c, w) for i, (g, c, w) in rows.items() if g == group and i != workflow_id]
+    people, tools = PEOPLE_BANDS[group[0]], TOOL_BANDS[group[1]]
+
+    excluded = index.benchmark(people, tools, clarity, waste, exclude_id=workflow_id)
+    assert excluded["peers"] == len(peers)
+    assert excluded["clarity_percentile"] == round(brute_force(peers, clarity, waste)[0], 1)
+    # The entry is restored afterwards
+    assert index.stats()["workflows"] == 60
+
+    index.remove(workflow_id)
+    assert index.benchmark(people, tools, clarity, waste) == excluded
+
+
+def test_readding_a_workflow_replaces_its_entry():
+    index = PeerIndex(min_group=1)
+    index.add(1, {"people_involved": 5, "tools_used": []}, {"clarity_score": 40, "waste_ratio": 3.0})
+    index.add(1, {"people_involved": 5, "tools_used": []}, {"clarity_score": 90, "waste_ratio": 1.0})
+    assert index.stats()["workflows"] == 1
+    assert index._groups[ALL_PEERS].clarity == [90]
+
+
+def test_batch_rows_rank_against_each_other():
+    index = PeerIndex(min_group=1)
+    rows = [(5, 2, c, float(w)) for c, w in ((30, 9), (50, 5), (70, 1))]
+    results = index.benchmark_many(rows)
+    assert [r["peers"] for r in results] == [2, 2, 2]
+    assert [r["clarity_percentile"] for r in results] == [0.0, 50.0, 100.0]
+    assert [r["waste_percentile"] for r in results] == [0.0, 50.0, 100.0]
+    # Staged rows are not kept
+    assert index.stats()["workflows"] == 0
+
+
+def test_load_matches_incremental_adds(client, workflow):
+    loaded = PeerIndex(min_group=1)
+    loaded.load(SessionLocal)
+    incremental = PeerIndex(min_group=1)
+    db = SessionLocal()
+    try:
+        for row in db.query(WorkflowDB).filter(WorkflowDB.clarity_score.isnot(None)):
+            incremental.add(row.id, row.input_data, {"clarity_score": row.clarity_score, "waste_ratio": row.waste_ratio})
+    finally:
+        db.close()
+    assert loaded.stats()["workflows"] == incremental.stats()["workflows"] > 0
+    assert {g: (p.clarity, p.waste) for g, p in loaded._groups.items()} == \
+        {g: (p.clarity, p.waste) for g, p in incremental._groups.items()}
@@ -0,0 +1,107 @@
+"""Single-flight coalescing: one run per key, shared by concurrent callers."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ai_reasoning
+from dedup import analyze_dedup
+from single_flight import SingleFlight
+
+from conftest import SAMPLE_WORKFLOW
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        # The key is forgotten once its call finishes
+        assert await flights.do("key", work) == "done"
+        return results
+
+    assert asyncio.run(main()) == ["done"] * 5
+    assert len(calls) == 2
+    assert flights.stats()["leaders"] == 2
+    assert flights.stats()["coalesced"] == 4
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_distinct_keys_run_separately_and_errors_are_shared():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def ok():
+        return 1
+
+    async def main():
+        return await asyncio.gather(flights.do("a", fail), flights.do("a", fail), flights.do("b", ok), return_exceptions=True)
+
+    first, second, other = asyncio.run(main())
+    assert isinstance(first, ValueError) and second is first
+    assert other == 1
+    assert flights.stats()["errors"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flights = SingleFlight("test")
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.02)
+        finished.append(True)
+        return "done"
+
+    async def main():
+        impatient = asyncio.ensure_future(flights.do("key", work))
+        patient = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == "done"
+    assert finished == [True]
+
+
+@pytest.fixture
+def slow_ai(monkeypatch):
+    """Holds every AI call until both duplicate requests are in flight."""
+    started = threading.Event()
+
+    async def slow(data, fallback, timeout=None):
+        started.set()
+        await asyncio.sleep(0.3)
+        return fallback
+
+    monkeypatch.setattr(ai_reasoning, "generate_loss_points", slow)
+    return started
+
+
+def test_concurrent_duplicate_analyses_coalesce(client, headers, slow_ai):
+    data = {**SAMPLE_WORKFLOW, "name": "Coalesced analysis"}
+
+    def post():
+        return client.post("/analyze", json=data, headers=headers).json()
+
+    coalesced = analyze_dedup.coalesced
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(post)
+        assert slow_ai.wait(5)
+        follower = pool.submit(post)
+        first, second = leader.result(), follower.result()
+
+    assert first["id"] == second["id"]
+    assert first["deduplicated"] is False
+    assert second["deduplicated"] is True
+    # Joined the in-flight run rather than finding a committed row
+    assert analyze_dedup.coalesced == coalesced + 1
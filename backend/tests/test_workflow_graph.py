@@ -0,0 +1,129 @@
+"""Critical-path analysis of step-level graphs, directly and through the API."""
+import pytest
+
+import workflow_graph
+
+# a -> b -> d is the long chain; c runs beside b with 3h of slack
+GRAPH = {
+    "nodes": [
+        {"id": "a", "duration_hours": 2, "owner": "ops", "tools": ["ERP"]},
+        {"id": "b", "duration_hours": 4, "wait_hours": 1, "owner": "finance", "tools": ["ERP", "Excel"]},
+        {"id": "c", "duration_hours": 1, "owner": "ops"},
+        {"id": "d", "duration_hours": 1, "owner": "finance"},
+    ],
+    "edges": [
+        {"source": "a", "target": "b", "wait_hours": 1},
+        {"source": "a", "target": "c"},
+        {"source": "b", "target": "d", "kind": "approval", "wait_hours": 2},
+        {"source": "c", "target": "d"},
+    ],
+}
+
+
+def test_critical_path_and_slack():
+    analysis = workflow_graph.analyze(GRAPH, estimated_financial_loss=1000.0)
+    steps = {s["id"]: s for s in analysis["steps"]}
+
+    assert analysis["critical_path"] == ["a", "b", "d"]
+    # 2 + (1 lag + 1 wait + 4) + (2 lag + 1)
+    assert analysis["makespan_hours"] == 11
+    assert analysis["critical_path_work_hours"] == 7
+    assert analysis["critical_path_wait_hours"] == 4
+    assert [steps[i]["critical"] for i in "abcd"] == [True, True, False, True]
+    assert steps["c"]["slack_hours"] == 7
+    assert steps["c"]["latest_finish"] == 10
+    assert (analysis["handoffs"], analysis["approval_gates"], analysis["owner_changes"]) == (3, 1, 2)
+
+
+def test_loss_attributed_by_idle_time():
+    analysis = workflow_graph.analyze(GRAPH, estimated_financial_loss=1000.0)
+    steps = {s["id"]: s for s in analysis["steps"]}
+
+    # Idle hours: b = 1 wait + 1 lag, d = 2 lag; a and c never wait
+    assert analysis["total_queueing_delay_hours"] == 4
+    assert {i: steps[i]["attributed_loss"] for i in "abcd"} == {"a": 0, "b": 500, "c": 0, "d": 500}
+    assert analysis["loss_by_owner"] == {"finance": 1000, "ops": 0}
+    assert analysis["loss_by_tool"] == {"ERP": 250, "Excel": 250}
+    assert analysis["top_delay_steps"] == ["b", "d"]
+
+
+def test_long_chain_is_linear():
+    n = 5000
+    chain = {
+        "nodes": [{"id": str(i), "duration_hours": 0.1, "wait_hours": 0.1} for i in range(n)],
+        "edges": [{"source": str(i), "target": str(i + 1), "wait_hours": 0.1} for i in range(n - 1)],
+    }
+    analysis = workflow_graph.analyze(chain)
+    assert len(analysis["critical_path"]) == n
+    assert all(s["critical"] for s in analysis["steps"])
+
+
+def test_disconnected_branches_and_no_idle_time():
+    # Two independent chains; the longer one sets the makespan
+    graph = {
+        "nodes": [{"id": i, "duration_hours": h} for i, h in (("a", 1), ("b", 2), ("x", 5))],
+        "edges": [{"source": "a", "target": "b"}],
+    }
+    analysis = workflow_graph.analyze(graph, estimated_financial_loss=900.0)
+    steps = {s["id"]: s for s in analysis["steps"]}
+
+    assert analysis["critical_path"] == ["x"]
+    assert analysis["makespan_hours"] == 5
+    assert steps["a"]["slack_hours"] == 2 and steps["b"]["slack_hours"] == 2
+    assert analysis["flow_efficiency"] == 1.0
+    # Nothing ever waits, so no step carries any of the loss
+    assert analysis["total_queueing_delay_hours"] == 0
+    assert all(s["attributed_loss"] == 0 for s in analysis["steps"])
+    assert analysis["top_delay_steps"] == []
+
+
+def test_size_limits(monkeypatch):
+    monkeypatch.setattr(workflow_graph, "GRAPH_MAX_NODES", 2)
+    nodes = [{"id": str(i), "duration_hours": 1} for i in range(3)]
+    with pytest.raises(workflow_graph.GraphError, match="limited to 2 steps"):
+        workflow_graph.analyze({"nodes": nodes, "edges": []})
+
+    monkeypatch.setattr(workflow_graph, "GRAPH_MAX_NODES", 10)
+    monkeypatch.setattr(workflow_graph, "GRAPH_MAX_EDGES", 1)
+    edges = [{"source": "0", "target": "1"}, {"source": "1", "target": "2"}]
+    with pytest.raises(workflow_graph.GraphError, match="limited to 1 edges"):
+        workflow_graph.analyze({"nodes": nodes, "edges": edges})
+
+
+@pytest.mark.parametrize("graph, message", [
+    ({"nodes": [], "edges": []}, "at least one step"),
+    ({"nodes": [{"id": "a", "duration_hours": 1}] * 2, "edges": []}, "Duplicate step id"),
+    ({"nodes": [{"id": "a", "duration_hours": 1}], "edges": [{"source": "a", "target": "z"}]}, "unknown step: z"),
+    ({"nodes": [{"id": "a", "duration_hours": 1}], "edges": [{"source": "a", "target": "a"}]}, "edge to itself"),
+    ({
+        "nodes": [{"id": "a", "duration_hours": 1}, {"id": "b", "duration_hours": 1}],
+        "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "a"}],
+    }, "cycle"),
+])
+def test_invalid_graphs(graph, message):
+    with pytest.raises(workflow_graph.GraphError, match=message):
+        workflow_graph.analyze(graph)
+
+
+def test_graph_endpoints(client, headers, workflow):
+    url = f"/workflows/{workflow['id']}/graph"
+    stored = client.put(url, json=GRAPH, headers=headers)
+    assert stored.status_code == 200
+    analysis = stored.json()["analysis"]
+    assert analysis["critical_path"] == ["a", "b", "d"]
+    assert analysis["estimated_financial_loss"] == workflow["estimated_financial_loss"]
+
+    fetched = client.get(url).json()
+    assert fetched["analysis"] == analysis
+    assert fetched["graph"]["nodes"][0]["id"] == "a"
+
+    # A re-scored workflow re-attributes its new loss on the next read
+    patched = client.patch(f"/workflows/{workflow['id']}", json={"monthly_volume": 50}, headers=headers).json()
+    reread = client.get(url).json()["analysis"]
+    assert reread["estimated_financial_loss"] == patched["estimated_financial_loss"]
+    assert reread["loss_by_owner"]["finance"] == pytest.approx(patched["estimated_financial_loss"], abs=0.01)
+
+    cyclic = {"nodes": GRAPH["nodes"], "edges": GRAPH["edges"] + [{"source": "d", "target": "a"}]}
+    assert client.put(url, json=cyclic, headers=headers).status_code == 400
+    assert client.delete(url, headers=headers).status_code == 200
+    assert client.get(url).status_code == 404
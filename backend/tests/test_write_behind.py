@@ -0,0 +1,138 @@
+"""Write-behind group commit: flush triggers, row-by-row retry, drain and writer failure."""
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import write_behind
+from database import SQLALCHEMY_DATABASE_URL, SessionLocal, WorkflowDB, async_database_url
+from write_behind import WriteBehindQueue, WriteBehindStopped
+
+
+def row(name="Write-behind row", **extra):
+    return {"name": name, "description": "", "created_at": "2026-01-01T00:00:00", "input_data": {}, "result_data": {}, **extra}
+
+
+@pytest.fixture
+def run(client, monkeypatch):
+    """Run a coroutine on a fresh loop with its own engine (connections are loop-bound)."""
+    def runner(coro_fn):
+        async def wrapped():
+            engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL))
+            monkeypatch.setattr(write_behind, "DurableAsyncSessionLocal", async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+            try:
+                return await coro_fn()
+            finally:
+                await engine.dispose()
+        return asyncio.run(wrapped())
+    return runner
+
+
+def stored_names(ids):
+    db = SessionLocal()
+    try:
+        return {wf.id: wf.name for wf in db.query(WorkflowDB).filter(WorkflowDB.id.in_(ids))}
+    finally:
+        db.close()
+
+
+def test_full_batch_flushes_without_waiting_for_the_timer(run):
+    writer = WriteBehindQueue(batch_size=3, flush_ms=60000)
+
+    async def scenario():
+        writer.start()
+        ids = await asyncio.wait_for(asyncio.gather(*(writer.submit(row(f"size-{i}")) for i in range(3))), 5)
+        await writer.stop()
+        return ids
+
+    ids = run(scenario)
+    assert len(set(ids)) == 3
+    assert stored_names(ids) == {i: f"size-{n}" for n, i in enumerate(ids)}
+    stats = writer.stats()
+    assert (stats["batches"], stats["rows_written"], stats["last_batch_size"]) == (1, 3, 3)
+
+
+def test_partial_batch_flushes_when_the_timer_fires(run):
+    writer = WriteBehindQueue(batch_size=100, flush_ms=20)
+
+    async def scenario():
+        writer.start()
+        workflow_id = await asyncio.wait_for(writer.submit(row("timer")), 5)
+        still_running = writer.running
+        await writer.stop()
+        return workflow_id, still_running
+
+    workflow_id, still_running = run(scenario)
+    # Flushed by the timer, not by stop()
+    assert still_running
+    assert stored_names([workflow_id]) == {workflow_id: "timer"}
+    assert writer.stats()["last_batch_size"] == 1
+
+
+def test_failed_batch_is_retried_row_by_row(run, workflow):
+    writer = WriteBehindQueue(batch_size=4, flush_ms=60000)
+
+    async def scenario():
+        writer.start()
+        results = await asyncio.wait_for(asyncio.gather(
+            writer.submit(row("retry-good-1")),
+            writer.submit(row("retry-duplicate-id", id=workflow["id"])),
+            writer.submit(row("retry-unknown-column", not_a_column=1)),
+            writer.submit(row("retry-good-2")),
+            return_exceptions=True,
+        ), 5)
+        await writer.stop()
+        return results
+
+    good_1, duplicate, unknown, good_2 = run(scenario)
+    assert isinstance(duplicate, IntegrityError)
+    assert isinstance(unknown, TypeError)
+    assert stored_names([good_1, good_2]) == {good_1: "retry-good-1", good_2: "retry-good-2"}
+
+    stats = writer.stats()
+    assert (stats["failed_batches"], stats["failed_rows"], stats["rows_retried"]) == (1, 2, 2)
+    # Retried rows are not group commits
+    assert (stats["batches"], stats["rows_written"], stats["avg_batch_size"]) == (0, 0, 0.0)
+
+
+def test_stop_drains_everything_queued(run):
+    writer = WriteBehindQueue(batch_size=2, flush_ms=60000)
+
+    async def scenario():
+        writer.start()
+        pending = [asyncio.ensure_future(writer.submit(row(f"drain-{i}"))) for i in range(5)]
+        await asyncio.sleep(0)
+        await writer.stop()
+        assert all(task.done() for task in pending)
+        return [task.result() for task in pending]
+
+    ids = run(scenario)
+    assert len(stored_names(ids)) == 5
+    assert writer.stats()["batches"] == 3
+    assert not writer.running
+
+
+def test_writer_failure_rejects_held_and_queued_rows(run, monkeypatch):
+    writer = WriteBehindQueue(batch_size=1, flush_ms=60000)
+
+    async def crash(batch):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("writer bug")
+
+    monkeypatch.setattr(writer, "_flush", crash)
+
+    async def scenario():
+        writer.start()
+        results = await asyncio.wait_for(asyncio.gather(
+            *(writer.submit(row(f"crash-{i}")) for i in range(3)),
+            return_exceptions=True,
+        ), 5)
+        assert not writer.running
+        assert isinstance(writer._writer.exception(), RuntimeError)
+        with pytest.raises(WriteBehindStopped):
+            await writer.submit(row("after-crash"))
+        return results
+
+    results = run(scenario)
+    assert all(isinstance(r, WriteBehindStopped) for r in results)
@@ -0,0 +1,185 @@
+"""Optional write-behind persistence for ``/analyze`` (group commit).
+
+With ``ANALYZE_WRITE_BEHIND=1``, analyses are not committed one request at a
+time. Each handler enqueues its row and awaits a future. A single writer task
+drains the queue in batches: it flushes once ``WRITE_BEHIND_BATCH_SIZE`` rows
+are waiting or ``WRITE_BEHIND_FLUSH_MS`` has passed since the first row of the
+batch. One transaction (one fsync) then covers the whole batch, and every
+future gets its new id.
+
+Durability: the writer commits on its own ``synchronous=FULL`` connection
+(``DurableAsyncSessionLocal``), and a future resolves only after its batch
+has committed. So a client never sees an id that isn't on disk. If a batch
+fails, its rows are retried one transaction each. Only the rows that fail
+again reject their futures. ``stop()`` drains everything still queued before
+returning. If the writer task ever exits for another reason, every row it
+still holds or that is still queued fails with ``WriteBehindStopped``, so no
+request waits on a future that nobody will resolve. The queue is bounded, so producers wait when the writer
+falls behind instead of buffering without limit.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from database import DurableAsyncSessionLocal, WorkflowDB
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("ANALYZE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "64"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "20"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+
+_STOP = object()
+
+
+class WriteBehindStopped(RuntimeError):
+    pass
+
+
+class WriteBehindQueue:
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH_SIZE, flush_ms=WRITE_BEHIND_FLUSH_MS, max_queue=WRITE_BEHIND_MAX_QUEUE):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000.0
+        self.max_queue = max_queue
+        self._queue = None
+        self._writer = None
+        self.max_depth = 0
+        self.batches = 0
+        self.rows_written = 0  # rows committed by a group commit
+        self.rows_retried = 0  # rows committed one by one after their batch failed
+        self.failed_batches = 0
+        self.failed_rows = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self._batch = []  # the batch the writer is flushing right now
+
+    @property
+    def running(self):
+        return self._writer is not None and not self._writer.done()
+
+    def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything queued so far, then stop the writer."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._writer
+        self._writer = None
+
+    async def submit(self, values):
+        """Queue a ``WorkflowDB`` row (column -> value) and return its id once committed."""
+        future = asyncio.get_running_loop().create_future()
+        if not self.running:
+            raise WriteBehindStopped("Write-behind writer is not running")
+        await self._queue.put((values, future))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        if not self.running:
+            # The writer died while we were queueing; nobody will drain this row
+            self._fail_pending()
+        return await future
+
+    async def _next_batch(self):
+        """Block for the first item, then gather until the size or time trigger."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while batch[-1] is not _STOP and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        try:
+            while True:
+                self._batch = await self._next_batch()
+                stopping = self._batch[-1] is _STOP
+                if stopping:
+                    self._batch.pop()
+                if self._batch:
+                    await self._flush(self._batch)
+                self._batch = []
+                if stopping:
+                    return
+        except BaseException:
+            logger.exception("Write-behind writer stopped unexpectedly")
+            raise
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """Reject every future the writer holds or that is still queued."""
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for item in pending:
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(WriteBehindStopped("Write-behind writer stopped before this row was committed"))
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        try:
+            rows = [WorkflowDB(**values) for values, _ in batch]
+            async with DurableAsyncSessionLocal() as db:
+                db.add_all(rows)
+                await db.commit()
+        except Exception as e:
+            logger.warning("Write-behind flush of %d rows failed, retrying row by row: %s", len(batch), e)
+            self.failed_batches += 1
+            await self._flush_rows(batch)
+            return
+
+        for row, (_, future) in zip(rows, batch):
+            if not future.done():
+                future.set_result(row.id)
+        self.batches += 1
+        self.rows_written += len(rows)
+        self.last_batch_size = len(rows)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    async def _flush_rows(self, batch):
+        """One transaction per row, so a bad row only fails its own future."""
+        for values, future in batch:
+            try:
+                row = WorkflowDB(**values)
+                async with DurableAsyncSessionLocal() as db:
+                    db.add(row)
+                    await db.commit()
+            except Exception as e:
+                self.failed_rows += 1
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.rows_retried += 1
+            if not future.done():
+                future.set_result(row.id)
+
+    def stats(self):
+        return {
+            "enabled": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_depth,
+            "queue_limit": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_ms": self.flush_seconds * 1000,
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "rows_retried": self.rows_retried,
+            "avg_batch_size": round(self.rows_written / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms,
+            "failed_batches": self.failed_batches,
+            "failed_rows": self.failed_rows,
+        }
+
+
+analysis_writer = WriteBehindQueue()
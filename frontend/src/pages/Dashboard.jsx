@@ -10,16 +10,28 @@ const Dashboard = () => {
     const [compareMode, setCompareMode] = useState(false);
     const [selectedIds, setSelectedIds] = useState([]);
 
-    useEffect(() => {
-        const token = localStorage.getItem('token');
-        fetch('http://localhost:8000/workflows', {
-            headers: { 'Authorization': `Bearer ${token}` }
-        })
+    const [nextCursor, setNextCursor] = useState(null);
+
+    const authHeaders = () => ({ 'Authorization': `Bearer ${localStorage.getItem('token')}` });
+
+    // Summary pages only; full input/result payloads are fetched on demand
+    const loadPage = (cursor) => {
+        const params = new URLSearchParams({ limit: '50' });
+        if (cursor) params.set('cursor', cursor);
+        return fetch(`http://localhost:8000/workflows?${params}`, { headers: authHeaders() })
             .then(res => res.json())
             .then(data => {
-                setWorkflows(data);
-                setLoading(false);
-            })
+                setWorkflows(prev => cursor ? [...prev, ...data.items] : data.items);
+                setNextCursor(data.next_cursor);
+            });
+    };
+
+    const fetchWorkflow = (id) =>
+        fetch(`http://localhost:8000/workflows/${id}`, { headers: authHeaders() }).then(res => res.json());
+
+    useEffect(() => {
+        loadPage(null)
+            .then(() => setLoading(false))
             .catch(err => {
                 console.error(err);
                 setLoading(false);
@@ -36,15 +48,17 @@ const Dashboard = () => {
                 }
             }
         } else {
-            localStorage.setItem('lastAnalysis', JSON.stringify({ input: wf.input_data, result: wf.result_data, id: wf.id }));
-            navigate('/report');
+            fetchWorkflow(wf.id).then(full => {
+                localStorage.setItem('lastAnalysis', JSON.stringify({ input: full.input_data, result: full.result_data, id: full.id }));
+                navigate('/report');
+            });
         }
     };
 
     const handleCompareLaunch = () => {
         if (selectedIds.length !== 2) return;
-        const selectedWfs = workflows.filter(w => selectedIds.includes(w.id));
-        navigate('/comparison', { state: { workflows: selectedWfs } });
+        Promise.all(selectedIds.map(fetchWorkflow))
+            .then(selectedWfs => navigate('/comparison', { state: { workflows: selectedWfs } }));
     };
 
     const handleLogout = () => {
@@ -140,8 +154,8 @@ const Dashboard = () => {
                                         <FileText size={20} />
                                     </div>
                                     {!compareMode && (
-                                        <span style={{ fontSize: '0.9rem', fontWeight: '700', color: wf.result_data.severity === 'High' ? 'var(--danger)' : 'var(--success)' }}>
-                                            {wf.result_data.severity} Risk
+                                        <span style={{ fontSize: '0.9rem', fontWeight: '700', color: wf.severity === 'High' ? 'var(--danger)' : 'var(--success)' }}>
+                                            {wf.severity} Risk
                                         </span>
                                     )}
                                 </div>
@@ -185,6 +199,14 @@ const Dashboard = () => {
                 </motion.div>
             )}
 
+            {!loading && nextCursor && (
+                <div style={{ textAlign: 'center', marginTop: '2rem' }}>
+                    <button className="btn-secondary" onClick={() => loadPage(nextCursor)}>
+                        Load More
+                    </button>
+                </div>
+            )}
+
             {/* Float Action Button for Comparison */}
             {compareMode && selectedIds.length === 2 && (
                 <motion.div
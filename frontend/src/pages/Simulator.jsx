@@ -116,7 +116,7 @@ const Simulator = () => {
         return 'var(--accent-color)';
     };
 
-    const handleAutoOptimize = () => {
+    const applyHeuristicOptimization = () => {
         // Apply Best Practice Heuristics
         setApprovals(current => Math.max(0, Math.min(2, Math.floor(current * 0.5)))); // Aim for < 2
         setTeamSize(current => Math.max(2, Math.floor(current * 0.6))); // Aim for 2-Pizza Team
@@ -124,6 +124,38 @@ const Simulator = () => {
         setOptimizations(true);
     };
 
+    const handleAutoOptimize = async () => {
+        const workflowId = initialData?.result?.id;
+        if (!workflowId) {
+            applyHeuristicOptimization();
+            return;
+        }
+        try {
+            // Server-side search over the real loss model; the sliders only
+            // cover team, approvals and tools, so delay and rework stay fixed
+            const response = await fetch(`http://localhost:8000/workflows/${workflowId}/optimize`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    min_headcount: 2,
+                    min_tools: 1,
+                    fixed: ['avg_delays_hours', 'rejection_rate']
+                })
+            });
+            if (!response.ok) throw new Error('Optimization failed');
+            const { frontier } = await response.json();
+            // Frontier is ordered by change cost; the last point saves the most
+            const best = frontier[frontier.length - 1];
+            setTeamSize(best.inputs.people_involved);
+            setApprovals(best.inputs.approvals_per_task);
+            setToolCount(best.inputs.tool_count);
+            setOptimizations(true);
+        } catch (error) {
+            console.error(error);
+            applyHeuristicOptimization();
+        }
+    };
+
     if (!initialData) return null;
 
     return (